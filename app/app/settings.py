@@ -13,20 +13,37 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-# Quick-start development settings - unsuitable for production
+# SETTINGS_PROFILE picks defaults for the environment. "development" runs
+# with DEBUG and the full middleware stack on every path. "production"
+# serves the token authenticated API lean: no DEBUG, so queries are not
+# recorded in memory, sessions, CSRF and messages only outside
+# API_PATH_PREFIX, cached template loaders, persistent database
+# connections and a larger cache. Every value can still be overridden
+# by its own variable.
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
+SETTINGS_PROFILE = os.environ.get("SETTINGS_PROFILE", "development")
+if SETTINGS_PROFILE not in ("development", "production"):
+    raise ImproperlyConfigured(f"Unknown SETTINGS_PROFILE {SETTINGS_PROFILE}")
+PRODUCTION = SETTINGS_PROFILE == "production"
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = "django-insecure-5$4%bd+fz7#241j(@fe0x-63ma8(^6xe!k@wtw#it*962)-@)^"
+SECRET_KEY = os.environ.get("SECRET_KEY")
+if not SECRET_KEY:
+    if PRODUCTION:
+        raise ImproperlyConfigured("SECRET_KEY must be set in production")
+    SECRET_KEY = "django-insecure-5$4%bd+fz7#241j(@fe0x-63ma8(^6xe!k@wtw#it*962)-@)^"
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DEBUG", "0" if PRODUCTION else "1") == "1"
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get("ALLOWED_HOSTS", "").split(",") if host]
 
 
 # Application definition
@@ -45,23 +62,124 @@ INSTALLED_APPS = [
     "recipe",
 ]
 
+# ADMIN_ENABLED=0 leaves out the admin, its URLs and the admin modules of
+# every app, which are otherwise imported by each worker at startup.
+
+ADMIN_ENABLED = os.environ.get("ADMIN_ENABLED", "1") == "1"
+if not ADMIN_ENABLED:
+    INSTALLED_APPS.remove("django.contrib.admin")
+
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.CompressionMiddleware",
+    "core.middleware.DatabaseRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "core.middleware.NonAPIMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ProfilingMiddleware",
+]
+
+# Middleware of the admin, run by NonAPIMiddleware outside API_PATH_PREFIX
+# in production. The API authenticates with tokens and needs none of it.
+
+API_PATH_PREFIX = "/api/"
+NON_API_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+if not PRODUCTION:
+    index = MIDDLEWARE.index("core.middleware.NonAPIMiddleware")
+    MIDDLEWARE[index:index + 1] = NON_API_MIDDLEWARE
+else:
+    # The admin checks cannot see the middleware NonAPIMiddleware runs
+    SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
+# Opt-in request profiling, see core.middleware.ProfilingMiddleware
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "1.0"))
+PROFILING_SLOW_REQUEST_MS = float(os.environ.get("PROFILING_SLOW_REQUEST_MS", "500"))
+
+# Compression of text and JSON responses, see core.middleware.CompressionMiddleware.
+# Compressed bodies up to COMPRESSION_CACHE_MAX_BYTES are kept in the
+# COMPRESSION_CACHE cache, 0 disables caching them.
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "1") == "1"
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_CACHE = os.environ.get("COMPRESSION_CACHE", "default")
+COMPRESSION_CACHE_TIMEOUT = int(os.environ.get("COMPRESSION_CACHE_TIMEOUT", "300"))
+COMPRESSION_CACHE_MAX_BYTES = int(
+    os.environ.get("COMPRESSION_CACHE_MAX_BYTES", str(1024 * 1024))
+)
+
+# Prometheus metrics served on /metrics, see core.metrics. Set
+# PROMETHEUS_MULTIPROC_DIR to merge the metrics of several worker processes.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+# Only clients in METRICS_ALLOWED_IPS, addresses or networks, and requests
+# with "Authorization: Bearer <METRICS_TOKEN>" may read /metrics.
+
+METRICS_ALLOWED_IPS = [
+    network
+    for network in os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+    if network
+]
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Token bucket rate limits, see core.throttling. A "<scope>.<action>" rate
+# overrides the scope rate for one viewset action. Buckets live in the
+# THROTTLE_CACHE cache, point it at a shared cache to limit across workers.
+
+REST_FRAMEWORK = {
+    "DEFAULT_THROTTLE_CLASSES": (
+        "core.throttling.ScopedTokenBucketThrottle",
+        "core.throttling.IPTokenBucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "recipes": "600/min",
+        "recipes.upload_image": "30/min",
+        "user": "120/min",
+        "login": "10/min",
+        "login_ip": "60/min",
+        "register": "20/hour",
+    },
+}
+
+# The browsable API renders HTML forms from templates, production serves
+# JSON only unless BROWSABLE_API is set.
+
+BROWSABLE_API = os.environ.get("BROWSABLE_API", "0" if PRODUCTION else "1") == "1"
+if not BROWSABLE_API:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
+        "rest_framework.renderers.JSONRenderer",
+    )
+
+THROTTLE_ENABLED = os.environ.get("THROTTLE_ENABLED", "1") == "1"
+THROTTLE_CACHE = os.environ.get("THROTTLE_CACHE", "default")
+
+# Recipe viewsets and the user create and token views are served by async
+# views when ASYNC_VIEWS is set, which app.asgi does. Their ORM work runs in
+# a pool of ASYNC_DB_THREADS threads, each holding its own database
+# connection; 0 uses Django's sync thread.
+
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "0") == "1"
+ASYNC_DB_THREADS = int(os.environ.get("ASYNC_DB_THREADS", "8"))
 
 ROOT_URLCONF = "app.urls"
 
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug",
@@ -69,6 +187,12 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            # Compiled templates are kept for the life of the process
+            "loaders": (
+                [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)]
+                if PRODUCTION
+                else TEMPLATE_LOADERS
+            ),
         },
     },
 ]
@@ -86,8 +210,98 @@ DATABASES = {
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        # Seconds a connection is reused across requests, 0 closes it
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60" if PRODUCTION else "0")),
+    }
+}
+
+# CACHE_BACKEND and CACHE_LOCATION point the default cache at a shared
+# server, e.g. memcached. Backends Django culls itself, the process local
+# default, file and database caches, hold more entries in production.
+
+CACHE_BACKEND = os.environ.get(
+    "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", "300")),
+        "KEY_PREFIX": os.environ.get("CACHE_KEY_PREFIX", "app"),
     }
 }
+if CACHE_BACKEND.rpartition(".")[2] in ("LocMemCache", "FileBasedCache", "DatabaseCache"):
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(
+            os.environ.get("CACHE_MAX_ENTRIES", "20000" if PRODUCTION else "300")
+        ),
+        # Evict a quarter of the entries when full, not a third
+        "CULL_FREQUENCY": 4,
+    }
+
+if PRODUCTION:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Read replicas, one per host in DB_REPLICA_HOSTS. List and retrieve actions
+# of the recipe viewsets read from a replica lagging at most
+# REPLICA_MAX_LAG_SECONDS, see core.routers. After a write the client is
+# pinned to the primary for REPLICA_PIN_SECONDS, or longer if the lag
+# limit requires it.
+
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(","))):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{index}")
+
+# Recipe data sharded per user over one database per host in DB_SHARD_HOSTS,
+# see core.sharding. Users and tokens stay on the default database, new
+# users are placed by a consistent hash ring and the rebalance_shards
+# command moves existing users to the shard the ring picks for them. Only
+# append shards, each has its own primary key range by position.
+
+DATABASE_SHARDS = []
+for index, host in enumerate(filter(None, os.environ.get("DB_SHARD_HOSTS", "").split(","))):
+    DATABASES[f"shard{index}"] = {**DATABASES["default"], "HOST": host}
+    DATABASE_SHARDS.append(f"shard{index}")
+
+SHARD_VNODES = int(os.environ.get("SHARD_VNODES", "64"))
+
+DATABASE_ROUTERS = ["core.routers.ShardRouter", "core.routers.ReplicaRouter"]
+REPLICA_PIN_SECONDS = float(os.environ.get("REPLICA_PIN_SECONDS", "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get("REPLICA_LAG_CHECK_SECONDS", "1"))
+
+
+# Password hashing runs in a pool of PASSWORD_HASHING_WORKERS processes,
+# 0 hashes on the request thread. Pick PASSWORD_HASH_ITERATIONS with the
+# calibrate_password_hashing command, existing hashes are upgraded on login.
+
+PASSWORD_HASHERS = [
+    "core.hashers.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+
+PASSWORD_HASHING_WORKERS = int(os.environ.get("PASSWORD_HASHING_WORKERS", "2"))
+PASSWORD_HASHING_QUEUE = int(os.environ.get("PASSWORD_HASHING_QUEUE", "4"))
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", "0")) or None
+
+
+# Background jobs run by the run_worker command, see core.jobs. Failed jobs
+# are retried after JOB_RETRY_DELAY_SECONDS, doubling up to the maximum,
+# running jobs are claimed again after JOB_TIMEOUT_SECONDS.
+
+JOB_WORKER_PROCESSES = int(os.environ.get("JOB_WORKER_PROCESSES", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_DELAY_SECONDS = float(os.environ.get("JOB_RETRY_DELAY_SECONDS", "10"))
+JOB_RETRY_MAX_DELAY_SECONDS = float(os.environ.get("JOB_RETRY_MAX_DELAY_SECONDS", "3600"))
+JOB_TIMEOUT_SECONDS = float(os.environ.get("JOB_TIMEOUT_SECONDS", "900"))
 
 
 # Password validation
@@ -133,6 +347,29 @@ STATIC_ROOT = "/vol/web/static"
 MEDIA_ROOT = "/vol/web/media"
 
 
+# Uploaded media. "local" spreads files over the MEDIA_ROOTS directories of
+# this node, "s3" keeps them in a bucket of an S3 compatible store shared
+# by all nodes. Recipe images get resized RECIPE_IMAGE_VARIANTS.
+
+MEDIA_STORAGE = os.environ.get("MEDIA_STORAGE", "local")
+DEFAULT_FILE_STORAGE = {
+    "local": "core.storage.ShardedFileSystemStorage",
+    "s3": "core.storage.S3Storage",
+}[MEDIA_STORAGE]
+MEDIA_ROOTS = [path for path in os.environ.get("MEDIA_ROOTS", "").split(",") if path]
+
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL", "https://s3.amazonaws.com")
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_REGION = os.environ.get("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY_ID", "")
+S3_SECRET_ACCESS_KEY = os.environ.get("S3_SECRET_ACCESS_KEY", "")
+S3_PUBLIC_URL = os.environ.get("S3_PUBLIC_URL", "")
+S3_MULTIPART_CHUNK_SIZE = int(os.environ.get("S3_MULTIPART_CHUNK_SIZE", 8 * 1024 * 1024))
+S3_MULTIPART_CONCURRENCY = int(os.environ.get("S3_MULTIPART_CONCURRENCY", "4"))
+
+RECIPE_IMAGE_VARIANTS = {"thumbnail": (200, 200), "medium": (800, 800)}
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,49 @@
+"""
+Settings for running the test suite fast.
+
+Uses a cheap password hasher and keeps uploaded files in memory. Tests
+run on PostgreSQL when DB_HOST is set and on in-memory SQLite otherwise,
+TEST_DATABASE=sqlite|postgres forces either. The suite is safe to run in
+parallel with pytest-xdist (pytest -n auto): every worker gets its own
+SQLite database, or its own PostgreSQL test database suffixed with the
+worker id.
+
+Separate "replica", "shard1" and "shard2" databases stand in for a read
+replica and shards. They are not listed in DATABASE_REPLICAS and
+DATABASE_SHARDS, tests of replica routing and sharding add them.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+PASSWORD_HASHING_WORKERS = 0
+
+DEFAULT_FILE_STORAGE = "core.storage.InMemoryStorage"
+
+# Run ORM work of async views on the test's own connection and transaction
+ASYNC_DB_THREADS = 0
+
+TEST_DATABASE = os.environ.get(
+    "TEST_DATABASE", "postgres" if os.environ.get("DB_HOST") else "sqlite"
+)
+
+if TEST_DATABASE == "sqlite":
+    DATABASES["default"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+elif os.environ.get("DB_TEST_TEMPLATE"):
+    # Clone test databases from a prepared template instead of template1
+    DATABASES["default"]["TEST"] = {"TEMPLATE": os.environ["DB_TEST_TEMPLATE"]}
+
+for alias in ("replica", "shard1", "shard2"):
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "TEST": {
+            **DATABASES["default"].get("TEST", {}),
+            "NAME": None
+            if TEST_DATABASE == "sqlite"
+            else f"test_{DATABASES['default']['NAME']}_{alias}",
+        },
+    }
+DATABASE_REPLICAS = []
+DATABASE_SHARDS = []
@@ -13,13 +13,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import media_view, metrics_view
+
 urlpatterns = [
-    path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/user/", include("user.urls")),
     path("api/recipe/", include("recipe.urls")),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:name>", media_view, name="media"),
+]
+
+if settings.ADMIN_ENABLED:
+    # Importing the admin site is left to deployments serving it
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
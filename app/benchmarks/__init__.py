@@ -0,0 +1,16 @@
+"""
+Performance benchmarks, kept out of the regular test run.
+
+Microbenchmarks of serializers and querysets use pytest-benchmark on a
+deterministic dataset sized by BENCH_* variables (see benchmarks.seed.Scale).
+Baselines depend on the machine, so they are recorded where the
+comparison runs, which fails while none is stored:
+    BENCH_RECIPES_PER_USER=1000 pytest benchmarks \\
+        --benchmark-storage=benchmarks/baselines --benchmark-autosave
+    pytest benchmarks --benchmark-storage=benchmarks/baselines \\
+        --benchmark-compare --benchmark-compare-fail=mean:20%
+
+Endpoint throughput and latency are measured by benchmarks.loadtest,
+ASGI against WSGI serving by benchmarks.asgi_vs_wsgi and single
+components by the bench_*.py scripts.
+"""
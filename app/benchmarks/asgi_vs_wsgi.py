@@ -0,0 +1,140 @@
+"""
+Compare throughput of the recipe API served over ASGI and WSGI.
+
+Starts uvicorn with app.asgi, which serves the recipe viewsets as async
+views, and the threaded WSGI server of benchmarks.loadtest with the sync
+views, each in its own process. Both are driven by the same asyncio client
+at increasing numbers of concurrent connections.
+
+Run from the app directory against a migrated database:
+    python -m benchmarks.asgi_vs_wsgi --seed
+    python -m benchmarks.asgi_vs_wsgi --concurrency 1 32 128 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+
+from benchmarks.loadtest import (
+    ENDPOINTS,
+    build_context,
+    format_ms,
+    run_endpoint,
+    start_server,
+)
+from benchmarks.seed import Scale, seed
+
+DEFAULT_ENDPOINTS = ("recipes.list", "recipes.retrieve", "tags.list")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+@contextmanager
+def serve(interface: str):
+    """Run the ASGI or WSGI server in a child process, yielding its port"""
+    port = free_port()
+    env = {**os.environ, "THROTTLE_ENABLED": "0"}
+    if interface == "asgi":
+        env["ASYNC_VIEWS"] = "1"
+        command = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.asgi:application",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ]
+    else:
+        env["ASYNC_VIEWS"] = "0"
+        command = [
+            sys.executable,
+            "-m",
+            "benchmarks.asgi_vs_wsgi",
+            "--serve-wsgi",
+            str(port),
+        ]
+
+    process = subprocess.Popen(command, env=env)
+    try:
+        wait_for_port(port)
+        yield port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", action="store_true", help="Seed the dataset first")
+    parser.add_argument("--recipes-per-user", type=int, default=Scale.recipes_per_user)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--only", nargs="*", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--serve-wsgi", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_wsgi:
+        start_server(args.serve_wsgi).serve_forever()
+        return 0
+
+    if args.seed:
+        users = seed(Scale(recipes_per_user=args.recipes_per_user), "asgibench")
+    else:
+        users = get_user_model().objects.filter(email__startswith="asgibench")
+        users = users.order_by("pk")
+    ctx = build_context(users[0])
+    endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in args.only]
+
+    results = {}
+    for interface in ("wsgi", "asgi"):
+        with serve(interface) as port:
+            for endpoint in endpoints:
+                for concurrency in args.concurrency:
+                    results[interface, endpoint.name, concurrency] = asyncio.run(
+                        run_endpoint(port, endpoint, ctx, args.requests, concurrency)
+                    )
+
+    print(
+        f"{'endpoint':20} {'conns':>5}  {'wsgi req/s':>10} {'asgi req/s':>10}  "
+        f"{'wsgi p99':>9} {'asgi p99':>9}  errors"
+    )
+    for endpoint in endpoints:
+        for concurrency in args.concurrency:
+            wsgi = results["wsgi", endpoint.name, concurrency]
+            asgi = results["asgi", endpoint.name, concurrency]
+            print(
+                f"{endpoint.name:20} {concurrency:5}  "
+                f"{wsgi['throughput']:10.1f} {asgi['throughput']:10.1f}  "
+                f"{format_ms(wsgi['p99_ms'], 9)} {format_ms(asgi['p99_ms'], 9)}  "
+                f"{wsgi['errors'] + asgi['errors']}"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
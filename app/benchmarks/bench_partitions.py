@@ -0,0 +1,109 @@
+"""
+Show that the recipe endpoints only read the partitions of their user.
+
+Runs the querysets of the recipe list, tag filter and detail views and
+of the assigned tags listing for one seeded user, explains every query
+they send and reports the partitions and indexes each one reads and how
+long it takes. Index Only Scan nodes are served by covering indexes.
+
+Run from the app directory against a migrated Postgres database:
+    python -m benchmarks.bench_partitions --users 200
+
+Users are only seeded on the first run.
+"""
+import argparse
+import os
+import sys
+from typing import Iterator, List, Tuple
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from benchmarks.seed import Scale, seed  # noqa: E402
+from core.models import RecipeTag  # noqa: E402
+from recipe.views import RecipeViewSet, TagViewSet  # noqa: E402
+
+
+def relations(plan: dict) -> Iterator[str]:
+    """Yield the tables and partitions scanned by an explained plan"""
+    if "Relation Name" in plan:
+        yield f"{plan['Relation Name']} ({plan['Node Type']})"
+    for child in plan.get("Plans", ()):
+        yield from relations(child)
+
+
+def explain(sql: str) -> Tuple[List[str], float]:
+    """Return the relations read by a query and its execution time in ms"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+        (result,) = cursor.fetchone()[0]
+
+    return sorted(set(relations(result["Plan"]))), result["Execution Time"]
+
+
+def view_queries(
+    user, action: str, params: dict, pk=None, viewset=RecipeViewSet
+) -> List[str]:
+    """Return the SQL a viewset action runs to load its objects"""
+    request = Request(APIRequestFactory().get("/", params))
+    request.user = user
+    view = viewset(request=request, action=action, format_kwarg=None)
+    view.kwargs = {"pk": pk} if pk else {}
+    with CaptureQueriesContext(connection) as context:
+        if pk:
+            view.get_object()
+        else:
+            list(view.get_queryset())
+
+    return [query["sql"] for query in context.captured_queries]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--recipes-per-user", type=int, default=200)
+    args = parser.parse_args()
+
+    if connection.vendor != "postgresql":
+        sys.exit("Partitioning is only set up on Postgres")
+
+    users = list(
+        get_user_model().objects.filter(email__startswith="partitions").order_by("pk")
+    )
+    if not users:
+        users = seed(
+            Scale(users=args.users, recipes_per_user=args.recipes_per_user),
+            email_prefix="partitions",
+        )
+    # Index only scans need the visibility map VACUUM builds
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM ANALYZE")
+    user = users[len(users) // 2]
+    link = RecipeTag.objects.filter(user=user).first()
+
+    cases = [
+        ("list", view_queries(user, "list", {})),
+        ("filter by tag", view_queries(user, "list", {"tags": link.tag_id})),
+        ("retrieve", view_queries(user, "retrieve", {}, pk=link.recipe_id)),
+        (
+            "assigned tags",
+            view_queries(user, "list", {"assigned_only": 1}, viewset=TagViewSet),
+        ),
+    ]
+    print(f"{'case':<16}{'relations read':<96}{'ms':>8}")
+    for name, queries in cases:
+        for sql in queries:
+            read, elapsed = explain(sql)
+            print(f"{name:<16}{', '.join(read):<96}{elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark the recipe similarity index at a realistic per-user scale.
+
+Run from the app directory:
+    python -m benchmarks.bench_similarity --recipes 100000
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from recipe.similarity import (  # noqa: E402
+    SimilarityIndex,
+    ingredient_feature,
+    tag_feature,
+)
+
+
+def synthetic_pairs(recipes: int, ingredients: int, tags: int, seed: int):
+    """Generate (recipe id, feature) pairs with Zipf distributed popularity"""
+    rng = np.random.default_rng(seed)
+    pairs = []
+    for recipe_id in range(1, recipes + 1):
+        used_ingredients = np.unique(rng.zipf(1.3, rng.integers(3, 12)) % ingredients)
+        used_tags = np.unique(rng.zipf(1.5, rng.integers(1, 4)) % tags)
+        pairs.extend((recipe_id, ingredient_feature(int(i))) for i in used_ingredients)
+        pairs.extend((recipe_id, tag_feature(int(t))) for t in used_tags)
+
+    return pairs
+
+
+def timed(function, repeat: int) -> float:
+    """Return the mean wall time of function in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--ingredients", type=int, default=2_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    pairs = synthetic_pairs(args.recipes, args.ingredients, args.tags, args.seed)
+    recipe_ids = range(1, args.recipes + 1)
+    build_ms = timed(lambda: SimilarityIndex.from_pairs(recipe_ids, pairs), 1)
+    index = SimilarityIndex.from_pairs(recipe_ids, pairs)
+    rng = np.random.default_rng(args.seed)
+    targets = iter(rng.integers(1, args.recipes + 1, size=args.repeat * 2).tolist())
+
+    query_ms = timed(lambda: index.similar(next(targets), 10), args.repeat)
+    update_ms = timed(
+        lambda: index.update({next(targets): [ingredient_feature(1), tag_feature(1)]}),
+        args.repeat,
+    )
+
+    print(f"recipes: {args.recipes}, links: {len(pairs)}")
+    print(f"build:  {build_ms:10.2f} ms")
+    print(f"query:  {query_ms:10.2f} ms (top 10)")
+    print(f"update: {update_ms:10.2f} ms (one recipe)")
+
+
+if __name__ == "__main__":
+    main()
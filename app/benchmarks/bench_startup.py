@@ -0,0 +1,88 @@
+"""
+Measure worker startup latency of each settings profile.
+
+Every sample runs in a fresh interpreter, as a newly forked worker does
+not share imports with its parent, and times importing Django,
+django.setup(), building the WSGI handler with its middleware chain and
+loading the URLconf, which imports every view and serializer.
+
+Run from the app directory:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --profiles production --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROFILES = ("development", "production")
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import django
+imported = time.perf_counter()
+django.setup(set_prefix=False)
+setup = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+handler = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "setup": setup - imported,
+    "handler": handler - setup,
+    "urls": urls - handler,
+    "total": urls - start,
+}))
+"""
+
+PHASES = ("import", "setup", "handler", "urls", "total")
+
+
+def sample(profile: str) -> dict:
+    """Start one interpreter with profile and return its phase durations"""
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "app.settings",
+        "SETTINGS_PROFILE": profile,
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "bench-startup"),
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    return json.loads(output)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", nargs="+", default=PROFILES, choices=PROFILES)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'profile':12} {'phase':8} {'median ms':>10} {'min ms':>8}")
+    for profile in args.profiles:
+        # The first run warms the file system cache and bytecode
+        sample(profile)
+        samples = [sample(profile) for _ in range(args.runs)]
+        for phase in PHASES:
+            durations = [run[phase] * 1000 for run in samples]
+            print(
+                f"{profile:12} {phase:8} "
+                f"{statistics.median(durations):10.1f} {min(durations):8.1f}"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from benchmarks.seed import Scale, seed
+
+
+def scale_from_env() -> Scale:
+    """Read the dataset size from BENCH_* environment variables"""
+    defaults = Scale()
+    return Scale(
+        **{
+            name: int(os.environ.get(f"BENCH_{name.upper()}", getattr(defaults, name)))
+            for name in defaults.__dataclass_fields__
+        }
+    )
+
+
+def pytest_sessionstart(session):
+    """Fail --benchmark-compare runs without a stored run to compare with"""
+    benchmarks = getattr(session.config, "_benchmarksession", None)
+    if benchmarks is not None and benchmarks.compare and not benchmarks.compared_mapping:
+        raise pytest.UsageError(
+            f"No stored benchmark run in {benchmarks.storage} to compare with, "
+            "record one with --benchmark-autosave"
+        )
+
+
+@pytest.fixture(scope="session")
+def seeded_users(django_db_setup, django_db_blocker):
+    """Seed the benchmark dataset once per session"""
+    with django_db_blocker.unblock():
+        return seed(scale_from_env())
+
+
+@pytest.fixture
+def bench_user(seeded_users, db):
+    """Return the first seeded user"""
+    return seeded_users[0]
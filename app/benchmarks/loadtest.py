@@ -0,0 +1,326 @@
+"""
+In-process HTTP load test of the API endpoints.
+
+Serves the WSGI application on a local port from a thread pool and drives
+it with an asyncio client, reporting throughput and p50/p99 latency per
+endpoint. Results are compared against a baseline stored on the same
+machine and the run fails when an endpoint regresses beyond the
+threshold, or has no baseline to compare with.
+
+Endpoints writing data only run with --writes, and the rows they create
+are deleted after them, so every run measures the same dataset.
+
+Run from the app directory against a migrated database:
+    python -m benchmarks.loadtest --seed --save-baseline
+    python -m benchmarks.loadtest --threshold 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from typing import Callable, List, Optional, Tuple
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+# Measure the endpoints themselves, not the rate limits
+os.environ.setdefault("THROTTLE_ENABLED", "0")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from benchmarks.seed import PASSWORD, Scale, seed  # noqa: E402
+from core.models import Recipe  # noqa: E402
+from core.purging import Purger  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "loadtest.json"
+
+
+@dataclass
+class Endpoint:
+    """One API call of the load test"""
+
+    name: str
+    method: str
+    path: Callable[[dict], str]
+    body: Optional[Callable[[dict], dict]] = None
+    authenticated: bool = True
+    writes: bool = False
+
+
+ENDPOINTS = [
+    Endpoint("recipes.list", "GET", lambda ctx: "/api/recipe/recipes/"),
+    Endpoint(
+        "recipes.retrieve",
+        "GET",
+        lambda ctx: f"/api/recipe/recipes/{ctx['recipe_id']}/",
+    ),
+    Endpoint(
+        "recipes.filter",
+        "GET",
+        lambda ctx: f"/api/recipe/recipes/?tags={ctx['tag_id']}",
+    ),
+    Endpoint(
+        "recipes.similar",
+        "GET",
+        lambda ctx: f"/api/recipe/recipes/{ctx['recipe_id']}/similar/",
+    ),
+    Endpoint(
+        "recipes.makeable",
+        "POST",
+        lambda ctx: "/api/recipe/recipes/makeable/",
+        lambda ctx: {"ingredients": ctx["ingredient_ids"], "max_missing": 2},
+    ),
+    Endpoint(
+        "recipes.create",
+        "POST",
+        lambda ctx: "/api/recipe/recipes/",
+        lambda ctx: {
+            "title": "Load test",
+            "time_min": 5,
+            "price": "1.00",
+            "tags": [ctx["tag_id"]],
+            "ingredients": ctx["ingredient_ids"][:3],
+        },
+        writes=True,
+    ),
+    Endpoint("tags.list", "GET", lambda ctx: "/api/recipe/tags/"),
+    Endpoint("tags.assigned", "GET", lambda ctx: "/api/recipe/tags/?assigned_only=1"),
+    Endpoint("ingredients.list", "GET", lambda ctx: "/api/recipe/ingredients/"),
+    Endpoint(
+        "shopping_list",
+        "POST",
+        lambda ctx: "/api/recipe/shopping-list/",
+        lambda ctx: {"recipes": ctx["recipe_ids"]},
+    ),
+    Endpoint("stats", "GET", lambda ctx: "/api/recipe/stats/"),
+    Endpoint("user.me", "GET", lambda ctx: "/api/user/me/"),
+    Endpoint(
+        "user.token",
+        "POST",
+        lambda ctx: "/api/user/token/",
+        lambda ctx: {"email": ctx["email"], "password": PASSWORD},
+        authenticated=False,
+    ),
+]
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: int = 0):
+    """Serve the project's WSGI application, on a free local port by default"""
+    server = make_server(
+        "127.0.0.1",
+        port,
+        get_wsgi_application(),
+        server_class=ThreadingWSGIServer,
+        handler_class=QuietHandler,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def build_context(user) -> dict:
+    """Collect ids and credentials used to build request paths and bodies"""
+    token, _ = Token.objects.get_or_create(user=user)
+    recipe_ids = list(user.recipe_set.values_list("id", flat=True)[:50])
+
+    return {
+        "token": token.key,
+        "email": user.email,
+        "recipe_id": recipe_ids[0],
+        "recipe_ids": recipe_ids,
+        "tag_id": user.tag_set.values_list("id", flat=True)[0],
+        "ingredient_ids": list(user.ingredient_set.values_list("id", flat=True)[:10]),
+    }
+
+
+async def request(port: int, endpoint: Endpoint, ctx: dict) -> Tuple[float, int]:
+    """Send one request and return its latency in seconds and status code"""
+    body = b""
+    headers = [
+        f"{endpoint.method} {endpoint.path(ctx)} HTTP/1.1",
+        "Host: 127.0.0.1",
+        "Connection: close",
+        "Accept: application/json",
+    ]
+    if endpoint.authenticated:
+        headers.append(f"Authorization: Token {ctx['token']}")
+    if endpoint.body is not None:
+        body = json.dumps(endpoint.body(ctx)).encode()
+        headers.extend(("Content-Type: application/json", f"Content-Length: {len(body)}"))
+
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write("\r\n".join(headers).encode() + b"\r\n\r\n" + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    latency = time.perf_counter() - start
+
+    return latency, int(status_line.split()[1])
+
+
+async def run_endpoint(
+    port: int, endpoint: Endpoint, ctx: dict, requests: int, concurrency: int
+) -> dict:
+    """Send requests to one endpoint with bounded concurrency"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            latency, status = await request(port, endpoint, ctx)
+            latencies.append(latency)
+            errors += status >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50 = p99 = None
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p99 = quantiles[49] * 1000, quantiles[98] * 1000
+
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": p50,
+        "p99_ms": p99,
+        "errors": errors,
+        "samples": len(latencies),
+    }
+
+
+def format_ms(value: Optional[float], width: int = 8) -> str:
+    """Format a latency, which is missing with fewer than two samples"""
+    return f"{value:{width}.2f}" if value is not None else f"{'n/a':>{width}}"
+
+
+def delete_created(user, last_recipe_id: int) -> None:
+    """Delete the recipes a writing endpoint created, restoring the dataset"""
+    Purger().delete_recipes(user, Recipe.objects.filter(pk__gt=last_recipe_id))
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Describe every endpoint slower than its baseline beyond threshold"""
+    failures = []
+    for name, result in results.items():
+        if result["errors"]:
+            failures.append(f"{name}: {result['errors']} failed requests")
+        if result["p99_ms"] is None:
+            failures.append(
+                f"{name}: too few samples ({result['samples']}), raise --requests"
+            )
+            continue
+        expected = baseline.get(name)
+        if expected is None or expected.get("p99_ms") is None:
+            failures.append(f"{name}: no baseline, run with --save-baseline")
+            continue
+        if result["p99_ms"] > expected["p99_ms"] * (1 + threshold):
+            failures.append(
+                f"{name}: p99 {result['p99_ms']:.1f} ms "
+                f"> baseline {expected['p99_ms']:.1f} ms"
+            )
+        if result["throughput"] < expected["throughput"] * (1 - threshold):
+            failures.append(
+                f"{name}: {result['throughput']:.1f} req/s "
+                f"< baseline {expected['throughput']:.1f} req/s"
+            )
+
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", action="store_true", help="Seed the dataset first")
+    parser.add_argument("--recipes-per-user", type=int, default=Scale.recipes_per_user)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", nargs="*", help="Endpoint names to run")
+    parser.add_argument(
+        "--writes",
+        action="store_true",
+        help="Also run endpoints writing data, deleting what they create",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.seed:
+        users = seed(Scale(recipes_per_user=args.recipes_per_user), "loadtest")
+    else:
+        users = get_user_model().objects.filter(email__startswith="loadtest")
+        users = users.order_by("pk")
+    user = users[0]
+    ctx = build_context(user)
+
+    server = start_server()
+    port = server.server_address[1]
+    results = {}
+    try:
+        for endpoint in ENDPOINTS:
+            if args.only and endpoint.name not in args.only:
+                continue
+            if endpoint.writes and not args.writes:
+                continue
+            last_recipe_id = Recipe.objects.filter(user=user).latest("pk").pk
+            try:
+                results[endpoint.name] = asyncio.run(
+                    run_endpoint(port, endpoint, ctx, args.requests, args.concurrency)
+                )
+            finally:
+                if endpoint.writes:
+                    delete_created(user, last_recipe_id)
+            result = results[endpoint.name]
+            print(
+                f"{endpoint.name:20} {result['throughput']:8.1f} req/s  "
+                f"p50 {format_ms(result['p50_ms'])} ms  "
+                f"p99 {format_ms(result['p99_ms'])} ms  "
+                f"errors {result['errors']}"
+            )
+    finally:
+        server.shutdown()
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline in {args.baseline}, run with --save-baseline to record one")
+        return 1
+
+    baseline = json.loads(args.baseline.read_text())
+    failures = regressions(results, baseline, args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+from dataclasses import asdict, dataclass
+from typing import List
+
+from django.contrib.auth import get_user_model
+
+from core.seeding import SeedConfig, Seeder
+
+PASSWORD = "benchmark-password"
+
+
+@dataclass
+class Scale:
+    """Size of a seeded dataset"""
+
+    users: int = 2
+    recipes_per_user: int = 200
+    tags_per_user: int = 20
+    ingredients_per_user: int = 60
+    tags_per_recipe: int = 3
+    ingredients_per_recipe: int = 6
+    seed: int = 42
+
+
+def seed(scale: Scale, email_prefix: str = "bench") -> List:
+    """
+    Create a deterministic dataset of users with tags, ingredients and
+    recipes. The same scale and seed always produce the same rows.
+    """
+    config = SeedConfig(**asdict(scale), email_prefix=email_prefix, password=PASSWORD)
+    Seeder(config).run()
+
+    return list(
+        get_user_model()
+        .objects.filter(email__startswith=email_prefix)
+        .order_by("pk")
+    )
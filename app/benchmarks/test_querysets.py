@@ -0,0 +1,44 @@
+from django.db.models import Q
+
+from core.models import Tag, Recipe
+from recipe.similarity import SimilarityIndex
+
+
+def test_recipe_list_queryset(benchmark, bench_user) -> None:
+    """Benchmark loading a user's recipes with their links"""
+    queryset = Recipe.objects.filter(user=bench_user).prefetch_related(
+        "tags", "ingredients"
+    )
+
+    recipes = benchmark(lambda: list(queryset.all()))
+
+    assert recipes
+
+
+def test_recipe_filter_queryset(benchmark, bench_user) -> None:
+    """Benchmark filtering recipes by tags and ingredients"""
+    tag_ids = list(bench_user.tag_set.values_list("id", flat=True)[:3])
+    ingredient_ids = list(bench_user.ingredient_set.values_list("id", flat=True)[:3])
+    filters = (
+        Q(user=bench_user)
+        & Q(tags__id__in=tag_ids)
+        & Q(ingredients__id__in=ingredient_ids)
+    )
+
+    benchmark(lambda: list(Recipe.objects.filter(filters).distinct()))
+
+
+def test_assigned_tags_queryset(benchmark, bench_user) -> None:
+    """Benchmark listing the tags used by at least one recipe"""
+    queryset = Tag.objects.filter(user=bench_user, recipe_count__gt=0)
+
+    tags = benchmark(lambda: list(queryset.order_by("-name")))
+
+    assert tags
+
+
+def test_similarity_index_build(benchmark, bench_user) -> None:
+    """Benchmark building a user's recipe similarity index"""
+    index = benchmark(lambda: SimilarityIndex.build(bench_user))
+
+    assert len(index.recipe_ids)
@@ -0,0 +1,39 @@
+from core.models import Recipe
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    TagSerializer,
+)
+
+
+def test_recipe_list_serializer(benchmark, bench_user) -> None:
+    """Benchmark serializing a user's recipe list"""
+    recipes = list(
+        Recipe.objects.filter(user=bench_user).prefetch_related("tags", "ingredients")
+    )
+
+    data = benchmark(lambda: RecipeSerializer(recipes, many=True).data)
+
+    assert len(data) == len(recipes)
+
+
+def test_recipe_detail_serializer(benchmark, bench_user) -> None:
+    """Benchmark serializing a recipe with nested tags and ingredients"""
+    recipe = (
+        Recipe.objects.filter(user=bench_user)
+        .prefetch_related("tags", "ingredients")
+        .first()
+    )
+
+    data = benchmark(lambda: RecipeDetailSerializer(recipe).data)
+
+    assert data["id"] == recipe.id
+
+
+def test_tag_list_serializer(benchmark, bench_user) -> None:
+    """Benchmark serializing a user's tags"""
+    tags = list(bench_user.tag_set.all())
+
+    data = benchmark(lambda: TagSerializer(tags, many=True).data)
+
+    assert len(data) == len(tags)
@@ -1,7 +1,13 @@
-from typing import Callable
+import difflib
+import re
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Callable, List, Optional
 
 import pytest
 
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
 from rest_framework.test import APIClient
 from core.models import Ingredient, Tag, Recipe
 
@@ -14,6 +20,134 @@ class dotdict(dict):
     __delattr__ = dict.__delitem__
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-sql-snapshots",
+        action="store_true",
+        help="Rewrite SQL snapshots recorded by the query_guard fixture",
+    )
+    parser.addoption(
+        "--explain-queries",
+        action="store_true",
+        help="Check EXPLAIN output of queries recorded by the query_guard fixture",
+    )
+
+
+def normalize_sql(sql: str) -> str:
+    """Replace literals of a query so that it only depends on its shape"""
+    sql = re.sub(r'"s\d+_x\d+"', '"?"', sql)
+    # Server side cursors of iterator() are named after the thread
+    sql = re.sub(r'"_django_curs_\w+"', '"_django_curs"', sql)
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"IN \((?:\?, )*\?\)", "IN (...)", sql)
+
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class QueryGuard:
+    """Assert query counts, SQL shape and plans of an API call"""
+
+    def __init__(self, request, max_queries: Optional[int]) -> None:
+        self.request = request
+        self.max_queries = max_queries
+        self.snapshot_dir = (
+            Path(request.fspath).parent / "sql_snapshots" / connection.vendor
+        )
+
+    def capture(self, call: Callable) -> List[str]:
+        """
+        Run call and return the SQL it executed on any database, queries on
+        other databases than the default one prefixed with their alias
+        """
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db = context["connection"]
+                if not many:
+                    sql = db.ops.last_executed_query(context["cursor"], sql, params)
+                if db.alias != DEFAULT_DB_ALIAS:
+                    sql = f"/* {db.alias} */ {sql}"
+                queries.append(sql)
+
+        with ExitStack() as stack:
+            for db in connections.all():
+                stack.enter_context(db.execute_wrapper(record))
+            call()
+
+        return queries
+
+    def check(
+        self, call: Callable, grow: Callable = None, name: str = None
+    ) -> List[str]:
+        """
+        Run call and assert it stays within max_queries. When grow is given
+        it is called to add rows and the query count must not change.
+        """
+        queries = self.capture(call)
+        if self.max_queries is not None:
+            assert len(queries) <= self.max_queries, "\n".join(queries)
+        if grow is not None:
+            grow()
+            grown = self.capture(call)
+            assert len(grown) == len(queries), "\n".join(grown)
+
+        self.compare_snapshot(queries, name)
+        if self.request.config.getoption("--explain-queries"):
+            self.explain(queries)
+
+        return queries
+
+    def compare_snapshot(self, queries: List[str], name: str = None) -> None:
+        """Compare normalized SQL with the snapshot stored for this test"""
+        stem = f"{Path(self.request.fspath).stem}.{self.request.node.name}"
+        path = self.snapshot_dir / f"{stem}.{name}.sql" if name else None
+        path = path or self.snapshot_dir / f"{stem}.sql"
+        current = "".join(f"{normalize_sql(sql)}\n" for sql in queries)
+
+        if self.request.config.getoption("--update-sql-snapshots"):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(current)
+            return
+        if not path.exists():
+            pytest.fail(
+                f"No SQL snapshot {path}, record it with --update-sql-snapshots"
+            )
+
+        expected = path.read_text()
+        diff = difflib.unified_diff(
+            expected.splitlines(), current.splitlines(), lineterm=""
+        )
+        assert current == expected, f"SQL changed for {path.name}:\n" + "\n".join(
+            diff
+        )
+
+    def explain(self, queries: List[str]) -> None:
+        """
+        Assert that no SELECT is planned as a scan of a whole table, with
+        sequential scans discouraged on PostgreSQL so tiny test tables
+        still show whether an index is usable
+        """
+        prefix = connection.ops.explain_query_prefix()
+        if connection.vendor == "postgresql":
+            full_scan = re.compile(r"Seq Scan on core_\w+")
+        else:
+            full_scan = re.compile(r"\bSCAN (TABLE )?core_\w+(?! USING)\b")
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            for sql in queries:
+                if not sql.startswith("SELECT"):
+                    continue
+                cursor.execute(f"{prefix} {sql}")
+                plan = "\n".join(str(row) for row in cursor.fetchall())
+                assert not full_scan.search(plan), f"{sql}\n{plan}"
+
+
 def sample_tag(user, name="Test tag") -> Tag:
     """Create and return a sample tag"""
     return Tag.objects.create(user=user, name=name)
@@ -44,12 +178,28 @@ def helper_functions() -> dotdict[Callable]:
     return dotdict(functions)
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start and finish every test with an empty cache"""
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def api_client() -> APIClient:
     """Helper object for HTTP requests"""
     return APIClient()
 
 
+@pytest.fixture
+def query_guard(request, db) -> QueryGuard:
+    """Guard the queries of an API call, bounded by the max_queries marker"""
+    marker = request.node.get_closest_marker("max_queries")
+
+    return QueryGuard(request, marker.args[0] if marker else None)
+
+
 @pytest.fixture
 def create_user(django_user_model):
     """Helper function for creating user"""
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from core import models
@@ -42,3 +43,21 @@ class CustomUserAdmin(UserAdmin):
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
 admin.site.register(models.Recipe)
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "queue", "status", "attempts", "run_after")
+    list_filter = ("status", "queue", "name")
+    ordering = ("-id",)
+    readonly_fields = ("locked_by", "locked_at", "last_error", "created_at")
+    actions = ("retry",)
+
+    @admin.action(description=_("Retry selected jobs now"))
+    def retry(self, request, queryset):
+        queryset.exclude(status=models.Job.Status.RUNNING).update(
+            status=models.Job.Status.QUEUED,
+            attempts=0,
+            run_after=timezone.now(),
+            finished_at=None,
+        )
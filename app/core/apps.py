@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import signals  # noqa: F401
+        from core.middleware import install_query_metrics
+
+        connection_created.connect(
+            install_query_metrics, dispatch_uid="core.query_metrics"
+        )
@@ -0,0 +1,225 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import prefetch_related_objects
+from rest_framework import status
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[ThreadPoolExecutor]:
+    """
+    Return the thread pool running ORM work of async views, or None when
+    ASYNC_DB_THREADS is 0 and Django's single sync thread is used
+    """
+    global _executor
+    threads = getattr(settings, "ASYNC_DB_THREADS", 0)
+    if not threads:
+        return None
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix="async-db"
+            )
+
+    return _executor
+
+
+def _run_db_job(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # Pool threads outlive requests, close connections past CONN_MAX_AGE
+        # or left unusable like the request_finished signal does
+        close_old_connections()
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run sync code touching the database from async code. With a thread pool
+    configured independent calls run concurrently, each on the connection
+    of its pool thread; context variables such as the request's query
+    metrics are carried over.
+    """
+    executor = get_executor()
+    if executor is None:
+        return await sync_to_async(fn)(*args, **kwargs)
+
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, context.run, partial(_run_db_job, fn, args, kwargs)
+    )
+
+
+async def aprefetch_related(instances, *lookups) -> None:
+    """Like prefetch_related_objects, running the lookups concurrently"""
+    if not instances or not lookups:
+        return
+
+    # Create the caches up front, concurrent lookups would race to do it
+    for instance in instances:
+        if not hasattr(instance, "_prefetched_objects_cache"):
+            instance._prefetched_objects_cache = {}
+
+    await asyncio.gather(
+        *(run_db(prefetch_related_objects, instances, lookup) for lookup in lookups)
+    )
+
+
+class AsyncAPIViewMixin:
+    """
+    Serve a DRF view from an async view function, see as_async_view.
+
+    Authentication, permission and throttle checks run through run_db
+    like any ORM access. Handlers named a<method>, e.g. apost, are awaited
+    on the event loop so they can await slow work such as password hashing
+    without holding a thread; methods without an async handler fall back
+    to the sync one. as_view returns the async view when ASYNC_VIEWS is set.
+    """
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        if getattr(settings, "ASYNC_VIEWS", False):
+            return cls.as_async_view(*args, **initkwargs)
+
+        return super().as_view(*args, **initkwargs)
+
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        """Return an async view function, the counterpart of as_view"""
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.csrf_exempt = True
+
+        return view
+
+    def get_async_handler(self, method: str):
+        """Return the coroutine function handling an HTTP method"""
+        if method not in self.http_method_names:
+            return partial(run_db, self.http_method_not_allowed)
+
+        handler = getattr(self, f"a{method}", None)
+        if handler is not None:
+            return handler
+
+        return partial(run_db, getattr(self, method, self.http_method_not_allowed))
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Async version of APIView.dispatch"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_db(self.initial, request, *args, **kwargs)
+            handler = self.get_async_handler(request.method.lower())
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncViewSetMixin(AsyncAPIViewMixin):
+    """
+    Viewset served by async views when ASYNC_VIEWS is set, as it is by the
+    ASGI entry point. The list, retrieve and create actions are async and
+    run prefetch_related lookups of the queryset concurrently; other
+    actions run their sync implementation through run_db.
+    """
+
+    @classmethod
+    def as_async_view(cls, actions=None, **initkwargs):
+        """Async counterpart of ViewSetMixin.as_view"""
+        # ViewSetMixin.as_view validates the arguments and resets the class
+        # attributes
+        sync_view = super(AsyncAPIViewMixin, cls).as_view(actions, **initkwargs)
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            if "get" in actions and "head" not in actions:
+                actions["head"] = actions["get"]
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = sync_view.initkwargs
+        view.actions = sync_view.actions
+        view.csrf_exempt = True
+
+        return view
+
+    def get_async_handler(self, method: str):
+        action = self.action_map.get(method)
+        handler = getattr(self, f"a{action}", None) if action else None
+
+        return handler or super().get_async_handler(method)
+
+    async def alist(self, request, *args, **kwargs):
+        """Async version of ListModelMixin.list"""
+        if self.paginator is not None:
+            return await run_db(self.list, request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookups = queryset._prefetch_related_lookups
+        instances = await run_db(list, queryset.prefetch_related(None))
+        await aprefetch_related(instances, *lookups)
+
+        return Response(self.get_serializer(instances, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        """Async version of RetrieveModelMixin.retrieve"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookups = queryset._prefetch_related_lookups
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filters = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+
+        def get_object():
+            instance = get_object_or_404(queryset.prefetch_related(None), **filters)
+            self.check_object_permissions(request, instance)
+            return instance
+
+        instance = await run_db(get_object)
+        await aprefetch_related([instance], *lookups)
+
+        return Response(self.get_serializer(instance).data)
+
+    async def acreate(self, request, *args, **kwargs):
+        """Async version of CreateModelMixin.create"""
+        serializer = self.get_serializer(data=request.data)
+
+        def create():
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
+            return serializer.data
+
+        data = await run_db(create)
+        headers = self.get_success_headers(data)
+
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
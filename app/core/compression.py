@@ -0,0 +1,110 @@
+"""
+Content codings for compressing responses.
+
+gzip is always available, zstd and br when the zstandard and brotli (or
+brotlicffi) packages are installed. CODINGS lists the available ones in
+order of preference: at comparable speed zstd and brotli produce smaller
+JSON bodies than gzip. Streams are flushed after every chunk so clients
+receive data as soon as the view produces it.
+"""
+import gzip
+import re
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Higher levels cost a lot more CPU for a few percent smaller bodies
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+class Coding(NamedTuple):
+    name: str
+    compress: Callable[[bytes], bytes]
+    stream: Callable[[Iterable[bytes]], Iterator[bytes]]
+
+
+def gzip_compress(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # wbits 16 + MAX_WBITS writes a gzip header and trailer
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def brotli_compress(data: bytes) -> bytes:
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def brotli_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def zstd_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        data += compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+CODINGS: Dict[str, Coding] = {}
+if zstandard is not None:
+    CODINGS["zstd"] = Coding("zstd", zstd_compress, zstd_stream)
+if brotli is not None:
+    CODINGS["br"] = Coding("br", brotli_compress, brotli_stream)
+CODINGS["gzip"] = Coding("gzip", gzip_compress, gzip_stream)
+
+ACCEPT_RE = re.compile(r"\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?")
+
+
+def negotiate(accept_encoding: str) -> Optional[Coding]:
+    """
+    Return the coding the Accept-Encoding header weighs highest, the
+    earliest of CODINGS among equals, None if it accepts none of them
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        match = ACCEPT_RE.match(part)
+        if match:
+            try:
+                weights[match.group(1)] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+    default = weights.get("*", 0)
+    weight, coding = max(
+        ((weights.get(coding.name, default), coding) for coding in CODINGS.values()),
+        key=lambda candidate: candidate[0],
+    )
+
+    return coding if weight > 0 else None
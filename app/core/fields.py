@@ -0,0 +1,177 @@
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Max, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor
+from django.utils.functional import cached_property
+
+
+class OwnedManyToManyDescriptor(ManyToManyDescriptor):
+    """Descriptor whose related managers fill in the owner of new links"""
+
+    @cached_property
+    def related_manager_cls(self):
+        manager_cls = super().related_manager_cls
+
+        class OwnedManyRelatedManager(manager_cls):
+            def owner_filter(self, queryset, user_ids):
+                """
+                Restrict the joined through table to the owners, like the
+                stock manager selects its columns with extra, so that
+                partitions of other users are pruned
+                """
+                qn = connections[queryset.db].ops.quote_name
+                column = f"{qn(self.through._meta.db_table)}.{qn('user_id')}"
+                placeholders = ", ".join(["%s"] * len(user_ids))
+
+                return queryset.extra(
+                    where=[f"{column} IN ({placeholders})"], params=list(user_ids)
+                )
+
+            @property
+            def ordered(self):
+                """Whether the links are listed by the position of the through model"""
+                return not self.reverse and any(
+                    field.name == "position" for field in self.through._meta.fields
+                )
+
+            def position_order(self, queryset):
+                """Order by the position of the joined through table"""
+                qn = connections[queryset.db].ops.quote_name
+                table = qn(self.through._meta.db_table)
+                target = self.through._meta.get_field(self.target_field_name).column
+
+                return queryset.order_by(
+                    RawSQL(f"{table}.{qn('position')}", ()),
+                    RawSQL(f"{table}.{qn(target)}", ()),
+                )
+
+            def _apply_rel_filters(self, queryset):
+                queryset = super()._apply_rel_filters(queryset)
+                if self.ordered:
+                    queryset = self.position_order(queryset)
+                return self.owner_filter(queryset, [self.instance.user_id])
+
+            def get_prefetch_queryset(self, instances, queryset=None):
+                queryset, *rest = super().get_prefetch_queryset(instances, queryset)
+                user_ids = sorted({instance.user_id for instance in instances})
+                if self.ordered and not queryset.query.order_by:
+                    queryset = self.position_order(queryset)
+                return (self.owner_filter(queryset, user_ids), *rest)
+
+            def add(self, *objs, through_defaults=None):
+                db = router.db_for_write(self.through, instance=self.instance)
+                with transaction.atomic(using=db, savepoint=False):
+                    if not self.ordered or getattr(self, "setting", False):
+                        super().add(*objs, through_defaults=through_defaults)
+                        return
+                    # Concurrent adds would number their links after the
+                    # same last position, they wait for each other instead
+                    self.lock_instance(db)
+                    linked = set(
+                        self.links(db)
+                        .filter(**{f"{self.target_id}__in": self.target_ids(objs)})
+                        .values_list(self.target_id, flat=True)
+                    )
+                    super().add(*objs, through_defaults=through_defaults)
+                    # Links that existed already keep their position
+                    self.set_positions(
+                        db,
+                        [obj for obj in objs if getattr(obj, "pk", obj) not in linked],
+                        append=True,
+                    )
+
+            def set(self, objs, *, clear=False, through_defaults=None):
+                objs = tuple(objs)
+                db = router.db_for_write(self.through, instance=self.instance)
+                with transaction.atomic(using=db, savepoint=False):
+                    # Positions of new links follow the order of objs
+                    self.setting = True
+                    try:
+                        super().set(objs, clear=clear, through_defaults=through_defaults)
+                    finally:
+                        self.setting = False
+                    if self.ordered:
+                        self.set_positions(db, objs)
+
+            @property
+            def target_id(self):
+                return f"{self.target_field_name}_id"
+
+            def target_ids(self, objs):
+                return list(dict.fromkeys(getattr(obj, "pk", obj) for obj in objs))
+
+            def links(self, db):
+                """Return the through rows of the instance"""
+                return self.through._default_manager.using(db).filter(
+                    user_id=self.instance.user_id,
+                    **{self.source_field_name: self.related_val[0]},
+                )
+
+            def lock_instance(self, db):
+                """Lock the row of the instance until the end of the transaction"""
+                model = self.instance._meta.model
+                rows = model._base_manager.using(db).select_for_update()
+                list(rows.filter(pk=self.related_val[0]).values_list("pk"))
+
+            def set_positions(self, db, objs, append=False):
+                """
+                Number the links to objs in their order, after the other
+                links if append is set
+                """
+                target_ids = self.target_ids(objs)
+                if not target_ids:
+                    return
+                links = self.links(db)
+                target = self.target_id
+                start = 0
+                if append:
+                    others = links.exclude(**{f"{target}__in": target_ids})
+                    start = others.aggregate(next=Max("position") + 1)["next"] or 0
+
+                links.filter(**{f"{target}__in": target_ids}).update(
+                    position=Case(
+                        *(
+                            When(**{target: target_id}, then=Value(start + index))
+                            for index, target_id in enumerate(target_ids)
+                        )
+                    )
+                )
+
+            def _add_items(
+                self, source_field_name, target_field_name, *objs, through_defaults=None
+            ):
+                # Both ends belong to the same user, so either one names it
+                through_defaults = {
+                    "user_id": self.instance.user_id,
+                    **(through_defaults or {}),
+                }
+                return super()._add_items(
+                    source_field_name,
+                    target_field_name,
+                    *objs,
+                    through_defaults=through_defaults,
+                )
+
+        return OwnedManyRelatedManager
+
+
+class OwnedManyToManyField(models.ManyToManyField):
+    """
+    Many to many relation between objects owned by the same user, through
+    a model with a user foreign key. Links created with add, set or create
+    on either side get the user of the instance, so the through table can
+    be filtered and partitioned by user without joining the related tables.
+    """
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.name, OwnedManyToManyDescriptor(self.remote_field))
+
+    def contribute_to_related_class(self, cls, related):
+        super().contribute_to_related_class(cls, related)
+        if not self.remote_field.is_hidden() and not related.related_model._meta.swapped:
+            setattr(
+                cls,
+                related.get_accessor_name(),
+                OwnedManyToManyDescriptor(self.remote_field, reverse=True),
+            )
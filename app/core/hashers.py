@@ -0,0 +1,242 @@
+import asyncio
+import base64
+import hashlib
+import inspect
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import (
+    _clean_credentials,
+    _get_backends,
+    authenticate,
+    get_user_model,
+)
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    get_hasher,
+    identify_hasher,
+    is_password_usable,
+    make_password,
+)
+from django.contrib.auth.signals import user_login_failed
+from django.core.exceptions import PermissionDenied
+from django.utils.crypto import constant_time_compare, pbkdf2
+
+from core.asyncviews import run_db
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def pbkdf2_hash(password: str, salt: str, iterations: int, digest: str) -> str:
+    """Return the base64 encoded PBKDF2 hash, run in the worker processes"""
+    hash = pbkdf2(password, salt, iterations, digest=getattr(hashlib, digest))
+    return base64.b64encode(hash).decode("ascii").strip()
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Return the process pool hashing passwords, or None when
+    PASSWORD_HASHING_WORKERS is 0 and hashing runs in the calling thread
+    """
+    global _pool, _pool_slots
+    workers = getattr(settings, "PASSWORD_HASHING_WORKERS", 0)
+    if not workers:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            queued = getattr(settings, "PASSWORD_HASHING_QUEUE", 4)
+            _pool_slots = threading.BoundedSemaphore(workers * queued)
+
+    return _pool
+
+
+def submit(fn, *args, blocking: bool = True) -> Optional[Future]:
+    """
+    Run fn in the hashing pool. At most PASSWORD_HASHING_QUEUE jobs per
+    worker are queued, further callers block until a slot frees up, or
+    get None back when not blocking.
+    """
+    pool = get_pool()
+    if not _pool_slots.acquire(blocking=blocking):
+        return None
+    try:
+        future = pool.submit(fn, *args)
+    except BaseException:
+        _pool_slots.release()
+        raise
+    future.add_done_callback(lambda _: _pool_slots.release())
+
+    return future
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher computing hashes in a process pool so the CPU time is
+    not spent on the request thread. The iteration count is read from the
+    PASSWORD_HASH_ITERATIONS setting, see the calibrate_password_hashing
+    command, and hashes with a different count are upgraded on login.
+    """
+
+    @property
+    def iterations(self) -> int:
+        return (
+            getattr(settings, "PASSWORD_HASH_ITERATIONS", None)
+            or PBKDF2PasswordHasher.iterations
+        )
+
+    def format(self, hash: str, salt: str, iterations: int) -> str:
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
+
+    def encode(self, password, salt, iterations=None):
+        assert password is not None
+        assert salt and "$" not in salt
+        iterations = iterations or self.iterations
+        args = (password, salt, iterations, self.digest().name)
+        if get_pool() is None:
+            return self.format(pbkdf2_hash(*args), salt, iterations)
+
+        return self.format(submit(pbkdf2_hash, *args).result(), salt, iterations)
+
+    async def aencode(self, password, salt, iterations=None) -> str:
+        """Encode without blocking the event loop"""
+        assert password is not None
+        assert salt and "$" not in salt
+        iterations = iterations or self.iterations
+        args = (password, salt, iterations, self.digest().name)
+        if get_pool() is None:
+            hash = await sync_to_async(pbkdf2_hash, thread_sensitive=False)(*args)
+        else:
+            future = submit(pbkdf2_hash, *args, blocking=False)
+            if future is None:
+                # Wait for a free slot off the event loop
+                future = await sync_to_async(submit, thread_sensitive=False)(
+                    pbkdf2_hash, *args
+                )
+            hash = await asyncio.wrap_future(future)
+
+        return self.format(hash, salt, iterations)
+
+
+async def amake_password(password: str) -> str:
+    """Async version of make_password"""
+    hasher = get_hasher()
+    if not hasattr(hasher, "aencode"):
+        return await sync_to_async(make_password, thread_sensitive=False)(
+            password, hasher=hasher
+        )
+
+    return await hasher.aencode(password, hasher.salt())
+
+
+async def acheck_password(password, encoded, setter=None) -> bool:
+    """
+    Async version of django.contrib.auth.hashers.check_password, hashing
+    with aencode where the hasher has it. The setter is awaited.
+    """
+    if password is None or not is_password_usable(encoded):
+        return False
+
+    preferred = get_hasher()
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    if hasattr(hasher, "aencode"):
+        decoded = hasher.decode(encoded)
+        candidate = await hasher.aencode(
+            password, decoded["salt"], decoded["iterations"]
+        )
+        is_correct = constant_time_compare(encoded, candidate)
+    else:
+        is_correct = await sync_to_async(hasher.verify, thread_sensitive=False)(
+            password, encoded
+        )
+
+    if not is_correct and not hasher_changed and must_update:
+        await sync_to_async(hasher.harden_runtime, thread_sensitive=False)(
+            password, encoded
+        )
+    if setter and is_correct and must_update:
+        await setter(password)
+
+    return is_correct
+
+
+async def amodel_authenticate(
+    backend, request, username=None, password=None, **kwargs
+):
+    """Async version of ModelBackend.authenticate"""
+    user_model = get_user_model()
+    if username is None:
+        username = kwargs.get(user_model.USERNAME_FIELD)
+    if username is None or password is None:
+        return None
+
+    try:
+        user = await run_db(user_model._default_manager.get_by_natural_key, username)
+    except user_model.DoesNotExist:
+        # Hash anyway so unknown users take as long to reject as wrong passwords
+        await amake_password(password)
+        return None
+
+    async def upgrade(raw_password):
+        user.password = await amake_password(raw_password)
+        user._password = raw_password
+        await run_db(user.save, update_fields=["password"])
+
+    if await acheck_password(password, user.password, upgrade):
+        if backend.user_can_authenticate(user):
+            return user
+
+    return None
+
+
+async def aauthenticate(request=None, **credentials):
+    """
+    Async version of django.contrib.auth.authenticate. Model backends look
+    users up on a database thread and check passwords on the event loop,
+    so no database thread waits on the hashing pool; other backends run
+    on a database thread. Login signals, inactive users and hash upgrades
+    are handled as in sync views.
+    """
+    # Loads the auth models, which the hashing processes never set up
+    from django.contrib.auth.backends import ModelBackend
+
+    for backend, backend_path in _get_backends(return_tuples=True):
+        try:
+            inspect.signature(backend.authenticate).bind(request, **credentials)
+        except TypeError:
+            continue
+
+        try:
+            if type(backend).authenticate is ModelBackend.authenticate:
+                user = await amodel_authenticate(backend, request, **credentials)
+            else:
+                user = await run_db(backend.authenticate, request, **credentials)
+        except PermissionDenied:
+            break
+        if user is None:
+            continue
+
+        user.backend = backend_path
+        return user
+
+    await run_db(
+        user_login_failed.send,
+        sender=authenticate.__module__,
+        credentials=_clean_credentials(credentials),
+        request=request,
+    )
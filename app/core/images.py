@@ -0,0 +1,54 @@
+"""
+Resized variants of recipe images.
+
+Each variant in RECIPE_IMAGE_VARIANTS is a copy of the uploaded image
+scaled down to fit a bounding box, written by a background job to the
+same storage as the original under variants/<variant>/<original name>.
+Variants are served and deleted through that storage too. Pillow is
+only imported by the job writing them, not by workers serving requests.
+"""
+from io import BytesIO
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+def variant_name(name: str, variant: str) -> str:
+    return f"variants/{variant}/{name}"
+
+
+def variant_names(name: str) -> List[str]:
+    """Return the names of all variants of an image"""
+    return [variant_name(name, variant) for variant in settings.RECIPE_IMAGE_VARIANTS]
+
+
+def variant_urls(name: str, storage=default_storage) -> Dict[str, str]:
+    """Return the URLs of an image's variants by variant"""
+    return {
+        variant: storage.url(variant_name(name, variant))
+        for variant in settings.RECIPE_IMAGE_VARIANTS
+    }
+
+
+def make_variants(name: str, storage=default_storage) -> List[str]:
+    """Write the variants of an image, replacing existing ones"""
+    from PIL import Image
+
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+
+    written = []
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size)
+        buffer = BytesIO()
+        resized.save(buffer, format=image.format)
+        target = variant_name(name, variant)
+        # Storage.save picks another name for a taken one
+        storage.delete(target)
+        written.append(storage.save(target, ContentFile(buffer.getvalue())))
+
+    return written
@@ -0,0 +1,211 @@
+"""
+Database backed queue of background jobs.
+
+Jobs are rows of core.Job naming a function registered with @task and its
+JSON keyword arguments. Jobs enqueued inside a transaction only become
+visible when it commits. Workers started with the run_worker command claim
+ready jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of them
+can share the table, and run them in a process pool. Failed jobs are
+retried with exponential backoff until they run out of attempts, jobs of
+a worker that died are claimed again after JOB_TIMEOUT_SECONDS.
+
+Tasks are registered by importing the tasks module of every app.
+"""
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core import metrics
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+registry: Dict[str, Callable] = {}
+
+
+def task(name: str) -> Callable:
+    """Register a function as a task, run by workers with the job's kwargs"""
+
+    def register(function: Callable) -> Callable:
+        if name in registry and registry[name] is not function:
+            raise ValueError(f"Task {name} is already registered")
+        registry[name] = function
+        return function
+
+    return register
+
+
+def autodiscover() -> None:
+    """Import the tasks module of every installed app"""
+    autodiscover_modules("tasks")
+
+
+def enqueue(
+    name: str,
+    queue: str = "default",
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+    **kwargs,
+) -> Job:
+    """Queue a task to run in a worker once the current transaction commits"""
+    return Job.objects.using(DEFAULT_DB_ALIAS).create(
+        name=name,
+        queue=queue,
+        kwargs=kwargs,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Return seconds before the next attempt, doubling with each failure"""
+    delay = min(
+        settings.JOB_RETRY_DELAY_SECONDS * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY_SECONDS,
+    )
+    # Spread retries of jobs failing together
+    return delay * random.uniform(0.5, 1)
+
+
+def claim(worker: str, limit: int, queues: Sequence[str] = ("default",)) -> List[int]:
+    """
+    Mark up to limit ready jobs as running for a worker and return their
+    ids, oldest first. Running jobs not finished within JOB_TIMEOUT_SECONDS
+    are claimed again as their worker is assumed dead, or failed if that
+    was their last attempt.
+    """
+    now = timezone.now()
+    jobs = Job.objects.using(DEFAULT_DB_ALIAS)
+    stale = Q(
+        status=Job.Status.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS),
+    )
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        jobs.filter(stale, attempts__gte=F("max_attempts"), queue__in=queues).update(
+            status=Job.Status.FAILED,
+            finished_at=now,
+            last_error="Timed out",
+            locked_by="",
+            locked_at=None,
+        )
+        ids = list(
+            jobs.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.Status.QUEUED, run_after__lte=now) | stale,
+                queue__in=queues,
+            )
+            .order_by("run_after", "pk")
+            .values_list("pk", flat=True)[:limit]
+        )
+        jobs.filter(pk__in=ids).update(
+            status=Job.Status.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_by=worker,
+            locked_at=now,
+        )
+
+    return ids
+
+
+def run_job(job_id: int) -> str:
+    """Run a claimed job and record the outcome, returning the new status"""
+    job = Job.objects.using(DEFAULT_DB_ALIAS).get(pk=job_id)
+    start = time.perf_counter()
+    try:
+        function = registry[job.name]
+        function(**job.kwargs)
+    except Exception:
+        record_failure(job, traceback.format_exc())
+        logger.warning("Job %s %s failed", job.pk, job.name, exc_info=True)
+    else:
+        job.status = Job.Status.DONE
+        job.finished_at = timezone.now()
+    metrics.JOB_DURATION.labels(job.name).observe(time.perf_counter() - start)
+
+    return finish(job)
+
+
+def record_failure(job: Job, error: str) -> None:
+    """Schedule a retry of a failed job, or fail it after its last attempt"""
+    job.last_error = error
+    if job.attempts < job.max_attempts:
+        job.status = Job.Status.QUEUED
+        job.run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+    else:
+        job.status = Job.Status.FAILED
+        job.finished_at = timezone.now()
+
+
+def finish(job: Job) -> str:
+    """Unlock a job and save its outcome, returning the new status"""
+    metrics.JOBS.labels(job.name, job.status).inc()
+    job.locked_by = ""
+    job.locked_at = None
+    job.save(
+        using=DEFAULT_DB_ALIAS,
+        update_fields=(
+            "status",
+            "run_after",
+            "last_error",
+            "finished_at",
+            "locked_by",
+            "locked_at",
+        ),
+    )
+
+    return job.status
+
+
+def abandon(job_id: int, error: str) -> str:
+    """
+    Record a claimed job whose process died before reporting back as
+    failed, so it is retried without waiting for JOB_TIMEOUT_SECONDS
+    """
+    job = Job.objects.using(DEFAULT_DB_ALIAS).get(pk=job_id)
+    if job.status != Job.Status.RUNNING:
+        return job.status
+    record_failure(job, error)
+    logger.warning("Job %s %s abandoned: %s", job.pk, job.name, error)
+
+    return finish(job)
+
+
+def record_queue_depth(queues: Sequence[str]) -> Dict[tuple, int]:
+    """Publish and return the number of queued and running jobs per queue"""
+    counts = dict.fromkeys(
+        ((queue, status) for queue in queues for status in Job.ACTIVE), 0
+    )
+    depth = (
+        Job.objects.using(DEFAULT_DB_ALIAS)
+        .filter(status__in=Job.ACTIVE, queue__in=queues)
+        .order_by()
+        .values_list("queue", "status")
+        .annotate(count=Count("pk"))
+    )
+    counts.update(((queue, status), count) for queue, status, count in depth)
+    for (queue, status), count in counts.items():
+        metrics.JOB_QUEUE_DEPTH.labels(queue, status).set(count)
+
+    return counts
+
+
+def run_in_process(job_id: int) -> str:
+    """
+    Run a job in a pool process started with django.setup as initializer,
+    refreshing the process's connections around it
+    """
+    autodiscover()
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
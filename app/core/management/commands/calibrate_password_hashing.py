@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.hashers import PooledPBKDF2PasswordHasher, pbkdf2_hash
+
+
+class Command(BaseCommand):
+    """Django command to pick the PBKDF2 iteration count for a target latency"""
+
+    help = (
+        "Measure PBKDF2 on this machine and print the PASSWORD_HASH_ITERATIONS "
+        "value hashing one password in the target time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target-ms",
+            type=float,
+            default=250,
+            help="Wanted time to hash one password, in milliseconds",
+        )
+        parser.add_argument(
+            "--samples", type=int, default=5, help="Timed hashes per measurement"
+        )
+        parser.add_argument(
+            "--round-to", type=int, default=10000, help="Round iterations to this"
+        )
+
+    def measure(self, iterations: int, samples: int, digest: str) -> float:
+        """Return the fastest of samples hashes in seconds"""
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            pbkdf2_hash("calibration-password", "calibrationsalt", iterations, digest)
+            timings.append(time.perf_counter() - start)
+
+        return min(timings)
+
+    def handle(self, *args, **options):
+        hasher = PooledPBKDF2PasswordHasher()
+        digest = hasher.digest().name
+        target = options["target_ms"] / 1000
+        round_to = options["round_to"]
+
+        iterations = 10000
+        elapsed = self.measure(iterations, options["samples"], digest)
+        while elapsed < target / 10:
+            iterations *= 4
+            elapsed = self.measure(iterations, options["samples"], digest)
+
+        calibrated = max(round(iterations * target / elapsed / round_to), 1) * round_to
+        elapsed = self.measure(calibrated, options["samples"], digest)
+
+        self.stdout.write(
+            f"{calibrated} iterations of pbkdf2_{digest} take {elapsed * 1000:.1f} ms "
+            f"(currently {hasher.iterations})"
+        )
+        self.stdout.write(self.style.SUCCESS(f"PASSWORD_HASH_ITERATIONS={calibrated}"))
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.media import MediaCollector
+
+
+class Command(BaseCommand):
+    """Django command to remove recipe images no recipe refers to"""
+
+    help = (
+        "Stream over the stored recipe images and the images recipes refer "
+        "to and delete, or quarantine, files without a recipe in "
+        "rate-limited batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prefix", default="uploads/recipe")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--rate", type=float, default=100.0, help="Files removed per second"
+        )
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=60.0,
+            help="Minutes a file must be old, newer ones may belong to uploads "
+            "in progress",
+        )
+        parser.add_argument(
+            "--quarantine",
+            metavar="PREFIX",
+            help="Move orphans below this prefix instead of deleting them",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report orphaned files"
+        )
+
+    def handle(self, *args, **options):
+        collector = MediaCollector(
+            default_storage,
+            prefix=options["prefix"],
+            batch_size=options["batch_size"],
+            rate=options["rate"],
+            min_age=timedelta(minutes=options["min_age"]),
+            quarantine=options["quarantine"],
+        )
+        dry_run = options["dry_run"]
+        found = size = 0
+        for batch in collector.collect(dry_run=dry_run):
+            found += len(batch)
+            if dry_run:
+                for name in batch:
+                    size += default_storage.size(name)
+                    self.stdout.write(name)
+            else:
+                self.stdout.write(f"{found} removed")
+
+        if dry_run:
+            self.stdout.write(
+                self.style.SUCCESS(f"{found} orphaned files, {size} bytes")
+            )
+        else:
+            action = "quarantined" if options["quarantine"] else "deleted"
+            self.stdout.write(self.style.SUCCESS(f"{found} orphaned files {action}"))
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.purging import Purger
+from core.routers import for_user
+
+
+class Command(BaseCommand):
+    """Django command to delete a user and all their recipe data in bulk"""
+
+    help = (
+        "Delete the recipes, tags and ingredients of a user in batches of "
+        "plain DELETE statements, then the user. Recipe images are removed "
+        "by a background job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", help="Id or email of the user")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--keep-user",
+            action="store_true",
+            help="Only delete the recipe data, keeping the account",
+        )
+
+    def handle(self, *args, **options):
+        user_model = get_user_model()
+        lookup = options["user"]
+        field = "pk" if lookup.isdigit() else "email"
+        try:
+            user = user_model.objects.get(**{field: lookup})
+        except user_model.DoesNotExist:
+            raise CommandError(f"User {lookup} does not exist")
+
+        purger = Purger(batch_size=options["batch_size"])
+        with for_user(user):
+            deleted = purger.purge_user(user, keep_user=options["keep_user"])
+
+        for label, count in sorted(deleted.items()):
+            self.stdout.write(f"{label}: {count} deleted")
+        self.stdout.write(self.style.SUCCESS(f"User {lookup} purged!"))
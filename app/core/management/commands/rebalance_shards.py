@@ -0,0 +1,67 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sharding import ShardMover, shard_aliases
+
+
+class Command(BaseCommand):
+    """Django command to move users to the shard the hash ring picks"""
+
+    help = (
+        "Move the recipes, tags and ingredients of users whose shard differs "
+        "from the one the hash ring picks, e.g. after adding a shard. Writes "
+        "of a user being moved are rejected with 503 for a few seconds, "
+        "everything else keeps working."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, nargs="*", help="Only move these users")
+        parser.add_argument(
+            "--batch-users",
+            type=int,
+            default=100,
+            help="Number of users moved between grace periods",
+        )
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=2.0,
+            help="Seconds to wait for in-flight requests of moving users",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report planned moves"
+        )
+
+    def handle(self, *args, **options):
+        if not shard_aliases():
+            raise CommandError("DATABASE_SHARDS is empty, there is nothing to balance")
+
+        users = get_user_model().objects.only("id", "shard", "shard_moving")
+        if options["user"]:
+            users = users.filter(pk__in=options["user"])
+        mover = ShardMover(batch_size=options["batch_size"], grace=options["grace"])
+        moves = mover.plan(users.order_by("pk").iterator())
+
+        for (source, target), count in sorted(
+            Counter((source, target) for _, source, target in moves).items()
+        ):
+            self.stdout.write(f"{source} -> {target}: {count} users")
+        if options["dry_run"] or not moves:
+            self.stdout.write(self.style.SUCCESS(f"{len(moves)} users to move"))
+            return
+
+        result = Counter()
+        batch_users = options["batch_users"]
+        for start in range(0, len(moves), batch_users):
+            result.update(mover.move(moves[start:start + batch_users]))
+            self.stdout.write(
+                f"Moved {result['moved']} of {len(moves)} users, "
+                f"{result['rows']} rows"
+            )
+
+        if result["failed"]:
+            raise CommandError(f"{result['failed']} users could not be moved")
+        self.stdout.write(self.style.SUCCESS(f"Moved {result['moved']} users!"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.jobs import enqueue
+from core.models import Tag, Ingredient, refresh_recipe_counts
+
+
+class Command(BaseCommand):
+    """Django command to recompute recipe counts of tags and ingredients"""
+
+    help = "Recompute the denormalized recipe_count of tags and ingredients"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, help="Only repair objects owned by this user id"
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Queue the repair for a worker instead of running it now",
+        )
+
+    def handle(self, *args, **options):
+        user_id = options.get("user")
+        if options["background"]:
+            job = enqueue("core.repair_recipe_counts", user_id=user_id)
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk}"))
+            return
+
+        for model in (Tag, Ingredient):
+            pks = None
+            if user_id is not None:
+                pks = model.objects.filter(user_id=user_id).values("pk")
+            with transaction.atomic():
+                updated = refresh_recipe_counts(model, pks)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {updated} updated")
+
+        self.stdout.write(self.style.SUCCESS("Recipe counts repaired!"))
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.jobs import (
+    abandon,
+    autodiscover,
+    claim,
+    record_queue_depth,
+    run_in_process,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs"""
+
+    help = (
+        "Claim jobs of the given queues and run them in a pool of processes "
+        "until stopped with SIGINT or SIGTERM, which lets running jobs finish. "
+        "Any number of workers can run next to each other."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.JOB_WORKER_PROCESSES,
+            help="Jobs run at the same time, 0 runs them one by one in this process",
+        )
+        parser.add_argument("--queue", nargs="+", default=["default"])
+        parser.add_argument(
+            "--poll", type=float, default=1.0, help="Seconds between polls when idle"
+        )
+        parser.add_argument(
+            "--burst", action="store_true", help="Exit once no job is ready"
+        )
+
+    def handle(self, *args, **options):
+        autodiscover()
+        self.stopping = threading.Event()
+        previous = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.processes = options["processes"]
+        self.pool = self.start_pool() if self.processes else None
+        self.stdout.write(f"Worker {worker} on {', '.join(options['queue'])}")
+
+        try:
+            self.work(worker, max(self.processes, 1), options)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True)
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def start_pool(self) -> ProcessPoolExecutor:
+        # Spawned processes set Django up before unpickling their jobs
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+
+    def stop(self, signum, frame):
+        self.stdout.write("Stopping after the running jobs")
+        self.stopping.set()
+
+    def work(self, worker: str, slots: int, options) -> None:
+        """Claim and run jobs until stopped, or until idle in burst mode"""
+        running = {}
+        while not self.stopping.is_set():
+            if not connection.in_atomic_block:
+                close_old_connections()
+            free = slots - len(running)
+            job_ids = claim(worker, free, options["queue"]) if free else []
+            record_queue_depth(options["queue"])
+
+            for job_id in job_ids:
+                if self.pool is None:
+                    self.report(job_id, run_job(job_id))
+                else:
+                    running[self.submit(job_id)] = job_id
+
+            if running:
+                done, _ = wait(
+                    running,
+                    timeout=0 if job_ids else options["poll"],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    self.collect(running.pop(future), future)
+            elif not job_ids:
+                if options["burst"]:
+                    break
+                self.stopping.wait(options["poll"])
+
+        for future, job_id in running.items():
+            self.collect(job_id, future)
+
+    def submit(self, job_id: int):
+        try:
+            future = self.pool.submit(run_in_process, job_id)
+        except BrokenProcessPool:
+            self.replace_pool(self.pool)
+            future = self.pool.submit(run_in_process, job_id)
+        future.pool = self.pool
+
+        return future
+
+    def collect(self, job_id: int, future) -> None:
+        """
+        Report the outcome of a job run in the pool. A job whose process
+        died, killed or interrupted, is put back for a retry at once.
+        """
+        try:
+            status = future.result()
+        except Exception as exc:
+            status = abandon(job_id, f"{type(exc).__name__}: {exc}")
+            if isinstance(exc, BrokenProcessPool):
+                self.replace_pool(future.pool)
+        self.report(job_id, status)
+
+    def replace_pool(self, broken) -> None:
+        """Start a new pool in place of one whose processes died"""
+        if broken is not self.pool:
+            # Replaced on an earlier job of the broken pool
+            return
+        broken.shutdown(wait=False)
+        self.pool = self.start_pool()
+
+    def report(self, job_id: int, status: str) -> None:
+        self.stdout.write(f"Job {job_id}: {status}")
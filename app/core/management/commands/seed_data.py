@@ -0,0 +1,99 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.seeding import SeedConfig, Seeder
+
+
+class Command(BaseCommand):
+    """Django command to generate a synthetic dataset"""
+
+    help = (
+        "Generate users with recipes, tags and ingredients. Tag and "
+        "ingredient usage follows a Zipf distribution."
+    )
+
+    def add_arguments(self, parser):
+        defaults = SeedConfig()
+        parser.add_argument("--users", type=int, default=defaults.users)
+        parser.add_argument(
+            "--recipes-per-user", type=int, default=defaults.recipes_per_user
+        )
+        parser.add_argument(
+            "--tags",
+            type=int,
+            default=defaults.tags_per_user,
+            help="Number of tags per user",
+        )
+        parser.add_argument(
+            "--ingredients",
+            type=int,
+            default=defaults.ingredients_per_user,
+            help="Number of ingredients per user",
+        )
+        parser.add_argument(
+            "--tags-per-recipe", type=int, default=defaults.tags_per_recipe
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe",
+            type=int,
+            default=defaults.ingredients_per_recipe,
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=defaults.zipf_exponent,
+            help="Exponent of the tag and ingredient popularity distribution",
+        )
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--email-prefix", default=defaults.email_prefix)
+        parser.add_argument(
+            "--password",
+            default=defaults.password,
+            help="Password of every generated user, hashed once",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=2000,
+            help="Recipes sampled and committed at a time",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database of the users, their recipe data is written to "
+            "DATABASE_SHARDS when configured",
+        )
+
+    def handle(self, *args, **options):
+        config = SeedConfig(
+            users=options["users"],
+            recipes_per_user=options["recipes_per_user"],
+            tags_per_user=options["tags"],
+            ingredients_per_user=options["ingredients"],
+            tags_per_recipe=options["tags_per_recipe"],
+            ingredients_per_recipe=options["ingredients_per_recipe"],
+            zipf_exponent=options["zipf"],
+            seed=options["seed"],
+            email_prefix=options["email_prefix"],
+            password=options["password"],
+        )
+        seeder = Seeder(
+            config,
+            using=options["database"],
+            batch_size=options["batch_size"],
+            block_size=options["block_size"],
+        )
+
+        start = time.perf_counter()
+        written = seeder.run()
+        elapsed = time.perf_counter() - start
+
+        for table, rows in written.items():
+            self.stdout.write(f"{table}: {rows} rows")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {sum(written.values())} rows in {elapsed:.1f} seconds!"
+            )
+        )
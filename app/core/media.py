@@ -0,0 +1,147 @@
+"""
+Garbage collection of orphaned recipe images.
+
+Replaced and deleted recipe images and their variants stay in storage.
+The MediaCollector finds files no recipe refers to by merging two sorted
+streams, the file names under the upload directory walked in order and
+the image names of all recipes read in the same order from every
+database holding them, so neither side is ever loaded into memory.
+Variants are matched the same way below their own prefix. Orphans are
+deleted or moved to a quarantine prefix in batches with a pause in
+between.
+"""
+import heapq
+import logging
+import time
+from datetime import timedelta
+from itertools import chain
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.functions import Collate
+from django.utils import timezone
+
+from core.images import variant_name
+from core.models import Recipe
+from core.sharding import shard_aliases
+
+logger = logging.getLogger(__name__)
+
+
+def walk(storage, path: str) -> Iterator[str]:
+    """
+    Yield names of the files below path in storage in string order. A
+    directory sorts as its name followed by "/", as the names in it do.
+    """
+    directories, files = storage.listdir(path)
+    entries = [(f"{name}/", True) for name in directories]
+    entries += [(name, False) for name in files]
+    for name, is_directory in sorted(entries):
+        full_name = f"{path.rstrip('/')}/{name}" if path else name
+        if is_directory:
+            yield from walk(storage, full_name)
+        else:
+            yield full_name
+
+
+def referenced_images(chunk_size: int = 2000) -> Iterator[str]:
+    """Yield image names of recipes on all databases in string order"""
+    streams = []
+    for alias in dict.fromkeys([DEFAULT_DB_ALIAS, *shard_aliases()]):
+        image = "image"
+        if connections[alias].vendor == "postgresql":
+            # Compare bytes like Python does rather than by locale rules
+            image = Collate("image", "C")
+        names = (
+            Recipe._base_manager.using(alias)
+            .exclude(image="")
+            .order_by(image)
+            .values_list("image", flat=True)
+        )
+        streams.append(names.iterator(chunk_size=chunk_size))
+
+    return heapq.merge(*streams)
+
+
+def referenced_variants(variant: str) -> Iterator[str]:
+    """Yield variant names of referenced images, a constant prefix keeps the order"""
+    for name in referenced_images():
+        yield variant_name(name, variant)
+
+
+def orphans(stored: Iterator[str], referenced: Iterator[str]) -> Iterator[str]:
+    """Yield the names of stored not in referenced, both sorted"""
+    referenced = iter(referenced)
+    current = next(referenced, None)
+    for name in stored:
+        while current is not None and current < name:
+            current = next(referenced, None)
+        if name != current:
+            yield name
+
+
+class MediaCollector:
+    """
+    Remove files below prefix no recipe refers to, batch_size at a time
+    and at most rate files per second. Files younger than min_age are
+    kept, their recipe may not be committed yet. With quarantine set,
+    orphans are moved below that prefix instead of being deleted.
+    """
+
+    def __init__(
+        self,
+        storage,
+        prefix: str = "uploads/recipe",
+        batch_size: int = 100,
+        rate: float = 100.0,
+        min_age: timedelta = timedelta(hours=1),
+        quarantine: Optional[str] = None,
+    ) -> None:
+        self.storage = storage
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.rate = rate
+        self.min_age = min_age
+        self.quarantine = quarantine
+
+    def find(self) -> Iterator[str]:
+        """Yield orphaned files and variants old enough to be removed"""
+        cutoff = timezone.now() - self.min_age
+        found = orphans(walk(self.storage, self.prefix), referenced_images())
+        for variant in settings.RECIPE_IMAGE_VARIANTS:
+            stored = walk(self.storage, variant_name(self.prefix, variant))
+            found = chain(found, orphans(stored, referenced_variants(variant)))
+        for name in found:
+            if self.storage.get_modified_time(name) <= cutoff:
+                yield name
+
+    def batches(self) -> Iterator[List[str]]:
+        batch = []
+        for name in self.find():
+            batch.append(name)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def remove(self, names: List[str]) -> None:
+        """Delete or quarantine a batch of orphans"""
+        for name in names:
+            if self.quarantine:
+                with self.storage.open(name) as content:
+                    self.storage.save(f"{self.quarantine.rstrip('/')}/{name}", content)
+            self.storage.delete(name)
+        logger.info("Removed %s orphaned files", len(names))
+
+    def collect(self, dry_run: bool = False) -> Iterator[List[str]]:
+        """Remove orphans, yielding each batch once it is handled"""
+        for batch in self.batches():
+            started = time.monotonic()
+            if not dry_run:
+                self.remove(batch)
+            yield batch
+            if not dry_run and self.rate:
+                elapsed = time.monotonic() - started
+                time.sleep(max(0.0, len(batch) / self.rate - elapsed))
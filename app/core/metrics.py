@@ -0,0 +1,73 @@
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+JOB_LATENCY_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+REQUESTS = Counter(
+    "api_requests_total", "HTTP requests served", ("handler", "method", "status")
+)
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds",
+    "Time spent serving HTTP requests",
+    ("handler", "method"),
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "api_request_db_queries",
+    "Database queries executed per HTTP request",
+    ("handler",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "api_db_query_duration_seconds",
+    "Time spent executing single database queries",
+    buckets=QUERY_LATENCY_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "api_cache_lookups_total", "Application cache lookups", ("cache", "result")
+)
+JOBS = Counter("api_jobs_total", "Background job runs by outcome", ("task", "status"))
+JOB_DURATION = Histogram(
+    "api_job_duration_seconds",
+    "Time spent running background jobs",
+    ("task",),
+    buckets=JOB_LATENCY_BUCKETS,
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "api_job_queue_depth",
+    "Background jobs waiting or running",
+    ("queue", "status"),
+    multiprocess_mode="livemax",
+)
+
+
+def record_cache_lookup(cache_name: str, hit: bool) -> None:
+    """Count a hit or a miss of an application cache"""
+    CACHE_LOOKUPS.labels(cache_name, "hit" if hit else "miss").inc()
+
+
+def render() -> bytes:
+    """
+    Return all metrics in the Prometheus text format. When
+    PROMETHEUS_MULTIPROC_DIR is set the values of every worker process
+    writing to that directory are merged.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry)
@@ -0,0 +1,497 @@
+import hashlib
+import logging
+import math
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+from core import metrics
+from core.compression import negotiate
+from core.routers import RoutingState, pin_seconds, replica_aliases, routing
+from core.sharding import shard_aliases
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    """Queries and timings collected while serving one request"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.queries = []
+        self.view_started = None
+        self.view_finished = None
+        self.view_db_time = 0.0
+        self.render_started = None
+        self.render_finished = None
+
+    def record_query(self, execute, sql, params, many, context):
+        """Time one query, used as a connection execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def db_time(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self) -> list:
+        """Return (sql, count) of statements executed more than once"""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+    def timings(self) -> dict:
+        """Return named durations in milliseconds"""
+        now = time.perf_counter()
+        timings = {"db": self.db_time, "total": now - self.started}
+        if self.view_started is not None and self.view_finished is not None:
+            view_time = self.view_finished - self.view_started
+            timings["serializer"] = max(view_time - self.view_db_time, 0.0)
+        if self.render_started is not None and self.render_finished is not None:
+            timings["render"] = self.render_finished - self.render_started
+
+        return {name: duration * 1000 for name, duration in timings.items()}
+
+
+current_profile: ContextVar = ContextVar("current_profile", default=None)
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per request profiling of SQL queries and view timings.
+    Sampled requests get a Server-Timing header, slow ones are logged
+    together with their slowest and duplicated queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+        self.slow_request_ms = getattr(settings, "PROFILING_SLOW_REQUEST_MS", 500)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        profile, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+
+        return self.finish(request, response, profile)
+
+    def start(self, request):
+        profile = request.profile = RequestProfile()
+        return profile, current_profile.set(profile)
+
+    def finish(self, request, response, profile):
+        if profile.view_started is not None and profile.view_finished is None:
+            profile.view_finished = time.perf_counter()
+            profile.view_db_time += profile.db_time
+
+        timings = profile.timings()
+        response["Server-Timing"] = ", ".join(
+            f'{name};dur={duration:.2f}'
+            + (f';desc="{len(profile.queries)} queries"' if name == "db" else "")
+            for name, duration in timings.items()
+        )
+        if timings["total"] >= self.slow_request_ms:
+            self.log_slow_request(request, response, profile, timings)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, "profile", None)
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+            profile.view_db_time = -profile.db_time
+
+    def process_template_response(self, request, response):
+        profile = getattr(request, "profile", None)
+        if profile is None:
+            return response
+
+        profile.view_finished = profile.render_started = time.perf_counter()
+        profile.view_db_time += profile.db_time
+
+        def finish_render(rendered):
+            profile.render_finished = time.perf_counter()
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def log_slow_request(self, request, response, profile, timings) -> None:
+        """Write a slow request with its most expensive queries to the log"""
+        slowest = sorted(profile.queries, key=lambda query: query[1], reverse=True)
+        lines = [
+            f"Slow request {request.method} {request.path} "
+            f"({response.status_code}) {timings['total']:.2f} ms, "
+            f"{len(profile.queries)} queries"
+        ]
+        lines.extend(
+            f"  {duration * 1000:8.2f} ms  {sql}" for sql, duration in slowest[:5]
+        )
+        lines.extend(
+            f"  repeated {count} times  {sql}" for sql, count in profile.duplicates()[:5]
+        )
+        logger.warning("\n".join(lines), extra={"timings": timings})
+
+
+def handler_name(request, view_func) -> str:
+    """Return a metrics label naming the view, e.g. RecipeViewSet.list"""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+
+    actions = getattr(view_func, "actions", None)
+    if actions:
+        method = request.method.lower()
+        return f"{cls.__name__}.{actions.get(method, method)}"
+
+    return cls.__name__
+
+
+class QueryMetrics:
+    """Connection execute wrapper counting and timing queries"""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            metrics.DB_QUERY_LATENCY.observe(time.perf_counter() - start)
+
+
+current_query_metrics: ContextVar = ContextVar("current_query_metrics", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection, forwarding to the
+    QueryMetrics and RequestProfile of the current request. Being context
+    local it also sees queries the ORM runs in sync_to_async threads and
+    run_db executors of async views.
+    """
+    profile = current_profile.get()
+    if profile is not None:
+        execute = partial(profile.record_query, execute)
+    query_metrics = current_query_metrics.get()
+    if query_metrics is None:
+        return execute(sql, params, many, context)
+
+    return query_metrics(execute, sql, params, many, context)
+
+
+def install_query_metrics(sender, connection, **kwargs) -> None:
+    """Add count_queries to a new database connection"""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+class MetricsMiddleware:
+    """Record request counts, latencies and query counts per view action"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        query_metrics, token, start = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_query_metrics.reset(token)
+
+        return self.finish(request, response, query_metrics, start)
+
+    async def __acall__(self, request):
+        query_metrics, token, start = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_metrics.reset(token)
+
+        return self.finish(request, response, query_metrics, start)
+
+    def start(self, request):
+        request.metrics_handler = "unmatched"
+        query_metrics = QueryMetrics()
+        token = current_query_metrics.set(query_metrics)
+
+        return query_metrics, token, time.perf_counter()
+
+    def finish(self, request, response, query_metrics, start):
+        duration = time.perf_counter() - start
+        handler = request.metrics_handler
+        metrics.REQUESTS.labels(handler, request.method, response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(handler, request.method).observe(duration)
+        metrics.REQUEST_QUERIES.labels(handler).observe(query_metrics.count)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_handler = handler_name(request, view_func)
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Make the request known to the database routers, see core.routers. Its
+    user decides the shard of recipe data.
+
+    Let the actions a view lists in replica_actions read from a replica,
+    see core.routers.ReplicaRouter. Responses to requests that wrote pin
+    the client to the primary for a window long enough for the replicas
+    to catch up, with a cookie and an X-Primary-Pin header holding the
+    Unix time it ends. Clients not keeping cookies send the header back.
+    """
+
+    sync_capable = True
+    async_capable = True
+    pin_cookie = "primary_pin"
+    pin_header = "X-Primary-Pin"
+
+    def __init__(self, get_response) -> None:
+        if not replica_aliases() and not shard_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        with routing(self.start(request)) as state:
+            response = self.get_response(request)
+
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        with routing(self.start(request)) as state:
+            response = await self.get_response(request)
+
+        return self.finish(response, state)
+
+    def pinned_until(self, request) -> float:
+        """Return the end of the client's primary pin, 0 when it has none"""
+        value = request.META.get(
+            "HTTP_" + self.pin_header.upper().replace("-", "_")
+        ) or request.COOKIES.get(self.pin_cookie)
+        try:
+            until = float(value or 0)
+        except ValueError:
+            return 0.0
+
+        return until if math.isfinite(until) else 0.0
+
+    def start(self, request) -> RoutingState:
+        pinned = self.pinned_until(request) > time.time()
+        request.db_routing = RoutingState(pinned=pinned, request=request)
+
+        return request.db_routing
+
+    def finish(self, response, state: RoutingState):
+        if state.wrote:
+            window = pin_seconds()
+            until = f"{time.time() + window:.3f}"
+            response.set_cookie(
+                self.pin_cookie,
+                until,
+                max_age=math.ceil(window),
+                httponly=True,
+                samesite="Lax",
+            )
+            response[self.pin_header] = until
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return
+        actions = getattr(view_func, "actions", None) or {}
+        action = actions.get(request.method.lower())
+        cls = getattr(view_func, "cls", None)
+        if action and action in getattr(cls, "replica_actions", ()):
+            request.db_routing.use_replica()
+
+
+class CompressionMiddleware:
+    """
+    Compress text and JSON responses with the coding the client prefers
+    among those available, see core.compression. Bodies smaller than
+    COMPRESSION_MIN_BYTES are sent as they are, streaming responses are
+    compressed chunk by chunk. Compressed bodies up to
+    COMPRESSION_CACHE_MAX_BYTES are cached by a hash of the content, so
+    identical responses, such as a list fetched again without changes,
+    are compressed once per coding.
+    """
+
+    sync_capable = True
+    async_capable = True
+    compressible_types = re.compile(
+        r"^(text/|application/(json|javascript|xml)\b|[^;]*\+(json|xml)\b)"
+    )
+
+    def __init__(self, get_response) -> None:
+        if not getattr(settings, "COMPRESSION_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_bytes = getattr(settings, "COMPRESSION_MIN_BYTES", 1024)
+        self.cache = caches[getattr(settings, "COMPRESSION_CACHE", "default")]
+        self.cache_timeout = getattr(settings, "COMPRESSION_CACHE_TIMEOUT", 300)
+        self.cache_max_bytes = getattr(settings, "COMPRESSION_CACHE_MAX_BYTES", 0)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        return self.compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+
+        return self.compress_response(request, response)
+
+    def compressible(self, response) -> bool:
+        if response.has_header("Content-Encoding"):
+            return False
+        if response.status_code in (204, 304):
+            return False
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return False
+
+        return bool(self.compressible_types.match(response.get("Content-Type", "")))
+
+    def compress_response(self, request, response):
+        if not self.compressible(response):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = coding.stream(response.streaming_content)
+            del response["Content-Length"]
+        else:
+            body = self.compress(coding, response.content)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response["Content-Length"] = str(len(body))
+        # The compressed body differs byte for byte, like Django's GZipMiddleware
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f"W/{etag}"
+        response["Content-Encoding"] = coding.name
+
+        return response
+
+    def compress(self, coding, content: bytes) -> bytes:
+        """Compress a body, reusing the cached result for the same content"""
+        if len(content) > self.cache_max_bytes:
+            return coding.compress(content)
+
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        key = f"compressed:{coding.name}:{digest}"
+        body = self.cache.get(key)
+        metrics.record_cache_lookup("compression", body is not None)
+        if body is None:
+            body = coding.compress(content)
+            self.cache.set(key, body, self.cache_timeout)
+
+        return body
+
+
+class NonAPIMiddleware:
+    """
+    Run the middleware listed in NON_API_MIDDLEWARE, sessions, CSRF,
+    authentication and messages, only for paths outside API_PATH_PREFIX.
+    The API authenticates every request with a token, so for it they
+    would only load sessions and set cookies nobody reads. The admin and
+    other pages get the full chain, process_view hooks included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.prefix = getattr(settings, "API_PATH_PREFIX", "/api/")
+        self.view_hooks = []
+        handler = get_response
+        for path in reversed(getattr(settings, "NON_API_MIDDLEWARE", [])):
+            middleware = import_string(path)(handler)
+            if hasattr(middleware, "process_view"):
+                self.view_hooks.insert(0, middleware.process_view)
+            handler = convert_exception_to_response(middleware)
+        self.handler = handler
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if request.path_info.startswith(self.prefix):
+            return self.get_response(request)
+
+        return self.handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.path_info.startswith(self.prefix):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
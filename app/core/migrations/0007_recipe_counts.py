@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_recipe_counts(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name, model_name in (('tag', 'Tag'), ('ingredient', 'Ingredient')):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(f'{field_name}s').remote_field.through
+        usage = (
+            through.objects.filter(**{field_name: OuterRef('pk')})
+            .order_by()
+            .values(field_name)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        model.objects.update(recipe_count=Coalesce(Subquery(usage), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of recipes using this ingredient'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of recipes using this tag'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count'], name='core_ingred_user_id_de1121_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count'], name='core_tag_user_id_699afc_idx'),
+        ),
+        migrations.RunPython(populate_recipe_counts, migrations.RunPython.noop),
+    ]
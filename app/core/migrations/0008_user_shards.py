@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='shard',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='database shard'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='shard_moving',
+            field=models.BooleanField(default=False, editable=False, verbose_name='moving between shards'),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+import core.fields
+
+
+def populate_link_users(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    owner = Recipe.objects.filter(pk=OuterRef('recipe_id')).values('user_id')[:1]
+    for model_name in ('RecipeTag', 'RecipeIngredient'):
+        apps.get_model('core', model_name).objects.update(user_id=Subquery(owner))
+
+
+def link_operations(model_name, target, table):
+    """
+    Adopt the auto-created through table of Recipe.<target>s as an
+    explicit model, then add the owning user to its rows
+    """
+    field_name = f'{target}s'
+    return [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name=model_name,
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                        (target, models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=f'core.{target}')),
+                    ],
+                    options={
+                        'db_table': table,
+                        'unique_together': {('recipe', target)},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name=field_name,
+                    field=core.fields.OwnedManyToManyField(through=f'core.{model_name}', to=f'core.{target}'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name=model_name.lower(),
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
+
+
+def finish_link_operations(model_name, target):
+    return [
+        migrations.AlterField(
+            model_name=model_name.lower(),
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name=model_name.lower(),
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name=model_name.lower(),
+            constraint=models.UniqueConstraint(fields=('user', 'recipe', target), name=f'core_{model_name.lower()}_unique'),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0008_user_shards'),
+    ]
+
+    operations = [
+        *link_operations('RecipeTag', 'tag', 'core_recipe_tags'),
+        *link_operations('RecipeIngredient', 'ingredient', 'core_recipe_ingredients'),
+        migrations.RunPython(populate_link_users, migrations.RunPython.noop),
+        *finish_link_operations('RecipeTag', 'tag'),
+        *finish_link_operations('RecipeIngredient', 'ingredient'),
+    ]
@@ -0,0 +1,120 @@
+from django.db import migrations
+
+# Number of hash partitions of each per-user table. Changing it requires
+# rebuilding the tables, so it is fixed here rather than in settings.
+PARTITIONS = 16
+
+# Tables partitioned by user_id, the recipes before the links pointing at them
+TABLES = ('core_recipe', 'core_recipe_tags', 'core_recipe_ingredients')
+
+
+def fetch(cursor, sql, params):
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def rebuild_table(cursor, table, partitions):
+    """
+    Recreate a table as hash partitioned by user_id, or as a plain table
+    if partitions is 0, keeping its rows, sequence, indexes and foreign keys.
+
+    Postgres requires the partition key in every primary key and unique
+    constraint, so the partitioned tables have a (id, user_id) primary key.
+    """
+    old = f'{table}_rebuild'
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    indexes = fetch(
+        cursor,
+        'SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) '
+        'FROM pg_index WHERE indrelid = %s::regclass AND NOT EXISTS '
+        '(SELECT 1 FROM pg_constraint WHERE conindid = indexrelid)',
+        [old],
+    )
+    constraints = fetch(
+        cursor,
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')",
+        [old],
+    )
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX "{name}"')
+    for name, _, _ in constraints:
+        cursor.execute(f'ALTER TABLE "{old}" DROP CONSTRAINT "{name}"')
+
+    partition_by = ' PARTITION BY HASH (user_id)' if partitions else ''
+    cursor.execute(
+        f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS '
+        f'INCLUDING CONSTRAINTS){partition_by}'
+    )
+    for remainder in range(partitions):
+        cursor.execute(
+            f'CREATE TABLE "{table}_p{remainder}" PARTITION OF "{table}" '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        )
+    cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+    sequence = fetch(cursor, "SELECT pg_get_serial_sequence(%s, 'id')", [old])[0][0]
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id')
+    cursor.execute(f'DROP TABLE "{old}"')
+
+    key = '(id, user_id)' if partitions else '(id)'
+    cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY {key}')
+    for name, definition in indexes:
+        unique = 'UNIQUE ' if definition.startswith('CREATE UNIQUE') else ''
+        using = definition.split(' USING ', 1)[1]
+        cursor.execute(f'CREATE {unique}INDEX "{name}" ON "{table}" USING {using}')
+    for name, kind, definition in constraints:
+        if kind != 'p':
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+
+
+def rebuild_tables(schema_editor, partitions):
+    connection = schema_editor.connection
+    # Foreign keys may only reference partitioned tables since Postgres 12
+    if connection.vendor != 'postgresql' or connection.pg_version < 120000:
+        return
+
+    with connection.cursor() as cursor:
+        # The links reference the recipes through (recipe_id, user_id) once
+        # id alone is no longer unique
+        links = fetch(
+            cursor,
+            'SELECT conrelid::regclass::text, conname FROM pg_constraint '
+            "WHERE confrelid = 'core_recipe'::regclass AND conrelid <> confrelid "
+            'AND conparentid = 0',
+            [],
+        )
+        for table, name in links:
+            cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+        for table in TABLES:
+            rebuild_table(cursor, table, partitions)
+        columns, key = ('recipe_id, user_id', 'id, user_id') if partitions else ('recipe_id', 'id')
+        for table, name in links:
+            cursor.execute(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" FOREIGN KEY ({columns}) '
+                f'REFERENCES core_recipe ({key}) DEFERRABLE INITIALLY DEFERRED'
+            )
+
+
+def partition_tables(apps, schema_editor):
+    rebuild_tables(schema_editor, PARTITIONS)
+
+
+def unpartition_tables(apps, schema_editor):
+    rebuild_tables(schema_editor, 0)
+
+
+class Migration(migrations.Migration):
+    """
+    Hash partition the recipes and their links by user on Postgres, so
+    queries filtered by user_id only read one partition of each table.
+    The tables are copied while locked, plan a maintenance window for
+    large databases. Other databases are left unchanged.
+    """
+
+    dependencies = [
+        ('core', '0009_explicit_recipe_links'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_positions(apps, schema_editor):
+    RecipeIngredient = apps.get_model('core', 'RecipeIngredient')
+    # Number the ingredients of each recipe in the order they were added
+    earlier = (
+        RecipeIngredient.objects.filter(
+            user_id=OuterRef('user_id'), recipe_id=OuterRef('recipe_id'), pk__lt=OuterRef('pk')
+        )
+        .order_by()
+        .values('recipe_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    RecipeIngredient.objects.update(position=Coalesce(Subquery(earlier), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_partition_recipe_tables'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingred_user_id_de1121_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_id_699afc_idx',
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='position in recipe'),
+        ),
+        migrations.RunPython(populate_positions, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='quantity',
+            field=models.CharField(blank=True, max_length=64, verbose_name='quantity'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count'], include=('id', 'name'), name='core_ingredient_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeingredient',
+            index=models.Index(fields=['user', 'recipe', 'position'], include=('ingredient',), name='core_recipeingr_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeingredient',
+            index=models.Index(fields=['user', 'ingredient'], include=('recipe',), name='core_recipeingr_user_ingr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['user', 'tag'], include=('recipe',), name='core_recipetag_user_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count'], include=('id', 'name'), name='core_tag_assigned_idx'),
+        ),
+    ]
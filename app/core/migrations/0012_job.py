@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_link_positions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='task')),
+                ('queue', models.CharField(default='default', max_length=64, verbose_name='queue')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='keyword arguments')),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='queued', max_length=16, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='maximum attempts')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='run after')),
+                ('locked_by', models.CharField(blank=True, max_length=255, verbose_name='worker')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='claimed at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status__in', ('queued', 'running'))), fields=['queue', 'status', 'run_after'], name='core_job_active_idx'),
+        ),
+    ]
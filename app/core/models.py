@@ -2,11 +2,16 @@ import uuid
 import os
 
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser, UserManager
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from django.conf import settings
 
+from core.fields import OwnedManyToManyField
+
 
 def recipe_image_file_path(instance, filename) -> str:
     """Generate file path for new recipe image"""
@@ -18,16 +23,24 @@ def recipe_image_file_path(instance, filename) -> str:
 
 class CustomUserManager(UserManager):
     def create_user(
-        self, email: str, password: str = None, **extra_fields
+        self,
+        email: str,
+        password: str = None,
+        encoded_password: str = None,
+        **extra_fields
     ) -> AbstractUser:
         """
         Create and save a user with the given email, and password.
+        An already hashed encoded_password is stored as is.
         """
         if not email:
             raise ValueError("The email must be specified")
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        if encoded_password is not None:
+            user.password = encoded_password
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -45,6 +58,12 @@ class CustomUser(AbstractUser):
 
     email = models.EmailField(_("email address"), unique=True)
     name = models.CharField(_("name"), max_length=255, blank=True)
+    shard = models.CharField(
+        _("database shard"), max_length=64, blank=True, editable=False
+    )
+    shard_moving = models.BooleanField(
+        _("moving between shards"), default=False, editable=False
+    )
     username = None
     first_name = None
     last_name = None
@@ -54,12 +73,47 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    # Changed with QuerySet.update only, see core.sharding
+    placement_fields = ("shard", "shard_moving")
+
+    def save(self, *args, **kwargs):
+        """Save without writing the shard placement back"""
+        if (
+            not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.placement_fields
+            ]
+
+        return super().save(*args, **kwargs)
+
 
 class Tag(models.Model):
     """Tag to be used for a recipe"""
 
     name = models.CharField(_("tag name"), max_length=255)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Without a constraint as users live on the default database, see
+    # core.sharding
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False
+    )
+    recipe_count = models.PositiveIntegerField(
+        _("number of recipes using this tag"), default=0, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            # Covers the assigned_only listing, see BaseRecipeAttrViewSet
+            models.Index(
+                fields=("user", "recipe_count"),
+                include=("id", "name"),
+                name="core_tag_assigned_idx",
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -69,7 +123,24 @@ class Ingredient(models.Model):
     """Ingredient to be used in a recipe"""
 
     name = models.CharField(_("ingredient name"), max_length=255)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Without a constraint as users live on the default database, see
+    # core.sharding
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False
+    )
+    recipe_count = models.PositiveIntegerField(
+        _("number of recipes using this ingredient"), default=0, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            # Covers the assigned_only listing, see BaseRecipeAttrViewSet
+            models.Index(
+                fields=("user", "recipe_count"),
+                include=("id", "name"),
+                name="core_ingredient_assigned_idx",
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -79,15 +150,151 @@ class Recipe(models.Model):
     """Recipe objects"""
 
     title = models.CharField(_("recipe title"), max_length=255)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Without a constraint as users live on the default database, see
+    # core.sharding
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False
+    )
     time_min = models.IntegerField(
         _("preparation time in minutes"), validators=[MinValueValidator(0)]
     )
     price = models.DecimalField(_("price in USD"), max_digits=5, decimal_places=2)
     link = models.URLField(_("Optional URL"), blank=True, max_length=255)
-    ingredients = models.ManyToManyField("Ingredient")
-    tags = models.ManyToManyField("Tag")
+    ingredients = OwnedManyToManyField("Ingredient", through="RecipeIngredient")
+    tags = OwnedManyToManyField("Tag", through="RecipeTag")
     image = models.ImageField(blank=True, upload_to=recipe_image_file_path)
 
     def __str__(self):
         return self.title
+
+
+class RecipeTag(models.Model):
+    """Tag of a recipe, storing the owner to filter and partition links by user"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = "core_recipe_tags"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe", "tag"), name="core_recipetag_unique"
+            )
+        ]
+        indexes = [
+            # Recipes with a tag, read from the index alone
+            models.Index(
+                fields=("user", "tag"),
+                include=("recipe",),
+                name="core_recipetag_user_tag_idx",
+            )
+        ]
+
+
+class RecipeIngredient(models.Model):
+    """
+    Ingredient of a recipe, storing the owner like RecipeTag. The
+    ingredients of a recipe are listed by position.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    position = models.PositiveSmallIntegerField(_("position in recipe"), default=0)
+    quantity = models.CharField(_("quantity"), max_length=64, blank=True)
+
+    class Meta:
+        db_table = "core_recipe_ingredients"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe", "ingredient"),
+                name="core_recipeingredient_unique",
+            )
+        ]
+        indexes = [
+            # Ingredients of recipes in order, and recipes with an ingredient,
+            # read from the index alone
+            models.Index(
+                fields=("user", "recipe", "position"),
+                include=("ingredient",),
+                name="core_recipeingr_position_idx",
+            ),
+            models.Index(
+                fields=("user", "ingredient"),
+                include=("recipe",),
+                name="core_recipeingr_user_ingr_idx",
+            ),
+        ]
+
+
+class Job(models.Model):
+    """Task queued for a background worker, see core.jobs"""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("queued")
+        RUNNING = "running", _("running")
+        DONE = "done", _("done")
+        FAILED = "failed", _("failed")
+
+    ACTIVE = (Status.QUEUED, Status.RUNNING)
+
+    name = models.CharField(_("task"), max_length=255)
+    queue = models.CharField(_("queue"), max_length=64, default="default")
+    kwargs = models.JSONField(_("keyword arguments"), default=dict, blank=True)
+    status = models.CharField(
+        _("status"), max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(_("attempts"), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_("maximum attempts"), default=5)
+    run_after = models.DateTimeField(_("run after"), default=timezone.now)
+    locked_by = models.CharField(_("worker"), max_length=255, blank=True)
+    locked_at = models.DateTimeField(_("claimed at"), null=True, blank=True)
+    last_error = models.TextField(_("last error"), blank=True)
+    created_at = models.DateTimeField(_("created at"), auto_now_add=True)
+    finished_at = models.DateTimeField(_("finished at"), null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only jobs waiting or running are looked up by workers
+            models.Index(
+                fields=("queue", "status", "run_after"),
+                condition=models.Q(status__in=("queued", "running")),
+                name="core_job_active_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+def refresh_recipe_counts(model, pks=None) -> int:
+    """
+    Recompute the denormalized recipe_count of tags or ingredients.
+    Only the rows in pks, a list or a values("pk") queryset, are touched
+    unless pks is None.
+    """
+    field_name = model._meta.model_name
+    through = Recipe._meta.get_field(f"{field_name}s").remote_field.through
+    usage = (
+        through.objects.filter(**{field_name: OuterRef("pk")}, user=OuterRef("user"))
+        .order_by()
+        .values(field_name)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    queryset = model.objects.all() if pks is None else model.objects.filter(pk__in=pks)
+
+    return queryset.update(recipe_count=Coalesce(Subquery(usage), 0))
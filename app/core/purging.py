@@ -0,0 +1,112 @@
+"""
+Bulk deletion of recipe data.
+
+Deleting a user or their recipes through the ORM collector loads every
+row and, because Recipe.image is a file field, deletes recipes one by
+one. The Purger deletes in batches of primary keys with plain DELETE
+statements instead, each batch in its own short transaction, so memory
+and lock times stay bounded however much a user owns. Per-row signals
+are skipped, the caches they maintain are dropped once through
+recipes_purged and image files are removed by a background job.
+"""
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.dispatch import Signal
+
+from core.jobs import enqueue
+from core.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    Tag,
+    refresh_recipe_counts,
+)
+
+# Sent with user_id once recipes of a user were deleted in bulk
+recipes_purged = Signal()
+
+
+class Purger:
+    """
+    Delete recipes, or all recipe data of users, in batches. Recipe
+    counts are refreshed with the router's write database, so run it in
+    a request of the user or in a core.routers.for_user block.
+    """
+
+    def __init__(self, batch_size: int = 500) -> None:
+        # SQLite builds allow as few as 999 parameters per statement
+        self.batch_size = batch_size
+
+    def delete_recipes(self, user, recipes=None) -> Counter:
+        """
+        Delete a user's recipes, or those of the recipes queryset, with
+        their links and queue the removal of their images. Returns the
+        number of deleted rows per model label.
+        """
+        database = router.db_for_write(Recipe, instance=user)
+        if recipes is None:
+            recipes = Recipe.objects.all()
+        recipes = recipes.using(database).filter(user=user).order_by("pk")
+        deleted = Counter()
+
+        while True:
+            batch = list(recipes.values_list("pk", "image")[: self.batch_size])
+            if not batch:
+                break
+            recipe_ids = [pk for pk, _ in batch]
+            with transaction.atomic(using=database):
+                for model in (RecipeTag, RecipeIngredient):
+                    links = model._base_manager.using(database).filter(
+                        user=user, recipe_id__in=recipe_ids
+                    )
+                    deleted[model._meta.label] += links._raw_delete(database)
+                rows = Recipe._base_manager.using(database).filter(
+                    user=user, pk__in=recipe_ids
+                )
+                deleted[Recipe._meta.label] += rows._raw_delete(database)
+            images = [name for _, name in batch if name]
+            if images:
+                # Queued once the rows are gone, gc_media removes files
+                # left behind by a crash in between
+                enqueue("core.delete_files", names=images)
+
+        if deleted[Recipe._meta.label]:
+            with transaction.atomic(using=database):
+                for model in (Tag, Ingredient):
+                    refresh_recipe_counts(
+                        model, model.objects.filter(user=user).values("pk")
+                    )
+            recipes_purged.send(sender=Recipe, user_id=user.pk)
+
+        return deleted
+
+    def purge_user(self, user, keep_user: bool = False) -> Counter:
+        """
+        Delete all recipes, tags and ingredients of a user and, unless
+        keep_user is set, the user. Returns deleted rows per model label.
+        """
+        deleted = self.delete_recipes(user)
+        database = router.db_for_write(Recipe, instance=user)
+        for model in (Tag, Ingredient):
+            rows = model._base_manager.using(database).filter(user=user)
+            deleted[model._meta.label] += self.delete_in_batches(rows, database)
+        if not keep_user:
+            # Nothing is left for the collector to cascade to but tokens
+            _, users = user.delete(using=DEFAULT_DB_ALIAS)
+            deleted.update(users)
+
+        return +deleted
+
+    def delete_in_batches(self, queryset, database: str) -> int:
+        """Delete the rows of queryset in batches, returning their number"""
+        queryset = queryset.order_by("pk")
+        deleted = 0
+        while True:
+            pks = list(queryset.values_list("pk", flat=True)[: self.batch_size])
+            if not pks:
+                return deleted
+            with transaction.atomic(using=database):
+                rows = queryset.model._base_manager.using(database).filter(pk__in=pks)
+                deleted += rows._raw_delete(database)
@@ -0,0 +1,227 @@
+import logging
+import math
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from core.sharding import SHARDED_MODELS, ShardMoving, shard_aliases, shard_of
+
+logger = logging.getLogger(__name__)
+
+# Zero while the replica has replayed all WAL it received, so an idle
+# primary does not make its replicas look like they fall behind
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+"""
+
+
+def replica_aliases() -> List[str]:
+    """Return the database aliases of the read replicas"""
+    return list(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+def pin_seconds() -> float:
+    """
+    Return how long a client reads from the primary after a write. Replicas
+    lagging more than REPLICA_MAX_LAG_SECONDS, as last measured, are not
+    read from, so the window covers the worst lag of a replica in use.
+    """
+    return max(
+        getattr(settings, "REPLICA_PIN_SECONDS", 5.0),
+        getattr(settings, "REPLICA_MAX_LAG_SECONDS", 2.0)
+        + getattr(settings, "REPLICA_LAG_CHECK_SECONDS", 1.0),
+    )
+
+
+class LagMonitor:
+    """
+    Replication lag of the replicas, measured at most once every
+    REPLICA_LAG_CHECK_SECONDS per process. Only PostgreSQL replicas report
+    a lag, unreachable replicas are treated as infinitely behind.
+    """
+
+    def __init__(self) -> None:
+        self.measured = {}
+
+    def lag(self, alias: str) -> float:
+        now = time.monotonic()
+        interval = getattr(settings, "REPLICA_LAG_CHECK_SECONDS", 1.0)
+        checked, lag = self.measured.get(alias, (None, None))
+        if checked is None or now - checked >= interval:
+            lag = self.measure(alias)
+            self.measured[alias] = (now, lag)
+
+        return lag
+
+    def measure(self, alias: str) -> float:
+        """Return the current lag of a replica in seconds"""
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(POSTGRES_LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            logger.warning("Could not measure the lag of replica %s", alias)
+            return math.inf
+
+
+lag_monitor = LagMonitor()
+
+
+def choose_replica() -> Optional[str]:
+    """Pick a replica within the lag limit, None when there is none"""
+    max_lag = getattr(settings, "REPLICA_MAX_LAG_SECONDS", 2.0)
+    replicas = [
+        alias for alias in replica_aliases() if lag_monitor.lag(alias) <= max_lag
+    ]
+
+    return random.choice(replicas) if replicas else None
+
+
+class RoutingState:
+    """Where the queries of one request, or of work done for a user, go"""
+
+    def __init__(self, pinned: bool = False, request=None, user=None) -> None:
+        self.pinned = pinned
+        self.request = request
+        self.user = user
+        self.replica = None
+        self.wrote = False
+
+    def get_user(self):
+        """Return the user whose shard unhinted queries go to, if any"""
+        user = self.user
+        if user is None and self.request is not None:
+            # Set by AuthenticationMiddleware and replaced by DRF's
+            # authentication, so token authenticated users are seen too
+            user = getattr(self.request, "user", None)
+
+        return user if user is not None and user.is_authenticated else None
+
+    def use_replica(self) -> None:
+        """Allow reads of this request to go to a replica"""
+        if not self.pinned and not self.wrote:
+            self.replica = choose_replica()
+
+
+current_routing: ContextVar = ContextVar("current_routing", default=None)
+
+
+@contextmanager
+def routing(state: RoutingState):
+    """Route the queries run in this context by state"""
+    token = current_routing.set(state)
+    try:
+        yield state
+    finally:
+        current_routing.reset(token)
+
+
+def for_user(user):
+    """Route queries on recipe data outside of requests to user's shard"""
+    return routing(RoutingState(user=user))
+
+
+class ShardRouter:
+    """
+    Send queries on recipe data to the shard of the user owning it, see
+    core.sharding. The shard is taken from the user an instance hint
+    belongs to, else from the user of the current request or for_user
+    block. Users, tokens and all other tables stay on the default
+    database. Writes to the data of a user being moved between shards
+    raise ShardMoving.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints, write=False)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints, write=True)
+
+    def route(self, model, hints, write: bool):
+        if not shard_aliases() or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+
+        state = current_routing.get()
+        current = state.get_user() if state is not None else None
+        instance = hints.get("instance")
+        user_model = get_user_model()
+        if isinstance(instance, user_model):
+            user = instance
+        elif instance is not None:
+            if instance._state.db and not write:
+                return instance._state.db
+            user_id = getattr(instance, "user_id", None)
+            user = current
+            if user_id is not None and (current is None or current.pk != user_id):
+                user = user_model.objects.filter(pk=user_id).first()
+        else:
+            user = current
+
+        if user is None:
+            return None
+        if write and user.shard_moving:
+            raise ShardMoving()
+
+        return shard_of(user)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+
+class ReplicaRouter:
+    """
+    Send reads to a read replica when the current request allows it, see
+    core.middleware.DatabaseRoutingMiddleware, and everything else to the
+    primary. Once a request writes, its later reads go to the primary too.
+    Reads of related objects follow the database of the instance they
+    were loaded from.
+    """
+
+    # Authentication must see tokens and accounts created moments ago, workers
+    # the jobs they claimed
+    primary_models = {"authtoken.token", "core.customuser", "core.job"}
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        state = current_routing.get()
+        if state is None or state.replica is None or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in self.primary_models:
+            return DEFAULT_DB_ALIAS
+
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary, shards hold the data of
+        # different users
+        shards = shard_aliases()
+        db1, db2 = obj1._state.db, obj2._state.db
+        if db1 != db2 and db1 in shards and db2 in shards:
+            return False
+
+        return True
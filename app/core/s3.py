@@ -0,0 +1,245 @@
+"""
+Minimal client for S3 compatible object stores.
+
+Covers what the recipe image storage needs: putting, getting, heading,
+deleting and listing objects and multipart uploads. Requests are signed
+with AWS Signature Version 4 and use path style URLs, which AWS, MinIO,
+Ceph and most other S3 compatible stores accept. Only the standard
+library is used, each request opens its own connection so a client can
+be shared between threads.
+"""
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from email.message import Message
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit
+from urllib.request import Request, urlopen
+from xml.etree import ElementTree
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class S3Error(Exception):
+    """Request rejected by the object store"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def _quote(value: str, *args) -> str:
+    return quote(value, safe="-_.~")
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def sign(
+    method: str,
+    url: str,
+    headers: Dict[str, str],
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: datetime,
+) -> str:
+    """
+    Return the Authorization header of a request signed with Signature
+    Version 4. All headers given are signed, they must include host,
+    x-amz-date and x-amz-content-sha256.
+    """
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    canonical_query = "&".join(f"{_quote(key)}={_quote(value)}" for key, value in query)
+    headers = {key.lower(): " ".join(value.split()) for key, value in headers.items()}
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join(
+        [
+            method,
+            parts.path or "/",
+            canonical_query,
+            "".join(f"{key}:{headers[key]}\n" for key in sorted(headers)),
+            signed_headers,
+            headers["x-amz-content-sha256"],
+        ]
+    )
+    day = now.strftime("%Y%m%d")
+    scope = f"{day}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(
+        [
+            "AWS4-HMAC-SHA256",
+            headers["x-amz-date"],
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ]
+    )
+    key = _hmac(f"AWS4{secret_key}".encode(), day)
+    for part in (region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    return (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+
+
+def _strip_namespaces(element: ElementTree.Element) -> ElementTree.Element:
+    for node in element.iter():
+        node.tag = node.tag.rpartition("}")[2]
+    return element
+
+
+class S3Client:
+    """Signed requests to one bucket of an S3 compatible store"""
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        timeout: float = 60.0,
+    ) -> None:
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.timeout = timeout
+
+    def url(self, key: str = "", **params) -> str:
+        url = f"{self.endpoint_url}/{quote(self.bucket)}"
+        if key:
+            url += "/" + quote(key, safe="/-_.~")
+        if params:
+            url += "?" + urlencode(sorted(params.items()), quote_via=_quote)
+        return url
+
+    def request(
+        self,
+        method: str,
+        key: str = "",
+        params: Optional[dict] = None,
+        data: bytes = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ):
+        """
+        Send a signed request, returning the response body, or the open
+        response when streaming. Error responses raise S3Error.
+        """
+        url = self.url(key, **(params or {}))
+        now = datetime.now(timezone.utc)
+        headers = {
+            # Instead of the form encoding urllib would send
+            "content-type": "application/octet-stream",
+            **(headers or {}),
+            "host": urlsplit(url).netloc,
+            "x-amz-date": now.strftime("%Y%m%dT%H%M%SZ"),
+            "x-amz-content-sha256": (
+                hashlib.sha256(data).hexdigest() if data else EMPTY_SHA256
+            ),
+        }
+        headers["authorization"] = sign(
+            method,
+            url,
+            headers,
+            self.access_key,
+            self.secret_key,
+            self.region,
+            now,
+        )
+        request = Request(url, data=data, headers=headers, method=method)
+        try:
+            response = urlopen(request, timeout=self.timeout)
+        except HTTPError as error:
+            with error:
+                raise S3Error(error.code, error.read().decode(errors="replace"))
+        if stream:
+            return response
+        with response:
+            return response.read()
+
+    def head(self, key: str) -> Optional[Message]:
+        """Return the headers of an object, None if it does not exist"""
+        try:
+            response = self.request("HEAD", key, stream=True)
+        except S3Error as error:
+            if error.status == 404:
+                return None
+            raise
+        with response:
+            return response.headers
+
+    def put(self, key: str, data: bytes, content_type: str = None) -> None:
+        headers = {"content-type": content_type} if content_type else {}
+        self.request("PUT", key, data=data, headers=headers)
+
+    def get(self, key: str):
+        """Return the response streaming an object's body"""
+        return self.request("GET", key, stream=True)
+
+    def delete(self, key: str) -> None:
+        self.request("DELETE", key)
+
+    def list(self, prefix: str, delimiter: str = "/") -> Iterator[Tuple[str, str]]:
+        """
+        Yield ("prefix", name) for common prefixes and ("key", name) for
+        objects below prefix, following continuation tokens
+        """
+        params = {"list-type": "2", "prefix": prefix, "delimiter": delimiter}
+        while True:
+            root = _strip_namespaces(
+                ElementTree.fromstring(self.request("GET", params=params))
+            )
+            for common in root.iterfind("CommonPrefixes/Prefix"):
+                yield "prefix", common.text
+            for content in root.iterfind("Contents/Key"):
+                yield "key", content.text
+            token = root.findtext("NextContinuationToken")
+            if root.findtext("IsTruncated") != "true" or not token:
+                return
+            params["continuation-token"] = token
+
+    def create_multipart_upload(self, key: str, content_type: str = None) -> str:
+        headers = {"content-type": content_type} if content_type else {}
+        body = self.request(
+            "POST", key, params={"uploads": ""}, data=b"", headers=headers
+        )
+        return _strip_namespaces(ElementTree.fromstring(body)).findtext("UploadId")
+
+    def upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> str:
+        """Upload one part, returning its ETag"""
+        response = self.request(
+            "PUT",
+            key,
+            params={"partNumber": str(number), "uploadId": upload_id},
+            data=data,
+            stream=True,
+        )
+        with response:
+            return response.headers["ETag"]
+
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, etags: List[str]
+    ) -> None:
+        parts = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in enumerate(etags, start=1)
+        )
+        body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>"
+        response = self.request(
+            "POST", key, params={"uploadId": upload_id}, data=body.encode()
+        )
+        # Failures after the upload started are reported with status 200
+        root = _strip_namespaces(ElementTree.fromstring(response))
+        if root.tag == "Error":
+            raise S3Error(200, root.findtext("Message") or "Upload failed")
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        self.request("DELETE", key, params={"uploadId": upload_id})
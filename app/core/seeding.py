@@ -0,0 +1,389 @@
+import io
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import repeat
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.models import CustomUser, Tag, Ingredient, Recipe
+from core.sharding import get_ring, id_range_start, reserve_id_range, shard_aliases
+
+
+@dataclass
+class SeedConfig:
+    """Size and shape of a synthetic dataset"""
+
+    users: int = 2
+    recipes_per_user: int = 200
+    tags_per_user: int = 20
+    ingredients_per_user: int = 60
+    tags_per_recipe: int = 3
+    ingredients_per_recipe: int = 6
+    zipf_exponent: float = 1.1
+    seed: int = 42
+    email_prefix: str = "seed"
+    password: str = "password"
+
+
+class BulkCreateWriter:
+    """Insert rows of a model in batches with bulk_create"""
+
+    def __init__(self, model, using: str, batch_size: int) -> None:
+        self.model = model
+        self.using = using
+        self.batch_size = batch_size
+        self.attnames = [field.attname for field in model._meta.concrete_fields]
+        self.rows = []
+        self.written = 0
+
+    def write(self, rows: Iterable[Sequence]) -> None:
+        for row in rows:
+            self.rows.append(row)
+            if len(self.rows) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        self.model.objects.using(self.using).bulk_create(
+            self.model(**dict(zip(self.attnames, row))) for row in self.rows
+        )
+        self.written += len(self.rows)
+        self.rows = []
+
+
+class CopyWriter(BulkCreateWriter):
+    """Stream rows of a model into PostgreSQL with COPY FROM STDIN"""
+
+    @staticmethod
+    def format_value(value) -> str:
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        return (
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        buffer = io.StringIO()
+        for row in self.rows:
+            buffer.write("\t".join(self.format_value(value) for value in row) + "\n")
+        buffer.seek(0)
+
+        columns = ", ".join(
+            f'"{field.column}"' for field in self.model._meta.concrete_fields
+        )
+        with connections[self.using].cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY "{self.model._meta.db_table}" ({columns}) FROM STDIN', buffer
+            )
+        self.written += len(self.rows)
+        self.rows = []
+
+
+def zipf_sample(
+    rng: np.random.Generator,
+    population: int,
+    rows: int,
+    size: int,
+    exponent: float,
+    block_size: int = 2000,
+) -> np.ndarray:
+    """
+    Draw size distinct items out of population for each of rows, with the
+    k-th item weighted by 1 / k ** exponent. Uses the Gumbel top-k trick so
+    a block of rows is sampled without a Python level loop, block_size rows
+    at a time to bound the block_size × population keys held in memory.
+    """
+    size = min(size, population)
+    sample = np.empty((rows, size), dtype=np.int64)
+    if not size:
+        return sample
+
+    log_weights = -exponent * np.log(np.arange(1, population + 1))
+    for start in range(0, rows, block_size):
+        stop = min(start + block_size, rows)
+        keys = log_weights + rng.gumbel(size=(stop - start, population))
+        sample[start:stop] = np.argpartition(-keys, size - 1, axis=1)[:, :size]
+
+    return sample
+
+
+class Seeder:
+    """
+    Generate users with Zipf distributed tag and ingredient usage. Primary
+    keys are assigned up front so every table is written in one pass, with
+    COPY on PostgreSQL and bulk_create elsewhere. A user's recipes are
+    sampled and written block_size at a time, each block in its own
+    transaction, so neither memory nor transactions grow with the dataset.
+    With DATABASE_SHARDS configured, users are written to the using
+    database and their recipe data to the shard the hash ring picks, in
+    the shard's id range. Run it while nothing else writes to the
+    databases.
+    """
+
+    def __init__(
+        self,
+        config: SeedConfig,
+        using: str = "default",
+        batch_size: int = 10000,
+        block_size: int = 2000,
+    ) -> None:
+        self.config = config
+        self.using = using
+        self.batch_size = batch_size
+        self.block_size = block_size
+        self.rng = np.random.default_rng(config.seed)
+        self.through_tags = Recipe.tags.through
+        self.through_ingredients = Recipe.ingredients.through
+        self.data_models = [
+            Tag,
+            Ingredient,
+            Recipe,
+            self.through_tags,
+            self.through_ingredients,
+        ]
+        self.models = [CustomUser, *self.data_models]
+        self.shards = shard_aliases()
+
+    def databases(self) -> Dict[str, List[type]]:
+        """Return the seeded models of every database written to"""
+        if not self.shards:
+            return {self.using: self.models}
+
+        return {
+            self.using: [CustomUser],
+            **{alias: self.data_models for alias in self.shards},
+        }
+
+    def shard_for(self, user_id: int) -> str:
+        """Return the shard of a user, empty when unsharded"""
+        return get_ring().node_for(user_id) if self.shards else ""
+
+    def next_ids(self, using: str, models: Sequence[type]) -> Dict[type, int]:
+        """Return the first free primary key of every seeded table"""
+        first = id_range_start(using) if using in self.shards else 1
+        next_ids = {}
+        for model in models:
+            last = (
+                model.objects.using(using)
+                .order_by("-pk")
+                .values_list("pk", flat=True)
+                .first()
+            )
+            next_ids[model] = max((last or 0) + 1, first)
+
+        return next_ids
+
+    def writer(self, model, using: str) -> BulkCreateWriter:
+        writer_class = BulkCreateWriter
+        if connections[using].vendor == "postgresql":
+            writer_class = CopyWriter
+
+        return writer_class(model, using, self.batch_size)
+
+    def reset_sequences(self, using: str, models: Sequence[type]) -> None:
+        """Move id sequences past the explicitly assigned primary keys"""
+        connection = connections[using]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        if using in self.shards:
+            # Tables still empty were reset below the shard's id range
+            reserve_id_range(using)
+
+    def commit(self, using: str, writers: Dict[type, BulkCreateWriter]) -> None:
+        """Write out buffered rows, to be called at the end of a transaction"""
+        for writer in writers.values():
+            writer.flush()
+        # Kept current at every commit, so an interrupted run leaves
+        # sequences past the rows written so far
+        self.reset_sequences(using, list(writers))
+
+    def user_rows(
+        self, user_id: int, shard: str, password: str, now
+    ) -> List[Sequence]:
+        """Return the user row, in concrete field order"""
+        values = {
+            "id": user_id,
+            "password": password,
+            "last_login": None,
+            "is_superuser": False,
+            "is_staff": False,
+            "is_active": True,
+            "date_joined": now,
+            "email": f"{self.config.email_prefix}{user_id}@example.com",
+            "name": "",
+            "shard": shard,
+            "shard_moving": False,
+        }
+
+        return [
+            [values[field.attname] for field in CustomUser._meta.concrete_fields]
+        ]
+
+    def write_recipes(
+        self,
+        writers: Dict[type, BulkCreateWriter],
+        ids: Dict[type, int],
+        user_id: int,
+        positions: range,
+        used_tags: np.ndarray,
+        used_ingredients: np.ndarray,
+    ) -> None:
+        """Write a block of a user's recipes and their links"""
+        rows = len(positions)
+        recipe_ids = ids[Recipe] + np.arange(rows)
+        time_min = np.clip(self.rng.lognormal(3.3, 0.7, rows), 1, 600).astype(int)
+        cents = np.clip(self.rng.lognormal(6.9, 0.8, rows), 50, 99999).astype(int)
+        writers[Recipe].write(
+            (
+                int(pk),
+                f"Recipe {position}",
+                user_id,
+                int(minutes),
+                Decimal(int(price)) / 100,
+                "",
+                "",
+            )
+            for position, pk, minutes, price in zip(
+                positions, recipe_ids, time_min, cents
+            )
+        )
+
+        # Ingredient links also store their position and quantity
+        link_positions = np.tile(
+            np.arange(used_ingredients.shape[1]), used_ingredients.shape[0]
+        )
+        for through, used, extra in (
+            (self.through_tags, used_tags, ()),
+            (
+                self.through_ingredients,
+                used_ingredients,
+                (link_positions.tolist(), repeat("")),
+            ),
+        ):
+            recipes = np.repeat(recipe_ids, used.shape[1])
+            link_ids = ids[through] + np.arange(len(recipes))
+            writers[through].write(
+                zip(
+                    link_ids.tolist(),
+                    repeat(user_id),
+                    recipes.tolist(),
+                    used.ravel().tolist(),
+                    *extra,
+                )
+            )
+            ids[through] += len(recipes)
+
+        ids[Recipe] += rows
+
+    def run(self) -> Dict[str, int]:
+        """Generate the dataset and return the number of rows per table"""
+        config = self.config
+        password = make_password(config.password)
+        now = timezone.now()
+        databases = self.databases()
+        ids = {using: self.next_ids(using, models) for using, models in databases.items()}
+        writers = {
+            using: {model: self.writer(model, using) for model in models}
+            for using, models in databases.items()
+        }
+        users = writers[self.using][CustomUser]
+
+        for index in range(config.users):
+            user_id = ids[self.using][CustomUser] + index
+            shard = self.shard_for(user_id)
+            using = shard or self.using
+            data_ids, data_writers = ids[using], writers[using]
+            tag_ids = data_ids[Tag] + np.arange(config.tags_per_user)
+            ingredient_ids = data_ids[Ingredient] + np.arange(
+                config.ingredients_per_user
+            )
+            # Only the chosen ids of every recipe are kept, a few bytes per link
+            used_tags = tag_ids[
+                zipf_sample(
+                    self.rng,
+                    config.tags_per_user,
+                    config.recipes_per_user,
+                    config.tags_per_recipe,
+                    config.zipf_exponent,
+                    self.block_size,
+                )
+            ]
+            used_ingredients = ingredient_ids[
+                zipf_sample(
+                    self.rng,
+                    config.ingredients_per_user,
+                    config.recipes_per_user,
+                    config.ingredients_per_recipe,
+                    config.zipf_exponent,
+                    self.block_size,
+                )
+            ]
+            tag_counts = np.bincount(
+                used_tags.ravel() - data_ids[Tag], minlength=config.tags_per_user
+            )
+            ingredient_counts = np.bincount(
+                used_ingredients.ravel() - data_ids[Ingredient],
+                minlength=config.ingredients_per_user,
+            )
+
+            # The user is committed after their tags and ingredients, so a
+            # seeded user always finds their data on the shard
+            with transaction.atomic(using=self.using):
+                users.write(self.user_rows(user_id, shard, password, now))
+                with transaction.atomic(using=using):
+                    data_writers[Tag].write(
+                        (int(pk), f"Tag {position}", user_id, int(count))
+                        for position, (pk, count) in enumerate(
+                            zip(tag_ids, tag_counts)
+                        )
+                    )
+                    data_writers[Ingredient].write(
+                        (int(pk), f"Ingredient {position}", user_id, int(count))
+                        for position, (pk, count) in enumerate(
+                            zip(ingredient_ids, ingredient_counts)
+                        )
+                    )
+                    self.commit(using, data_writers)
+                if using != self.using:
+                    self.commit(self.using, writers[self.using])
+
+            for start in range(0, config.recipes_per_user, self.block_size):
+                stop = min(start + self.block_size, config.recipes_per_user)
+                with transaction.atomic(using=using):
+                    self.write_recipes(
+                        data_writers,
+                        data_ids,
+                        user_id,
+                        range(start, stop),
+                        used_tags[start:stop],
+                        used_ingredients[start:stop],
+                    )
+                    self.commit(using, data_writers)
+
+            data_ids[Tag] += config.tags_per_user
+            data_ids[Ingredient] += config.ingredients_per_user
+
+        return {
+            model._meta.db_table: sum(
+                writers[using][model].written
+                for using, models in databases.items()
+                if model in models
+            )
+            for model in self.models
+        }
@@ -0,0 +1,208 @@
+import bisect
+import hashlib
+import logging
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+# Tables holding per-user data, spread over DATABASE_SHARDS
+SHARDED_MODELS = {
+    "core.tag",
+    "core.ingredient",
+    "core.recipe",
+    "core.recipetag",
+    "core.recipeingredient",
+}
+
+# Shard i allocates ids from (i + 1) << ID_RANGE_BITS so rows keep their
+# primary keys when their user moves to another shard
+ID_RANGE_BITS = 40
+
+
+def shard_aliases() -> List[str]:
+    """Return the database aliases holding recipe data, empty if unsharded"""
+    return list(getattr(settings, "DATABASE_SHARDS", ()))
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes. Adding a node takes over
+    about 1/n of the keys, all of them from the other nodes.
+    """
+
+    def __init__(self, nodes: Sequence[str], vnodes: int = 64) -> None:
+        points = sorted(
+            (hash_key(f"{node}#{index}"), node)
+            for node in nodes
+            for index in range(vnodes)
+        )
+        self.points = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def node_for(self, key) -> str:
+        index = bisect.bisect(self.points, hash_key(str(key))) % len(self.points)
+        return self.nodes[index]
+
+
+@lru_cache(maxsize=8)
+def _ring(nodes: tuple, vnodes: int) -> HashRing:
+    return HashRing(nodes, vnodes)
+
+
+def get_ring() -> HashRing:
+    """Return the ring placing users on DATABASE_SHARDS"""
+    return _ring(tuple(shard_aliases()), getattr(settings, "SHARD_VNODES", 64))
+
+
+def shard_of(user) -> str:
+    """Return the database holding a user's recipe data"""
+    return user.shard or DEFAULT_DB_ALIAS
+
+
+class ShardMoving(APIException):
+    """Raised on writes to the data of a user being moved between shards"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Your data is being moved, please retry shortly."
+    default_code = "shard_moving"
+    wait = 5
+
+
+def sharded_models():
+    """Return the sharded models, parents before the tables pointing at them"""
+    from core.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+
+    return [Tag, Ingredient, Recipe, RecipeTag, RecipeIngredient]
+
+
+def id_range_start(alias: str) -> int:
+    """Return the first primary key of a shard's id range"""
+    return (shard_aliases().index(alias) + 1) << ID_RANGE_BITS
+
+
+def reserve_id_range(alias: str) -> None:
+    """Move the id sequences of a shard's tables to the shard's id range"""
+    start = id_range_start(alias)
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    f'GREATEST((SELECT MAX(id) FROM "{table}"), %s))',
+                    [table, start],
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute(
+                    "UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s",
+                    [start, table],
+                )
+                if not cursor.rowcount:
+                    cursor.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                        [table, start],
+                    )
+
+
+class ShardMover:
+    """
+    Move the recipe data of users to the shard the ring picks for them
+    while the API keeps serving. Users are moved in batches:
+
+    1. The batch is flagged as moving, writes to its data raise
+       ShardMoving. After a grace period, requests that loaded the users
+       before they were flagged have finished writing.
+    2. Each user's rows are copied to the target in one transaction,
+       keeping their primary keys, and the user is pointed at the target.
+    3. After another grace period for requests still reading the source,
+       the rows are deleted from it.
+    """
+
+    def __init__(self, batch_size: int = 1000, grace: float = 2.0) -> None:
+        self.batch_size = batch_size
+        self.grace = grace
+        self.ring = get_ring()
+
+    def plan(self, users: Iterable) -> List[Tuple[int, str, str]]:
+        """Return (user id, source, target) of users on the wrong shard"""
+        moves = []
+        for user in users:
+            target = self.ring.node_for(user.pk)
+            if shard_of(user) != target or user.shard_moving:
+                moves.append((user.pk, shard_of(user), target))
+
+        return moves
+
+    def copy(self, user_id: int, source: str, target: str) -> int:
+        """Copy a user's rows from source to target, returning the row count"""
+        copied = 0
+        with transaction.atomic(using=target):
+            for model in sharded_models():
+                rows = (
+                    model._base_manager.using(source)
+                    .filter(user_id=user_id)
+                    .order_by("pk")
+                )
+                created = model._base_manager.using(target).bulk_create(
+                    rows.iterator(chunk_size=self.batch_size),
+                    batch_size=self.batch_size,
+                )
+                copied += len(created)
+
+        return copied
+
+    def delete(self, user_id: int, database: str) -> None:
+        """Delete a user's rows from a shard, links before what they link"""
+        with transaction.atomic(using=database):
+            for model in reversed(sharded_models()):
+                queryset = model._base_manager.using(database).filter(user_id=user_id)
+                queryset._raw_delete(database)
+
+    def move(self, moves: Sequence[Tuple[int, str, str]]) -> Dict[str, int]:
+        """Move a batch of users, returning counts of moved and failed users"""
+        user_model = get_user_model()
+        user_ids = [user_id for user_id, _, _ in moves]
+        user_model.objects.filter(pk__in=user_ids).update(shard_moving=True)
+        time.sleep(self.grace)
+
+        result = Counter()
+        moved = []
+        for user_id, source, target in moves:
+            if source == target:
+                user_model.objects.filter(pk=user_id).update(shard_moving=False)
+                result["moved"] += 1
+                continue
+            try:
+                rows = self.copy(user_id, source, target)
+            except DatabaseError:
+                logger.exception("Could not move user %s to %s", user_id, target)
+                user_model.objects.filter(pk=user_id).update(shard_moving=False)
+                result["failed"] += 1
+                continue
+            user_model.objects.filter(pk=user_id).update(
+                shard=target, shard_moving=False
+            )
+            moved.append((user_id, source))
+            result["moved"] += 1
+            result["rows"] += rows
+
+        if moved:
+            time.sleep(self.grace)
+        for user_id, source in moved:
+            self.delete(user_id, source)
+
+        return result
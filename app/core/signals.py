@@ -0,0 +1,84 @@
+from django.apps import apps
+from django.db.models.signals import (
+    m2m_changed,
+    pre_delete,
+    post_delete,
+    post_migrate,
+    post_save,
+)
+from django.dispatch import receiver
+
+from core.models import CustomUser, Tag, Ingredient, Recipe, refresh_recipe_counts
+from core.purging import Purger
+from core.sharding import get_ring, reserve_id_range, shard_aliases, shard_of
+
+COUNTED_MODELS = {Recipe.tags.through: Tag, Recipe.ingredients.through: Ingredient}
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_recipe_counts(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Keep recipe_count of tags and ingredients in sync with recipe links"""
+    counted_model = COUNTED_MODELS[sender]
+
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_recipe_counts(counted_model, [instance.pk])
+        return
+
+    if action == "pre_clear":
+        field_name = f"{counted_model._meta.model_name}s"
+        instance._cleared_pks = list(
+            getattr(instance, field_name).values_list("pk", flat=True)
+        )
+    elif action == "post_clear":
+        refresh_recipe_counts(counted_model, instance.__dict__.pop("_cleared_pks", []))
+    elif action in ("post_add", "post_remove") and pk_set:
+        refresh_recipe_counts(counted_model, pk_set)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_links(sender, instance, **kwargs):
+    """Store ids of linked tags and ingredients before the links are deleted"""
+    instance._linked_tag_pks = list(instance.tags.values_list("pk", flat=True))
+    instance._linked_ingredient_pks = list(
+        instance.ingredients.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_links(sender, instance, **kwargs):
+    """Decrease recipe_count of tags and ingredients used by a deleted recipe"""
+    refresh_recipe_counts(Tag, instance.__dict__.pop("_linked_tag_pks", []))
+    refresh_recipe_counts(
+        Ingredient, instance.__dict__.pop("_linked_ingredient_pks", [])
+    )
+
+
+@receiver(post_save, sender=CustomUser)
+def place_new_user(sender, instance, created, using, raw=False, **kwargs):
+    """Put the recipe data of a new user on a shard picked by the hash ring"""
+    if not created or raw or instance.shard or not shard_aliases():
+        return
+
+    instance.shard = get_ring().node_for(instance.pk)
+    sender.objects.using(using).filter(pk=instance.pk).update(shard=instance.shard)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def purge_sharded_user_data(sender, instance, using, **kwargs):
+    """
+    Delete the recipe data of a user kept on another database than the
+    user, which the cascade of the deletion does not reach
+    """
+    if shard_of(instance) != using:
+        Purger().purge_user(instance, keep_user=True)
+
+
+def reserve_shard_id_range(sender, using, **kwargs):
+    """Give a migrated shard its own id range, see core.sharding"""
+    if using in shard_aliases():
+        reserve_id_range(using)
+
+
+post_migrate.connect(reserve_shard_id_range, sender=apps.get_app_config("core"))
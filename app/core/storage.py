@@ -0,0 +1,294 @@
+import mimetypes
+import os
+import posixpath
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from itertools import chain
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+from django.utils.functional import cached_property
+
+from core.s3 import S3Client, S3Error
+from core.sharding import HashRing
+
+
+@deconstructible
+class InMemoryStorage(Storage):
+    """
+    File storage keeping file contents in a dictionary of the process.
+    Used by the test settings so uploads never touch MEDIA_ROOT and test
+    processes running in parallel cannot see each other's files.
+    """
+
+    def __init__(self, base_url: str = None) -> None:
+        self.base_url = base_url
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def _open(self, name, mode="rb"):
+        if "w" in mode or "a" in mode:
+            raise ValueError("InMemoryStorage files are written with save()")
+        try:
+            content, _ = self.files[name]
+        except KeyError:
+            raise FileNotFoundError(name)
+
+        return ContentFile(content, name=name)
+
+    def _save(self, name, content):
+        if hasattr(content, "seek"):
+            content.seek(0)
+        data = b"".join(content.chunks())
+        with self.lock:
+            self.files[name] = (data, timezone.now())
+
+        return name
+
+    def delete(self, name) -> None:
+        with self.lock:
+            self.files.pop(name, None)
+
+    def exists(self, name) -> bool:
+        return name in self.files
+
+    def size(self, name) -> int:
+        return len(self.files[name][0])
+
+    def listdir(self, path):
+        path = path.strip("/")
+        prefix = f"{path}/" if path else ""
+        directories, files = set(), set()
+        for name in self.files:
+            if not name.startswith(prefix):
+                continue
+            head, _, tail = name[len(prefix):].partition("/")
+            if tail:
+                directories.add(head)
+            else:
+                files.add(head)
+
+        return sorted(directories), sorted(files)
+
+    def get_modified_time(self, name):
+        return self.files[name][1]
+
+    def get_created_time(self, name):
+        return self.files[name][1]
+
+    def get_accessed_time(self, name):
+        return self.files[name][1]
+
+    def url(self, name) -> str:
+        base_url = self.base_url if self.base_url is not None else settings.MEDIA_URL
+        return urljoin(base_url, filepath_to_uri(posixpath.normpath(name)))
+
+
+@deconstructible
+class ShardedFileSystemStorage(FileSystemStorage):
+    """
+    Local storage spreading files over several directories, e.g. one per
+    disk, listed in MEDIA_ROOTS. A file's directory is picked by hashing
+    its name on a HashRing, names and URLs do not depend on it. Adding a
+    directory sends about 1/n of the names to it, files written before
+    are still found in their old directory.
+    """
+
+    def __init__(self, locations=None, vnodes: int = 64, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._locations = locations
+        self.vnodes = vnodes
+
+    @cached_property
+    def locations(self):
+        locations = self._value_or_setting(
+            self._locations, getattr(settings, "MEDIA_ROOTS", None)
+        )
+        return [os.path.abspath(location) for location in locations or [self.location]]
+
+    @cached_property
+    def ring(self) -> HashRing:
+        return HashRing(self.locations, self.vnodes)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting in ("MEDIA_ROOT", "MEDIA_ROOTS"):
+            self.__dict__.pop("locations", None)
+            self.__dict__.pop("ring", None)
+
+    def path(self, name) -> str:
+        path = safe_join(self.ring.node_for(name), name)
+        if len(self.locations) > 1 and not os.path.exists(path):
+            for location in self.locations:
+                moved = safe_join(location, name)
+                if os.path.exists(moved):
+                    return moved
+
+        return path
+
+    def _save(self, name, content):
+        # FileSystemStorage returns the path relative to MEDIA_ROOT
+        saved = os.path.join(self.location, super()._save(name, content))
+        path = os.path.normpath(saved)
+        location = next(
+            location
+            for location in self.locations
+            if path.startswith(os.path.join(location, ""))
+        )
+
+        return os.path.relpath(path, location).replace("\\", "/")
+
+    def listdir(self, path):
+        directories, files = set(), set()
+        for location in self.locations:
+            try:
+                with os.scandir(safe_join(location, path)) as entries:
+                    for entry in entries:
+                        (directories if entry.is_dir() else files).add(entry.name)
+            except FileNotFoundError:
+                continue
+
+        return sorted(directories), sorted(files)
+
+
+@deconstructible
+class S3Storage(Storage):
+    """
+    Storage keeping files in a bucket of an S3 compatible store, so app
+    nodes share media without sharing a disk. Files larger than one chunk
+    of S3_MULTIPART_CHUNK_SIZE bytes are sent as a multipart upload with
+    S3_MULTIPART_CONCURRENCY parts in flight. URLs start with
+    S3_PUBLIC_URL when set, e.g. a CDN, else with MEDIA_URL, which
+    core.views.media_view serves from this storage.
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str = None,
+        bucket: str = None,
+        access_key: str = None,
+        secret_key: str = None,
+        region: str = None,
+        base_url: str = None,
+        chunk_size: int = None,
+        concurrency: int = None,
+    ) -> None:
+        self.options = {
+            "S3_ENDPOINT_URL": endpoint_url,
+            "S3_BUCKET": bucket,
+            "S3_ACCESS_KEY_ID": access_key,
+            "S3_SECRET_ACCESS_KEY": secret_key,
+            "S3_REGION": region,
+            "S3_PUBLIC_URL": base_url,
+            "S3_MULTIPART_CHUNK_SIZE": chunk_size,
+            "S3_MULTIPART_CONCURRENCY": concurrency,
+        }
+
+    def option(self, name: str, default=None):
+        value = self.options[name]
+        return getattr(settings, name, default) if value is None else value
+
+    @cached_property
+    def client(self) -> S3Client:
+        return S3Client(
+            self.option("S3_ENDPOINT_URL"),
+            self.option("S3_BUCKET"),
+            self.option("S3_ACCESS_KEY_ID"),
+            self.option("S3_SECRET_ACCESS_KEY"),
+            self.option("S3_REGION", "us-east-1"),
+        )
+
+    def _open(self, name, mode="rb"):
+        if "w" in mode or "a" in mode:
+            raise ValueError("S3Storage files are written with save()")
+        try:
+            response = self.client.get(name)
+        except S3Error as error:
+            if error.status == 404:
+                raise FileNotFoundError(name)
+            raise
+        file = File(response, name=name)
+        file.size = int(response.headers["Content-Length"])
+
+        return file
+
+    def _save(self, name, content):
+        if hasattr(content, "seek"):
+            content.seek(0)
+        chunk_size = self.option("S3_MULTIPART_CHUNK_SIZE", 8 * 1024 * 1024)
+        chunks = iter(lambda: content.read(chunk_size), b"")
+        content_type = mimetypes.guess_type(name)[0]
+        first = next(chunks, b"")
+        second = next(chunks, None)
+        if second is None:
+            self.client.put(name, first, content_type)
+        else:
+            self.multipart_upload(name, chain([first, second], chunks), content_type)
+
+        return name
+
+    def multipart_upload(self, name: str, chunks, content_type: str = None) -> None:
+        """Upload chunks as parts in parallel, holding few of them in memory"""
+        concurrency = self.option("S3_MULTIPART_CONCURRENCY", 4)
+        upload_id = self.client.create_multipart_upload(name, content_type)
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                parts, pending = [], set()
+                for number, chunk in enumerate(chunks, start=1):
+                    if len(pending) >= concurrency:
+                        _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    part = pool.submit(
+                        self.client.upload_part, name, upload_id, number, chunk
+                    )
+                    parts.append(part)
+                    pending.add(part)
+                etags = [part.result() for part in parts]
+            self.client.complete_multipart_upload(name, upload_id, etags)
+        except BaseException:
+            self.client.abort_multipart_upload(name, upload_id)
+            raise
+
+    def delete(self, name) -> None:
+        self.client.delete(name)
+
+    def exists(self, name) -> bool:
+        return self.client.head(name) is not None
+
+    def headers(self, name):
+        headers = self.client.head(name)
+        if headers is None:
+            raise FileNotFoundError(name)
+        return headers
+
+    def size(self, name) -> int:
+        return int(self.headers(name)["Content-Length"])
+
+    def get_modified_time(self, name):
+        modified = parsedate_to_datetime(self.headers(name)["Last-Modified"])
+        if settings.USE_TZ:
+            return modified
+        return timezone.make_naive(modified, timezone.utc)
+
+    def listdir(self, path):
+        path = path.strip("/")
+        prefix = f"{path}/" if path else ""
+        directories, files = [], []
+        for kind, name in self.client.list(prefix):
+            name = name[len(prefix):]
+            if kind == "prefix":
+                directories.append(name.rstrip("/"))
+            elif name:
+                files.append(name)
+
+        return directories, files
+
+    def url(self, name) -> str:
+        base_url = self.option("S3_PUBLIC_URL") or settings.MEDIA_URL
+        return urljoin(base_url, filepath_to_uri(posixpath.normpath(name)))
@@ -0,0 +1,33 @@
+from typing import List
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from core.images import make_variants, variant_names
+from core.jobs import task
+from core.models import Ingredient, Tag, refresh_recipe_counts
+
+
+@task("core.repair_recipe_counts")
+def repair_recipe_counts(user_id: int = None) -> None:
+    """Recompute recipe counts of all tags and ingredients, or a user's"""
+    for model in (Tag, Ingredient):
+        pks = None
+        if user_id is not None:
+            pks = model.objects.filter(user_id=user_id).values("pk")
+        with transaction.atomic():
+            refresh_recipe_counts(model, pks)
+
+
+@task("core.delete_files")
+def delete_files(names: List[str]) -> None:
+    """Delete images and their variants, missing ones are skipped"""
+    for name in names:
+        for file_name in (name, *variant_names(name)):
+            default_storage.delete(file_name)
+
+
+@task("core.make_image_variants")
+def make_image_variants(image: str) -> None:
+    """Write the resized variants of an uploaded recipe image"""
+    make_variants(image)
@@ -1,7 +1,19 @@
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management import call_command
 
 from django.db.utils import OperationalError
+from django.utils import timezone
+
+from core.images import variant_name
+from core.models import Tag, Ingredient, Recipe
+from core.tasks import delete_files
 
 
 def test_wait_for_db_ready() -> None:
@@ -21,3 +33,169 @@ def test_wait_for_db(ts) -> None:
         call_command("wait_for_db")
 
         assert gi.call_count == 6
+
+
+@pytest.mark.django_db
+def test_repair_recipe_counts(simple_user, helper_functions) -> None:
+    """Test repairing drifted recipe counts"""
+    tag = helper_functions.sample_tag(user=simple_user)
+    ingredient = helper_functions.sample_ingredient(user=simple_user)
+    recipe = helper_functions.sample_recipe(user=simple_user)
+    recipe.tags.add(tag)
+    Tag.objects.update(recipe_count=10)
+    Ingredient.objects.update(recipe_count=3)
+
+    call_command("repair_recipe_counts", stdout=StringIO())
+    tag.refresh_from_db()
+    ingredient.refresh_from_db()
+
+    assert tag.recipe_count == 1
+    assert ingredient.recipe_count == 0
+
+
+@pytest.mark.django_db
+def test_repair_recipe_counts_of_user(
+    simple_user, create_user, helper_functions
+) -> None:
+    """Test repairing only the recipe counts of one user"""
+    other_user = create_user(email="other@example.com", password="pass")
+    tag = helper_functions.sample_tag(user=simple_user)
+    other_tag = helper_functions.sample_tag(user=other_user)
+    Tag.objects.update(recipe_count=5)
+
+    call_command("repair_recipe_counts", user=simple_user.pk, stdout=StringIO())
+    tag.refresh_from_db()
+    other_tag.refresh_from_db()
+
+    assert tag.recipe_count == 0
+    assert other_tag.recipe_count == 5
+
+
+@pytest.mark.django_db
+def test_seed_data(simple_user, helper_functions) -> None:
+    """Test generating a dataset with consistent counts and sequences"""
+    out = StringIO()
+    call_command(
+        "seed_data",
+        users=3,
+        recipes_per_user=40,
+        tags=8,
+        ingredients=12,
+        tags_per_recipe=2,
+        ingredients_per_recipe=4,
+        block_size=15,
+        stdout=out,
+    )
+    seeded = get_user_model().objects.filter(email__startswith="seed")
+
+    assert seeded.count() == 3
+    assert Recipe.objects.filter(user__in=seeded).count() == 120
+    assert Recipe.tags.through.objects.count() == 240
+    assert Recipe.ingredients.through.objects.count() == 480
+    for user in seeded:
+        assert user.check_password("password")
+        counts = list(
+            Tag.objects.filter(user=user)
+            .order_by("pk")
+            .values_list("recipe_count", flat=True)
+        )
+        assert sum(counts) == 80
+        assert counts[0] > counts[-1]
+        assert not Recipe.tags.through.objects.filter(recipe__user=user).exclude(
+            tag__user=user
+        ).exists()
+
+    seeded_counts = list(Ingredient.objects.order_by("pk").values_list("recipe_count"))
+    call_command("repair_recipe_counts", stdout=StringIO())
+    assert sum(Tag.objects.values_list("recipe_count", flat=True)) == 240
+    assert list(Ingredient.objects.order_by("pk").values_list("recipe_count")) == (
+        seeded_counts
+    )
+
+    recipe = helper_functions.sample_recipe(user=simple_user)
+    assert recipe.pk > Recipe.objects.exclude(pk=recipe.pk).latest("pk").pk
+
+
+@pytest.mark.django_db
+def test_purge_user(
+    simple_user, create_user, helper_functions, settings, tmp_path
+) -> None:
+    """Test deleting a user's data in batches and their images by a worker"""
+    settings.MEDIA_ROOT = str(tmp_path)
+    image = default_storage.save("uploads/recipe/cake.jpg", ContentFile(b"jpeg"))
+    tag = helper_functions.sample_tag(user=simple_user)
+    for index in range(5):
+        recipe = helper_functions.sample_recipe(user=simple_user, title=f"R{index}")
+        recipe.tags.add(tag)
+        recipe.ingredients.add(helper_functions.sample_ingredient(user=simple_user))
+    Recipe.objects.filter(pk=recipe.pk).update(image=image)
+    other = create_user(email="other@londonappdev.com", password="testpass")
+    kept = helper_functions.sample_recipe(user=other)
+    kept.tags.add(helper_functions.sample_tag(user=other))
+    out = StringIO()
+
+    call_command("purge_user", simple_user.email, "--batch-size", "2", stdout=out)
+
+    assert "core.Recipe: 5 deleted" in out.getvalue()
+    assert "core.Ingredient: 5 deleted" in out.getvalue()
+    assert not get_user_model().objects.filter(pk=simple_user.pk).exists()
+    assert list(Recipe.objects.all()) == [kept]
+    assert list(Tag.objects.values_list("user_id", "recipe_count")) == [(other.pk, 1)]
+    assert Recipe.tags.through.objects.get().recipe == kept
+    assert default_storage.exists(image)
+
+    call_command("run_worker", "--processes", "0", "--burst", stdout=StringIO())
+    assert not default_storage.exists(image)
+
+    call_command("purge_user", str(other.pk), "--keep-user", stdout=StringIO())
+    assert not Recipe.objects.exists()
+    assert get_user_model().objects.filter(pk=other.pk).exists()
+
+
+@pytest.mark.django_db
+def test_gc_media(simple_user, helper_functions) -> None:
+    """Test removing only old images and variants no recipe refers to"""
+    names = [
+        default_storage.save(f"uploads/gc/{name}.jpg", ContentFile(b"jpeg"))
+        for name in ("kept", "old", "replaced", "new")
+    ]
+    kept, old, replaced, new = names
+    variants = [
+        default_storage.save(variant_name(name, "thumbnail"), ContentFile(b"jpeg"))
+        for name in (kept, old)
+    ]
+    helper_functions.sample_recipe(user=simple_user, image=kept)
+    hour_ago = timezone.now() - timedelta(hours=2)
+    for name in (kept, old, replaced, *variants):
+        default_storage.files[name] = (b"jpeg", hour_ago)
+    options = ("--prefix", "uploads/gc", "--rate", "0", "--batch-size", "1")
+
+    out = StringIO()
+    call_command("gc_media", *options, "--dry-run", stdout=out)
+    assert out.getvalue().splitlines()[:3] == [old, replaced, variants[1]]
+    assert "3 orphaned files, 12 bytes" in out.getvalue()
+    assert all(default_storage.exists(name) for name in names + variants)
+
+    call_command("gc_media", *options, "--quarantine", "trash", stdout=StringIO())
+    assert [default_storage.exists(name) for name in names + variants] == [
+        True,
+        False,
+        False,
+        True,
+        True,
+        False,
+    ]
+    assert default_storage.exists(f"trash/{old}")
+
+    delete_files([kept, new, f"trash/{old}", f"trash/{replaced}", f"trash/{variants[1]}"])
+
+
+def test_calibrate_password_hashing() -> None:
+    """Test calibrating PBKDF2 iterations for a target latency"""
+    out = StringIO()
+    call_command(
+        "calibrate_password_hashing", target_ms=5, samples=1, round_to=1000, stdout=out
+    )
+
+    assert "PASSWORD_HASH_ITERATIONS=" in out.getvalue()
+    assert int(out.getvalue().rsplit("=", 1)[1]) % 1000 == 0
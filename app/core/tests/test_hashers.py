@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.test import AsyncClient, AsyncRequestFactory
+from django.urls import reverse
+from rest_framework import status
+
+from core import hashers
+from user.views import CreateTokenView
+
+POOLED_HASHER = "core.hashers.PooledPBKDF2PasswordHasher"
+TOKEN_URL = reverse("user:token")
+
+
+@pytest.fixture
+def pooled_hashing(settings):
+    """Hash with the pooled PBKDF2 hasher and a cheap iteration count"""
+    settings.PASSWORD_HASHERS = [
+        POOLED_HASHER,
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ]
+    settings.PASSWORD_HASH_ITERATIONS = 1000
+
+    return settings
+
+
+def authenticate(email: str, password: str):
+    """Authenticate through aauthenticate from sync code"""
+    return async_to_sync(hashers.aauthenticate)(username=email, password=password)
+
+
+def test_pooled_hash_matches_django_pbkdf2(pooled_hashing) -> None:
+    """Test hashes from the pool verify with Django's PBKDF2 hasher"""
+    pooled_hashing.PASSWORD_HASHING_WORKERS = 1
+    encoded = make_password("secret")
+
+    assert encoded.startswith("pbkdf2_sha256$1000$")
+    assert async_to_sync(hashers.amake_password)("secret").startswith(
+        "pbkdf2_sha256$1000$"
+    )
+    pooled_hashing.PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher"
+    ]
+    assert check_password("secret", encoded)
+
+
+@pytest.mark.django_db
+def test_aauthenticate_upgrades_hash(pooled_hashing, create_user) -> None:
+    """Test logging in rehashes passwords with outdated iterations"""
+    user = create_user(email="user@example.com", password="secret")
+    pooled_hashing.PASSWORD_HASH_ITERATIONS = 2000
+
+    assert authenticate("user@example.com", "wrong") is None
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$1000$")
+
+    assert authenticate("user@example.com", "secret") == user
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$2000$")
+    assert user.check_password("secret")
+
+
+@pytest.mark.django_db
+def test_aauthenticate_unknown_or_inactive(pooled_hashing, create_user) -> None:
+    """Test unknown emails and inactive users do not authenticate"""
+    create_user(email="user@example.com", password="secret", is_active=False)
+
+    assert authenticate("none@example.com", "secret") is None
+    assert authenticate("user@example.com", "secret") is None
+
+
+@pytest.mark.django_db
+def test_aauthenticate_sends_login_failed(pooled_hashing, create_user) -> None:
+    """Test failed logins send user_login_failed like authenticate"""
+    create_user(email="user@example.com", password="secret")
+    failures = []
+
+    def receiver(sender, credentials, **kwargs):
+        failures.append(credentials["username"])
+
+    user_login_failed.connect(receiver)
+    try:
+        assert authenticate("user@example.com", "wrong") is None
+    finally:
+        user_login_failed.disconnect(receiver)
+
+    assert failures == ["user@example.com"]
+
+
+@pytest.mark.django_db
+def test_token_over_asgi_hashes_in_pool(pooled_hashing, create_user) -> None:
+    """Test obtaining a token through the ASGI handler with pooled hashing"""
+    pooled_hashing.PASSWORD_HASHING_WORKERS = 1
+    create_user(email="user@example.com", password="secret")
+    client = AsyncClient()
+    payload = {"email": "user@example.com", "password": "secret"}
+
+    async def login():
+        response = await client.post(
+            TOKEN_URL, payload, content_type="application/json"
+        )
+        failed = await client.post(
+            TOKEN_URL,
+            {**payload, "password": "wrong"},
+            content_type="application/json",
+        )
+        return response, failed
+
+    response, failed = async_to_sync(login)()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "token" in response.json()
+    assert failed.status_code == status.HTTP_400_BAD_REQUEST
+    assert "non_field_errors" in failed.json()
+
+
+def test_token_view_hashes_off_db_threads(
+    pooled_hashing, transactional_db, create_user, monkeypatch
+) -> None:
+    """Test that the async token view does not hash on database threads"""
+    pooled_hashing.ASYNC_DB_THREADS = 2
+    create_user(email="user@example.com", password="secret")
+    threads = []
+    hash = hashers.pbkdf2_hash
+
+    def pbkdf2_hash(*args):
+        threads.append(threading.current_thread().name)
+        return hash(*args)
+
+    monkeypatch.setattr(hashers, "pbkdf2_hash", pbkdf2_hash)
+    view = CreateTokenView.as_async_view()
+    request = AsyncRequestFactory().post(
+        TOKEN_URL,
+        {"email": "user@example.com", "password": "secret"},
+        content_type="application/json",
+    )
+    response = async_to_sync(view)(request)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert threads
+    assert not any(name.startswith("async-db") for name in threads)
@@ -0,0 +1,157 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from core.jobs import claim, enqueue, record_queue_depth, run_job, task
+from core.management.commands.run_worker import Command as WorkerCommand
+from core.models import Job, Tag
+
+pytestmark = pytest.mark.django_db
+
+calls = []
+
+
+@task("tests.record")
+def record(value: int) -> None:
+    """Remember the value a job ran with"""
+    calls.append(value)
+
+
+@task("tests.fail")
+def fail() -> None:
+    """Fail every attempt"""
+    raise RuntimeError("Broken")
+
+
+def run_worker(*args) -> str:
+    """Run queued jobs in this process until none is ready"""
+    out = StringIO()
+    call_command("run_worker", "--processes", "0", "--burst", *args, stdout=out)
+
+    return out.getvalue()
+
+
+def test_worker_runs_queued_jobs() -> None:
+    """Test that the worker runs ready jobs in order and marks them done"""
+    calls.clear()
+    first = enqueue("tests.record", value=1)
+    second = enqueue("tests.record", value=2)
+    later = enqueue("tests.record", delay=60, value=3)
+    other = enqueue("tests.record", queue="exports", value=4)
+
+    output = run_worker()
+
+    assert calls == [1, 2]
+    assert f"Job {first.pk}: done" in output
+    for job in (first, second):
+        job.refresh_from_db()
+        assert job.status == Job.Status.DONE
+        assert job.attempts == 1
+        assert job.finished_at is not None
+    assert Job.objects.get(pk=later.pk).status == Job.Status.QUEUED
+    assert Job.objects.get(pk=other.pk).status == Job.Status.QUEUED
+
+    run_worker("--queue", "exports")
+    assert calls == [1, 2, 4]
+
+
+def test_failed_job_retried_with_backoff(settings) -> None:
+    """Test that failures are retried later, doubling the delay, then failed"""
+    settings.JOB_RETRY_DELAY_SECONDS = 10
+    job = enqueue("tests.fail", max_attempts=3)
+    delays = []
+
+    for _ in range(3):
+        assert claim("test", 1) == [job.pk]
+        before = timezone.now()
+        status = run_job(job.pk)
+        job.refresh_from_db()
+        delays.append((job.run_after - before).total_seconds())
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+    assert status == Job.Status.FAILED
+    assert job.attempts == 3
+    assert "RuntimeError: Broken" in job.last_error
+    assert 5 <= delays[0] <= 10
+    assert 10 <= delays[1] <= 20
+    assert claim("test", 1) == []
+
+
+def test_stale_jobs_claimed_again(settings) -> None:
+    """Test that jobs of a dead worker run again, or fail after the last attempt"""
+    settings.JOB_TIMEOUT_SECONDS = 60
+    job = enqueue("tests.record", value=1)
+    exhausted = enqueue("tests.record", max_attempts=1, value=2)
+    assert claim("dead", 2) == [job.pk, exhausted.pk]
+    assert claim("alive", 2) == []
+
+    Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+
+    assert claim("alive", 2) == [job.pk]
+    job.refresh_from_db()
+    exhausted.refresh_from_db()
+    assert (job.locked_by, job.attempts) == ("alive", 2)
+    assert exhausted.status == Job.Status.FAILED
+
+
+def test_job_of_broken_pool_retried(monkeypatch) -> None:
+    """Test a job whose process died is requeued and the pool replaced"""
+    job = enqueue("tests.record", value=1)
+    claim("worker", 1)
+    command = WorkerCommand(stdout=StringIO())
+    broken, replacement = Mock(), Mock()
+    command.pool = broken
+    monkeypatch.setattr(command, "start_pool", lambda: replacement)
+    futures = []
+    for _ in range(2):
+        future = Future()
+        future.pool = broken
+        future.set_exception(BrokenProcessPool("A child process terminated"))
+        futures.append(future)
+
+    for future in futures:
+        command.collect(job.pk, future)
+
+    job.refresh_from_db()
+    assert job.status == Job.Status.QUEUED
+    assert job.locked_by == ""
+    assert job.last_error.startswith("BrokenProcessPool")
+    assert command.pool is replacement
+    broken.shutdown.assert_called_once_with(wait=False)
+
+
+def test_queue_depth_metric() -> None:
+    """Test that queued and running jobs are counted per queue"""
+    enqueue("tests.record", value=1)
+    enqueue("tests.record", value=2)
+    claim("test", 1)
+
+    counts = record_queue_depth(["default", "exports"])
+
+    assert counts[("default", "queued")] == 1
+    assert counts[("default", "running")] == 1
+    assert counts[("exports", "queued")] == 0
+    labels = {"queue": "default", "status": "queued"}
+    assert REGISTRY.get_sample_value("api_job_queue_depth", labels) == 1
+
+
+def test_repair_recipe_counts_in_background(simple_user, helper_functions) -> None:
+    """Test queueing the recipe count repair for a worker"""
+    tag = helper_functions.sample_tag(user=simple_user)
+    helper_functions.sample_recipe(user=simple_user).tags.add(tag)
+    Tag.objects.update(recipe_count=7)
+
+    call_command("repair_recipe_counts", "--background", stdout=StringIO())
+    tag.refresh_from_db()
+    assert tag.recipe_count == 7
+
+    run_worker()
+    tag.refresh_from_db()
+    assert tag.recipe_count == 1
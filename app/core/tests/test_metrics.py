@@ -0,0 +1,86 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from django.urls import reverse
+
+RECIPES_URL = reverse("recipe:recipe-list")
+METRICS_URL = reverse("metrics")
+APP_DIR = Path(__file__).resolve().parents[2]
+
+
+def test_metrics_labeled_by_view_action(api_client, simple_user) -> None:
+    """Test that request metrics are labeled with the viewset action"""
+    api_client.get(RECIPES_URL)
+
+    response = api_client.get(METRICS_URL)
+    content = response.content.decode()
+
+    assert response.status_code == 200
+    assert (
+        'api_requests_total{handler="RecipeViewSet.list",method="GET",status="200"}'
+        in content
+    )
+    assert 'api_request_duration_seconds_bucket{handler="RecipeViewSet.list"' in content
+    assert 'api_request_db_queries_count{handler="RecipeViewSet.list"}' in content
+    assert "api_db_query_duration_seconds_count" in content
+
+
+def test_metrics_cache_lookups(api_client, simple_user) -> None:
+    """Test that cache hits and misses are counted"""
+    stats_url = reverse("recipe:stats")
+    api_client.get(stats_url)
+    api_client.get(stats_url)
+
+    content = api_client.get(METRICS_URL).content.decode()
+
+    assert 'api_cache_lookups_total{cache="stats",result="hit"}' in content
+    assert 'api_cache_lookups_total{cache="stats",result="miss"}' in content
+
+
+def test_metrics_forbidden_to_other_clients(client, settings) -> None:
+    """Test that metrics are only served to allowed addresses or the token"""
+    settings.METRICS_ALLOWED_IPS = ["10.1.0.0/16"]
+    settings.METRICS_TOKEN = "scrape-secret"
+
+    outside = client.get(METRICS_URL, REMOTE_ADDR="10.2.0.1")
+    forged = client.get(
+        METRICS_URL, REMOTE_ADDR="10.2.0.1", HTTP_X_FORWARDED_FOR="10.1.0.1"
+    )
+    wrong_token = client.get(
+        METRICS_URL, REMOTE_ADDR="10.2.0.1", HTTP_AUTHORIZATION="Bearer wrong"
+    )
+    inside = client.get(METRICS_URL, REMOTE_ADDR="10.1.2.3")
+    with_token = client.get(
+        METRICS_URL, REMOTE_ADDR="10.2.0.1", HTTP_AUTHORIZATION="Bearer scrape-secret"
+    )
+
+    assert outside.status_code == 403
+    assert forged.status_code == 403
+    assert wrong_token.status_code == 403
+    assert inside.status_code == 200
+    assert with_token.status_code == 200
+
+
+def test_metrics_merged_across_processes(tmp_path) -> None:
+    """Test that metrics written by several processes are aggregated"""
+    env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": str(APP_DIR)}
+    increment = (
+        "from core import metrics; "
+        "metrics.REQUESTS.labels('CreateTokenView', 'POST', 200).inc()"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", increment], env=env, check=True)
+
+    output = subprocess.run(
+        [sys.executable, "-c", "from core import metrics; print(metrics.render())"],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    assert (
+        'api_requests_total{handler="CreateTokenView",method="POST",status="200"} 2.0'
+        in output
+    )
@@ -0,0 +1,212 @@
+import gzip
+import json
+import logging
+from io import BytesIO
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, Client, RequestFactory
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.compression import CODINGS, Coding, gzip_compress, gzip_stream, negotiate
+from core.middleware import CompressionMiddleware, ProfilingMiddleware
+from recipe.views import RecipeViewSet
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+@pytest.fixture
+def profiling(settings):
+    """Enable profiling of every request"""
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_SAMPLE_RATE = 1.0
+    settings.PROFILING_SLOW_REQUEST_MS = 10_000
+    return settings
+
+
+def test_profiling_disabled_by_default(settings) -> None:
+    """Test that the middleware removes itself unless enabled"""
+    settings.PROFILING_ENABLED = False
+
+    with pytest.raises(MiddlewareNotUsed):
+        ProfilingMiddleware(lambda request: None)
+
+
+def test_server_timing_header(profiling, api_client, simple_user) -> None:
+    """Test that sampled responses describe their cost"""
+    response = api_client.get(RECIPES_URL)
+    timing = response["Server-Timing"]
+
+    assert "db;dur=" in timing
+    assert "queries" in timing
+    assert "serializer;dur=" in timing
+    assert "render;dur=" in timing
+    assert "total;dur=" in timing
+
+
+def test_sampling_off(profiling, api_client, simple_user) -> None:
+    """Test that requests outside the sample are not profiled"""
+    profiling.PROFILING_SAMPLE_RATE = 0.0
+
+    response = api_client.get(RECIPES_URL)
+
+    assert not response.has_header("Server-Timing")
+
+
+def test_slow_request_logged(
+    profiling, api_client, simple_user, helper_functions, caplog
+) -> None:
+    """Test that slow requests are logged with their queries"""
+    profiling.PROFILING_SLOW_REQUEST_MS = 0
+    tag1 = helper_functions.sample_tag(user=simple_user, name="Hot")
+    tag2 = helper_functions.sample_tag(user=simple_user, name="Cold")
+    payload = {"title": "Tea", "time_min": 5, "price": 1, "tags": [tag1.id, tag2.id]}
+
+    with caplog.at_level(logging.WARNING, logger="core.middleware"):
+        api_client.post(RECIPES_URL, payload)
+
+    assert "Slow request POST /api/recipe/recipes/" in caplog.text
+    assert "SELECT" in caplog.text
+    assert "repeated 2 times" in caplog.text
+
+
+def test_async_view_queries_profiled(
+    profiling, transactional_db, simple_user, helper_functions
+) -> None:
+    """Test that queries async views run in pool threads are profiled"""
+    profiling.ASYNC_DB_THREADS = 2
+    helper_functions.sample_recipe(user=simple_user)
+    token = Token.objects.create(user=simple_user)
+    view = RecipeViewSet.as_async_view({"get": "list"})
+
+    async def get_response(request):
+        response = await view(request)
+        return response.render()
+
+    middleware = ProfilingMiddleware(get_response)
+    request = AsyncRequestFactory().get(
+        RECIPES_URL, AUTHORIZATION=f"Token {token.key}"
+    )
+    response = async_to_sync(middleware)(request)
+
+    assert len(request.profile.queries) >= 3
+    assert f'desc="{len(request.profile.queries)} queries"' in response["Server-Timing"]
+
+
+def test_negotiate_coding(monkeypatch) -> None:
+    """Test picking the coding the client weighs highest, ours among equals"""
+    codings = {name: Coding(name, gzip_compress, gzip_stream) for name in ("br", "gzip")}
+    monkeypatch.setattr("core.compression.CODINGS", codings)
+
+    assert negotiate("gzip, deflate, br").name == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5").name == "gzip"
+    assert negotiate("br;q=0, *").name == "gzip"
+    assert negotiate("deflate") is None
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("") is None
+
+
+def test_large_responses_compressed(
+    api_client, simple_user, helper_functions, monkeypatch
+) -> None:
+    """Test that large JSON bodies are compressed once per distinct content"""
+    for index in range(30):
+        helper_functions.sample_recipe(user=simple_user, title=f"Recipe {index}")
+    plain = api_client.get(RECIPES_URL)
+    calls = []
+
+    def compress(data: bytes) -> bytes:
+        calls.append(len(data))
+        return gzip_compress(data)
+
+    monkeypatch.setitem(CODINGS, "gzip", Coding("gzip", compress, gzip_stream))
+    first = api_client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING="gzip, deflate")
+    second = api_client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+    assert "Content-Encoding" not in plain
+    assert plain["Vary"].endswith("Accept-Encoding")
+    for response in (first, second):
+        assert response["Content-Encoding"] == "gzip"
+        assert int(response["Content-Length"]) == len(response.content)
+        assert json.loads(gzip.decompress(response.content)) == plain.json()
+    assert calls == [len(plain.content)]
+
+
+def test_small_and_binary_responses_not_compressed() -> None:
+    """Test that short bodies and images are sent as they are"""
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+    responses = [
+        HttpResponse(b"{}", content_type="application/json"),
+        FileResponse(BytesIO(b"x" * 4096), content_type="image/jpeg"),
+    ]
+
+    for response in responses:
+        result = CompressionMiddleware(lambda request: response)(request)
+        assert not result.has_header("Content-Encoding")
+        assert not result.has_header("Vary")
+
+
+def test_streaming_response_compressed() -> None:
+    """Test that streamed bodies are compressed chunk by chunk"""
+    rows = [json.dumps({"id": index}).encode() + b"\n" for index in range(1000)]
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+    middleware = CompressionMiddleware(
+        lambda request: StreamingHttpResponse(
+            iter(rows), content_type="application/json"
+        )
+    )
+
+    response = middleware(request)
+    chunks = list(response.streaming_content)
+
+    assert response["Content-Encoding"] == "gzip"
+    assert not response.has_header("Content-Length")
+    assert len(chunks) > 1
+    assert gzip.decompress(b"".join(chunks)) == b"".join(rows)
+
+
+@pytest.fixture
+def lean_api(settings):
+    """Run the middleware stack of the production profile"""
+    settings.MIDDLEWARE = [
+        path
+        for path in settings.MIDDLEWARE
+        if path not in settings.NON_API_MIDDLEWARE
+    ]
+    settings.MIDDLEWARE.insert(
+        settings.MIDDLEWARE.index("django.middleware.common.CommonMiddleware") + 1,
+        "core.middleware.NonAPIMiddleware",
+    )
+    return settings
+
+
+def test_api_requests_skip_sessions(lean_api, simple_user) -> None:
+    """Test that API requests are served without sessions or cookies"""
+    token = Token.objects.create(user=simple_user)
+    client = Client(enforce_csrf_checks=True)
+
+    response = client.post(
+        reverse("recipe:tag-list"),
+        {"name": "Soup"},
+        HTTP_AUTHORIZATION=f"Token {token.key}",
+    )
+
+    assert response.status_code == 201
+    assert not hasattr(response.wsgi_request, "session")
+    assert not response.cookies
+
+
+def test_admin_requests_use_sessions(lean_api) -> None:
+    """Test that pages outside the API still get sessions and CSRF"""
+    client = Client(enforce_csrf_checks=True)
+    login_url = reverse("admin:login")
+
+    response = client.get(login_url)
+
+    assert response.status_code == 200
+    assert hasattr(response.wsgi_request, "session")
+    assert "csrftoken" in response.cookies
+    assert client.post(login_url, {"username": "a", "password": "b"}).status_code == 403
@@ -1,7 +1,15 @@
 from unittest.mock import patch
 import pytest
 
-from core.models import CustomUser, Tag, Ingredient, Recipe, recipe_image_file_path
+from core.models import (
+    CustomUser,
+    Tag,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    recipe_image_file_path,
+)
 
 pytestmark = pytest.mark.django_db
 
@@ -72,3 +80,94 @@ def test_recipe_file_name_uuid(mock_uuid) -> None:
     exp_path = f"uploads/recipe/{uuid}.jpeg"
 
     assert file_path == exp_path
+
+
+def test_recipe_count_follows_recipe_links(simple_user, helper_functions) -> None:
+    """Test that recipe_count is maintained when links are added and removed"""
+    tag = helper_functions.sample_tag(user=simple_user)
+    ingredient = helper_functions.sample_ingredient(user=simple_user)
+    recipe1 = helper_functions.sample_recipe(user=simple_user)
+    recipe2 = helper_functions.sample_recipe(user=simple_user)
+
+    recipe1.tags.add(tag)
+    recipe2.tags.add(tag)
+    recipe1.ingredients.add(ingredient)
+    tag.refresh_from_db()
+    ingredient.refresh_from_db()
+
+    assert tag.recipe_count == 2
+    assert ingredient.recipe_count == 1
+
+    recipe1.tags.remove(tag)
+    recipe1.ingredients.clear()
+    tag.refresh_from_db()
+    ingredient.refresh_from_db()
+
+    assert tag.recipe_count == 1
+    assert ingredient.recipe_count == 0
+
+
+def test_recipe_count_reverse_links(simple_user, helper_functions) -> None:
+    """Test that recipe_count is maintained when linking from the tag side"""
+    tag = helper_functions.sample_tag(user=simple_user)
+    recipe = helper_functions.sample_recipe(user=simple_user)
+
+    tag.recipe_set.add(recipe)
+    tag.refresh_from_db()
+    assert tag.recipe_count == 1
+
+    tag.recipe_set.clear()
+    tag.refresh_from_db()
+    assert tag.recipe_count == 0
+
+
+def test_recipe_links_owned_by_user(simple_user, create_user, helper_functions) -> None:
+    """Test that links made from either side store the user and stay private"""
+    recipe = helper_functions.sample_recipe(user=simple_user)
+    tag = helper_functions.sample_tag(user=simple_user)
+    ingredient = helper_functions.sample_ingredient(user=simple_user)
+    other = create_user(email="other@example.com")
+    other_recipe = helper_functions.sample_recipe(user=other)
+    other_recipe.tags.add(helper_functions.sample_tag(user=other))
+
+    recipe.tags.add(tag)
+    ingredient.recipe_set.add(recipe)
+
+    assert RecipeTag.objects.get(recipe=recipe).user == simple_user
+    assert RecipeIngredient.objects.get().user == simple_user
+    assert list(recipe.tags.all()) == [tag]
+    prefetched = Recipe.objects.prefetch_related("ingredients").get(pk=recipe.pk)
+    assert list(prefetched.ingredients.all()) == [ingredient]
+
+
+def test_add_numbers_new_ingredient_links_only(simple_user, helper_functions) -> None:
+    """Test that adding ingredients appends new links and keeps existing ones"""
+    recipe = helper_functions.sample_recipe(user=simple_user)
+    first, second, third = (
+        helper_functions.sample_ingredient(user=simple_user, name=name)
+        for name in ("Salt", "Pepper", "Oil")
+    )
+    recipe.ingredients.set([first, second])
+
+    recipe.ingredients.add(first)
+    recipe.ingredients.add(third, second)
+
+    positions = RecipeIngredient.objects.filter(recipe=recipe).order_by("position")
+    assert list(positions.values_list("ingredient", "position")) == [
+        (first.pk, 0),
+        (second.pk, 1),
+        (third.pk, 2),
+    ]
+    assert list(recipe.ingredients.all()) == [first, second, third]
+
+
+def test_recipe_count_after_recipe_delete(simple_user, helper_functions) -> None:
+    """Test that deleting a recipe decreases recipe_count"""
+    tag = helper_functions.sample_tag(user=simple_user)
+    recipe = helper_functions.sample_recipe(user=simple_user)
+    recipe.tags.add(tag)
+
+    Recipe.objects.filter(pk=recipe.pk).delete()
+    tag.refresh_from_db()
+
+    assert tag.recipe_count == 0
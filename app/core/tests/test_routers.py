@@ -0,0 +1,155 @@
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag
+from core.routers import ReplicaRouter, RoutingState, lag_monitor, routing
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+STATS_URL = reverse("recipe:stats")
+
+replica_db = pytest.mark.django_db(databases=["default", "replica"])
+
+
+def detail_url(recipe_id: int) -> str:
+    """Return recipe detail URL"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+@pytest.fixture
+def replicas(settings):
+    """Use the replica database as read replica"""
+    settings.DATABASE_REPLICAS = ["replica"]
+    lag_monitor.measured.clear()
+    yield settings
+    lag_monitor.measured.clear()
+
+
+@pytest.fixture
+def replica_user(replicas, simple_user):
+    """Copy the authenticated user to the replica"""
+    copy = get_user_model().objects.get(pk=simple_user.pk)
+    copy.save(using="replica", force_insert=True)
+
+    return simple_user
+
+
+def replica_recipe(user, title: str) -> Recipe:
+    """Create a recipe on the replica only"""
+    return Recipe.objects.using("replica").create(
+        user_id=user.pk, title=title, time_min=5, price=1
+    )
+
+
+def titles(response) -> list:
+    return [recipe["title"] for recipe in response.data]
+
+
+@replica_db
+def test_router_reads_from_chosen_replica(replicas) -> None:
+    """Test that reads go to the replica only when the request allows it"""
+    router = ReplicaRouter()
+    assert router.db_for_read(Recipe) == DEFAULT_DB_ALIAS
+
+    with routing(RoutingState()) as state:
+        assert router.db_for_read(Recipe) == DEFAULT_DB_ALIAS
+        state.use_replica()
+        assert router.db_for_read(Recipe) == "replica"
+        assert router.db_for_read(Token) == DEFAULT_DB_ALIAS
+
+        recipe = Recipe(user_id=1, title="Cake", time_min=5, price=1)
+        recipe._state.db = DEFAULT_DB_ALIAS
+        assert router.db_for_read(Tag, instance=recipe) == DEFAULT_DB_ALIAS
+
+        assert router.db_for_write(Recipe) == DEFAULT_DB_ALIAS
+        assert router.db_for_read(Recipe) == DEFAULT_DB_ALIAS
+
+
+@replica_db
+def test_pinned_request_reads_primary(replicas) -> None:
+    """Test that a pinned client is not sent to a replica"""
+    with routing(RoutingState(pinned=True)) as state:
+        state.use_replica()
+
+        assert ReplicaRouter().db_for_read(Recipe) == DEFAULT_DB_ALIAS
+
+
+@replica_db
+def test_list_and_retrieve_read_replica(
+    replica_user, api_client, helper_functions
+) -> None:
+    """Test that listing and retrieving recipes read from the replica"""
+    helper_functions.sample_recipe(user=replica_user, title="Primary")
+    recipe = replica_recipe(replica_user, "Replica")
+
+    assert titles(api_client.get(RECIPES_URL)) == ["Replica"]
+    response = api_client.get(detail_url(recipe.pk))
+    assert response.data["title"] == "Replica"
+    assert api_client.get(TAGS_URL).status_code == 200
+
+
+@replica_db
+def test_other_views_read_primary(replica_user, api_client, helper_functions) -> None:
+    """Test that views without replica actions read from the primary"""
+    helper_functions.sample_recipe(user=replica_user, title="Primary")
+    replica_recipe(replica_user, "Replica")
+
+    response = api_client.get(STATS_URL)
+
+    assert response.data["recipes"] == 1
+
+
+@replica_db
+def test_write_pins_client_to_primary(replica_user, api_client) -> None:
+    """Test that reads after a write go to the primary during the pin"""
+    replica_recipe(replica_user, "Replica")
+
+    response = api_client.post(
+        RECIPES_URL, {"title": "Fresh", "time_min": 5, "price": 1}
+    )
+
+    until = float(response["X-Primary-Pin"])
+    assert time.time() < until <= time.time() + 10
+    assert response.cookies["primary_pin"].value == response["X-Primary-Pin"]
+    assert titles(api_client.get(RECIPES_URL)) == ["Fresh"]
+
+
+@replica_db
+def test_pin_header(replica_user, api_client) -> None:
+    """Test that clients without cookies pin themselves with the header"""
+    replica_recipe(replica_user, "Replica")
+
+    pinned = api_client.get(RECIPES_URL, HTTP_X_PRIMARY_PIN=str(time.time() + 5))
+    expired = api_client.get(RECIPES_URL, HTTP_X_PRIMARY_PIN=str(time.time() - 1))
+    bogus = api_client.get(RECIPES_URL, HTTP_X_PRIMARY_PIN="nan")
+
+    assert titles(pinned) == []
+    assert titles(expired) == ["Replica"]
+    assert titles(bogus) == ["Replica"]
+    assert not pinned.has_header("X-Primary-Pin")
+
+
+@replica_db
+def test_lagging_replica_skipped(replica_user, api_client, monkeypatch) -> None:
+    """Test that replicas behind by more than the lag limit are not used"""
+    replica_recipe(replica_user, "Replica")
+    lags = {"replica": 10.0}
+    measured = []
+
+    def measure(alias):
+        measured.append(alias)
+        return lags[alias]
+
+    monkeypatch.setattr(lag_monitor, "measure", measure)
+    assert titles(api_client.get(RECIPES_URL)) == []
+    assert titles(api_client.get(RECIPES_URL)) == []
+    assert measured == ["replica"]
+
+    lags["replica"] = 0.5
+    lag_monitor.measured.clear()
+    assert titles(api_client.get(RECIPES_URL)) == ["Replica"]
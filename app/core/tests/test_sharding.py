@@ -0,0 +1,285 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import router
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import Ingredient, Recipe, Tag
+from core.routers import for_user
+from core.sharding import HashRing, get_ring, id_range_start, reserve_id_range
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+TOKEN_URL = reverse("user:token")
+
+sharded_db = pytest.mark.django_db(databases=["default", "shard1", "shard2"])
+
+
+def recipe_detail_url(recipe_id: int) -> str:
+    """Return recipe detail URL"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def enable_shards(settings, *aliases) -> None:
+    """Spread recipe data over the given test databases"""
+    settings.DATABASE_SHARDS = list(aliases)
+    for alias in aliases:
+        reserve_id_range(alias)
+
+
+def place(user, shard: str, moving: bool = False) -> None:
+    """Point a user at a shard"""
+    users = get_user_model().objects.filter(pk=user.pk)
+    users.update(shard=shard, shard_moving=moving)
+    user.refresh_from_db()
+
+
+def add_recipe(user, helper_functions, title: str = "Soup") -> Recipe:
+    """Create a recipe with a tag and an ingredient on the user's shard"""
+    with for_user(user):
+        recipe = helper_functions.sample_recipe(user=user, title=title)
+        recipe.tags.add(helper_functions.sample_tag(user=user))
+        recipe.ingredients.add(helper_functions.sample_ingredient(user=user))
+
+    return recipe
+
+
+def test_hash_ring_moves_keys_to_new_node_only() -> None:
+    """Test that adding a node moves about a quarter of the keys to it"""
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+
+    moved = [
+        key for key in range(10000) if before.node_for(key) != after.node_for(key)
+    ]
+
+    assert {after.node_for(key) for key in moved} == {"d"}
+    assert 1500 < len(moved) < 3500
+    for node in ("a", "b", "c"):
+        assert 2000 < sum(before.node_for(key) == node for key in range(10000))
+
+
+@sharded_db
+def test_new_user_placed_on_ring(settings, create_user) -> None:
+    """Test that new users get the shard the ring picks"""
+    enable_shards(settings, "shard1", "shard2")
+
+    user = create_user(email="new@example.com", password="testpass")
+    user.refresh_from_db()
+
+    assert user.shard == get_ring().node_for(user.pk)
+
+
+@sharded_db
+def test_recipe_data_stored_on_user_shard(
+    settings, api_client, simple_user, create_user
+) -> None:
+    """Test that the API reads and writes recipe data on the user's shard"""
+    enable_shards(settings, "shard1", "shard2")
+    place(simple_user, "shard2")
+
+    tag = api_client.post(TAGS_URL, {"name": "Vegan"}).data
+    payload = {
+        "title": "Curry",
+        "time_min": 30,
+        "price": 9,
+        "tags": [tag["id"]],
+        "ingredients": [],
+    }
+    created = api_client.post(RECIPES_URL, payload)
+    response = api_client.get(recipe_detail_url(created.data["id"]))
+
+    assert created.status_code == status.HTTP_201_CREATED
+    assert response.data["tags"] == [tag]
+    assert [recipe["title"] for recipe in api_client.get(RECIPES_URL).data] == [
+        "Curry"
+    ]
+    assert Recipe.objects.using("shard2").get().title == "Curry"
+    assert Tag.objects.using("shard2").get().recipe_count == 1
+    assert not Recipe.objects.using("default").exists()
+    assert not Recipe.objects.using("shard1").exists()
+
+
+@sharded_db
+def test_deleting_user_deletes_shard_data(
+    settings, create_user, helper_functions
+) -> None:
+    """Test that deleting a user deletes their recipe data on their shard"""
+    enable_shards(settings, "shard1", "shard2")
+    user = create_user(email="gone@example.com", password="testpass")
+    place(user, "shard2")
+    add_recipe(user, helper_functions)
+    other = create_user(email="kept@example.com", password="testpass")
+    place(other, "shard2")
+    add_recipe(other, helper_functions)
+
+    user_id = user.pk
+    user.delete()
+
+    for model in (Recipe, Tag, Ingredient):
+        rows = model.objects.using("shard2")
+        assert not rows.filter(user_id=user_id).exists()
+        assert rows.filter(user=other).exists()
+    assert not Recipe.tags.through.objects.using("shard2").filter(
+        user_id=user_id
+    ).exists()
+
+
+@sharded_db
+def test_relations_across_shards_refused(
+    settings, create_user, helper_functions
+) -> None:
+    """Test that recipe data on one shard can not refer to another shard"""
+    enable_shards(settings, "shard1", "shard2")
+    user = create_user(email="one@example.com", password="testpass")
+    place(user, "shard1")
+    recipe = add_recipe(user, helper_functions)
+    other = create_user(email="two@example.com", password="testpass")
+    place(other, "shard2")
+    with for_user(other):
+        tag = helper_functions.sample_tag(user=other)
+
+    assert router.allow_relation(recipe, user)
+    assert router.allow_relation(recipe, recipe.tags.get())
+    assert not router.allow_relation(recipe, tag)
+    with pytest.raises(ValueError):
+        recipe.tags.add(tag)
+
+
+@sharded_db
+def test_query_guard_sees_shard_queries(
+    settings, api_client, simple_user, helper_functions, query_guard
+) -> None:
+    """Test that guarded calls report the queries they run on shards"""
+    enable_shards(settings, "shard1", "shard2")
+    place(simple_user, "shard2")
+    add_recipe(simple_user, helper_functions)
+
+    queries = query_guard.capture(lambda: api_client.get(RECIPES_URL))
+
+    assert queries
+    assert all(sql.startswith("/* shard2 */ SELECT") for sql in queries)
+
+
+@sharded_db
+def test_users_and_tokens_stay_global(settings, api_client, create_user) -> None:
+    """Test that accounts and tokens are kept on the default database"""
+    enable_shards(settings, "shard1", "shard2")
+    payload = {"email": "cook@example.com", "password": "testpass"}
+    user = create_user(**payload)
+
+    response = api_client.post(TOKEN_URL, payload)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert Token.objects.using("default").get().user_id == user.pk
+    assert not get_user_model().objects.using(user.shard).exists()
+
+
+@sharded_db
+def test_writes_rejected_while_moving(
+    settings, api_client, simple_user, helper_functions
+) -> None:
+    """Test that a user's data is read only while it moves between shards"""
+    enable_shards(settings, "shard1", "shard2")
+    place(simple_user, "shard1")
+    add_recipe(simple_user, helper_functions)
+    place(simple_user, "shard1", moving=True)
+
+    payload = {"title": "Pie", "time_min": 5, "price": 1}
+    response = api_client.post(RECIPES_URL, payload)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response["Retry-After"] == "5"
+    assert api_client.get(RECIPES_URL).status_code == status.HTTP_200_OK
+
+
+@sharded_db
+def test_rebalance_moves_users(
+    settings, api_client, create_user, helper_functions
+) -> None:
+    """Test that rebalancing moves users to their ring shard and keeps ids"""
+    users = [create_user(email=f"cook{index}@example.com") for index in range(8)]
+    recipes = {user.pk: add_recipe(user, helper_functions) for user in users}
+    enable_shards(settings, "shard1", "shard2")
+    ring = get_ring()
+
+    out = StringIO()
+    call_command("rebalance_shards", "--dry-run", stdout=out)
+    assert "8 users to move" in out.getvalue()
+    assert Recipe.objects.using("default").count() == 8
+
+    call_command("rebalance_shards", "--grace", "0", "--batch-users", "3", stdout=out)
+
+    assert "Moved 8 users" in out.getvalue()
+    for alias in ("default", "shard1", "shard2"):
+        owners = set(Recipe.objects.using(alias).values_list("user_id", flat=True))
+        placed = {user.pk for user in users if ring.node_for(user.pk) == alias}
+        assert owners == placed
+    for model in (Tag, Ingredient, Recipe.tags.through):
+        assert not model.objects.using("default").exists()
+
+    user = users[0]
+    user.refresh_from_db()
+    api_client.force_authenticate(user=user)
+    response = api_client.get(recipe_detail_url(recipes[user.pk].pk))
+    assert user.shard == ring.node_for(user.pk)
+    assert response.data["title"] == "Soup"
+    assert len(response.data["tags"]) == 1
+
+
+@sharded_db
+def test_rebalance_after_adding_shard(settings, create_user, helper_functions) -> None:
+    """Test that adding a shard only moves the users it takes over"""
+    enable_shards(settings, "shard1")
+    users = [create_user(email=f"cook{index}@example.com") for index in range(20)]
+    for user in users:
+        user.refresh_from_db()
+        add_recipe(user, helper_functions)
+    assert Recipe.objects.using("shard1").count() == 20
+
+    enable_shards(settings, "shard1", "shard2")
+    ring = get_ring()
+    taken_over = {user.pk for user in users if ring.node_for(user.pk) == "shard2"}
+    call_command("rebalance_shards", "--grace", "0", stdout=StringIO())
+
+    assert taken_over
+    assert set(Recipe.objects.using("shard2").values_list("user_id", flat=True)) == (
+        taken_over
+    )
+    assert Recipe.objects.using("shard1").count() == 20 - len(taken_over)
+
+
+@sharded_db
+def test_seed_data_places_users_on_ring(settings) -> None:
+    """Test that seeded recipe data is written to each user's shard"""
+    enable_shards(settings, "shard1", "shard2")
+
+    call_command(
+        "seed_data",
+        users=6,
+        recipes_per_user=5,
+        tags=4,
+        ingredients=6,
+        block_size=2,
+        stdout=StringIO(),
+    )
+    seeded = get_user_model().objects.filter(email__startswith="seed")
+
+    assert seeded.count() == 6
+    assert {user.shard for user in seeded} == {"shard1", "shard2"}
+    assert not Recipe.objects.using("default").exists()
+    for user in seeded:
+        assert user.shard == get_ring().node_for(user.pk)
+        recipes = Recipe.objects.using(user.shard).filter(user=user)
+        assert recipes.count() == 5
+        assert min(recipes.values_list("pk", flat=True)) >= id_range_start(user.shard)
+        assert Tag.objects.using(user.shard).filter(user=user).count() == 4
+    with for_user(seeded[0]):
+        tag = Tag.objects.create(user=seeded[0], name="New")
+    assert tag.pk > Tag.objects.using(seeded[0].shard).exclude(pk=tag.pk).latest(
+        "pk"
+    ).pk
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Generous enough for slow CI machines, a worker starts in about 0.5 s
+STARTUP_IMPORT_BUDGET_MS = 2000
+
+# Imported on first use, never by starting a worker
+LAZY_MODULES = ("PIL", "numpy")
+
+STARTUP = """
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+
+def import_times(**environ) -> dict:
+    """
+    Start a worker in a fresh interpreter and return the cumulative
+    import time in microseconds of each module it imported at top level
+    """
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "app.settings",
+        "SETTINGS_PROFILE": "production",
+        "SECRET_KEY": "test-startup",
+        **environ,
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP],
+        cwd=settings.BASE_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.rstrip()] = int(cumulative)
+
+    return times
+
+
+def test_startup_imports_within_budget() -> None:
+    """Test that starting a worker skips heavy modules and stays in budget"""
+    times = import_times()
+    imported = {name.strip().split(".")[0] for name in times}
+    top_level = sum(
+        cumulative for name, cumulative in times.items() if not name.startswith("  ")
+    )
+
+    assert not imported.intersection(LAZY_MODULES)
+    assert top_level / 1000 < STARTUP_IMPORT_BUDGET_MS
+
+
+def test_startup_without_admin() -> None:
+    """Test that disabling the admin skips importing the admin site"""
+    times = import_times(ADMIN_ENABLED="0")
+
+    assert "core.admin" not in {name.strip() for name in times}
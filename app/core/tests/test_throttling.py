@@ -0,0 +1,150 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from core.throttling import TokenBucketStore, parse_rate
+
+RECIPES_URL = reverse("recipe:recipe-list")
+STATS_URL = reverse("recipe:stats")
+TOKEN_URL = reverse("user:token")
+
+
+@pytest.fixture
+def rates(settings):
+    """Replace the throttle rates for one test"""
+
+    def set_rates(**rates):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": rates,
+        }
+
+    return set_rates
+
+
+def test_parse_rate() -> None:
+    """Test parsing DRF style rates into capacity and refill per second"""
+    assert parse_rate("10/min") == (10, 10 / 60)
+    assert parse_rate("2/second") == (2, 2)
+    assert parse_rate("24/day") == (24, 24 / 86400)
+
+
+def test_token_bucket_refills() -> None:
+    """Test a bucket allows bursts up to capacity and then refills"""
+    store = TokenBucketStore()
+
+    assert store.consume("bucket", 2, 1.0, now=100.0) == 0
+    assert store.consume("bucket", 2, 1.0, now=100.0) == 0
+    assert store.consume("bucket", 2, 1.0, now=100.0) == pytest.approx(1.0)
+    assert store.consume("bucket", 2, 1.0, now=100.5) == pytest.approx(0.5)
+    assert store.consume("bucket", 2, 1.0, now=101.0) == 0
+    assert store.consume("other", 2, 1.0, now=101.0) == 0
+
+
+def test_token_bucket_limit_holds_under_contention(monkeypatch) -> None:
+    """Test concurrent requests on one bucket never exceed its capacity"""
+    store = TokenBucketStore()
+    get = store.cache.get
+
+    def slow_get(*args, **kwargs):
+        # Hold the lock long enough for the other threads to contend
+        time.sleep(0.01)
+        return get(*args, **kwargs)
+
+    monkeypatch.setattr(store.cache, "get", slow_get)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        waits = list(
+            pool.map(lambda _: store.consume("flood", 5, 0.001, now=100.0), range(40))
+        )
+
+    allowed = waits.count(0)
+    assert 0 < allowed <= 5
+    assert all(wait > 0 for wait in waits if wait)
+
+
+def test_token_bucket_waits_for_concurrent_requests(monkeypatch) -> None:
+    """Test parallel requests within capacity wait for the lock, not a 429"""
+    store = TokenBucketStore()
+    get = store.cache.get
+
+    def slow_get(*args, **kwargs):
+        time.sleep(0.001)
+        return get(*args, **kwargs)
+
+    monkeypatch.setattr(store.cache, "get", slow_get)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        waits = list(
+            pool.map(lambda _: store.consume("burst", 16, 1.0, now=100.0), range(16))
+        )
+
+    assert waits == [0] * 16
+
+
+class PublicThrottleTests:
+    """Test rate limits of the API"""
+
+    def test_throttled_response_has_retry_after(
+        self, rates, api_client, simple_user
+    ) -> None:
+        """Test exceeding a scope rate returns 429 with Retry-After"""
+        rates(recipes="2/min")
+
+        responses = [api_client.get(RECIPES_URL) for _ in range(3)]
+
+        assert [r.status_code for r in responses[:2]] == [status.HTTP_200_OK] * 2
+        assert responses[2].status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert responses[2]["Retry-After"] == "30"
+
+    def test_action_rate_overrides_scope(
+        self, rates, api_client, simple_user
+    ) -> None:
+        """Test a per action rate only applies to that action"""
+        rates(recipes="100/min", **{"recipes.list": "1/min"})
+
+        assert api_client.get(RECIPES_URL).status_code == status.HTTP_200_OK
+        assert (
+            api_client.get(RECIPES_URL).status_code
+            == status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        assert api_client.get(STATS_URL).status_code == status.HTTP_200_OK
+
+    def test_rate_is_per_user(self, rates, api_client, create_user) -> None:
+        """Test users have separate buckets"""
+        rates(recipes="1/min")
+        for email in ("first@example.com", "second@example.com"):
+            api_client.force_authenticate(create_user(email=email, password="pass"))
+
+            assert api_client.get(RECIPES_URL).status_code == status.HTTP_200_OK
+
+    def test_login_limited_per_email_and_ip(self, rates, api_client, db) -> None:
+        """Test login attempts are limited per email and IP, and per IP"""
+        rates(login="1/min", login_ip="3/min")
+        payload = {"email": "first@example.com", "password": "wrong"}
+
+        first = api_client.post(TOKEN_URL, payload)
+        second = api_client.post(TOKEN_URL, payload)
+        elsewhere = api_client.post(TOKEN_URL, payload, REMOTE_ADDR="10.0.0.2")
+        others = [
+            api_client.post(TOKEN_URL, {**payload, "email": f"{n}@example.com"})
+            for n in range(2)
+        ]
+
+        assert first.status_code == status.HTTP_400_BAD_REQUEST
+        assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        # Attempts from other clients do not lock the account out
+        assert elsewhere.status_code == status.HTTP_400_BAD_REQUEST
+        assert others[0].status_code == status.HTTP_400_BAD_REQUEST
+        assert others[1].status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    def test_throttling_can_be_disabled(
+        self, rates, settings, api_client, simple_user
+    ) -> None:
+        """Test THROTTLE_ENABLED turns all rate limits off"""
+        rates(recipes="1/min")
+        settings.THROTTLE_ENABLED = False
+
+        for _ in range(3):
+            assert api_client.get(RECIPES_URL).status_code == status.HTTP_200_OK
@@ -0,0 +1,178 @@
+import math
+import time
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+# memcached expires keys on whole seconds, so a lock lives 1 to 2 seconds.
+# A holder releases it only within LOCK_HOLD_SECONDS, when it cannot have
+# expired, and a holder that died blocks its bucket for LOCK_TIMEOUT at most.
+LOCK_TIMEOUT = 2
+LOCK_HOLD_SECONDS = 0.5
+# A bucket is held for two cache round trips, concurrent requests wait for
+# it up to LOCK_WAIT_SECONDS
+LOCK_WAIT_SECONDS = 0.05
+# Retry-After of requests still finding their bucket locked
+CONTENTION_WAIT = 1.0
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """
+    Parse a DRF style rate such as "10/min" into the bucket capacity and
+    the refill rate in tokens per second
+    """
+    num, period = rate.split("/")
+    capacity = int(num)
+
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    """
+    Token buckets kept in a Django cache. Buckets are updated under a lock
+    taken with cache.add, which is atomic on the local memory, memcached
+    and redis backends, so the store works in process with locmem and is
+    shared between workers when pointed at a shared cache. Concurrent
+    requests wait for the lock briefly. A request that still cannot take
+    it is rejected, as letting it through would let a flood on one key
+    bypass the limit.
+    """
+
+    key_prefix = "throttle"
+
+    def __init__(self, alias: str = None) -> None:
+        self.cache = caches[alias or getattr(settings, "THROTTLE_CACHE", "default")]
+
+    def acquire(self, key: str) -> Optional[float]:
+        """
+        Take the lock of a bucket, returning when it was taken or None if
+        it stays held by others for LOCK_WAIT_SECONDS
+        """
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        delay = 0.0005
+        while not self.cache.add(f"{key}:lock", True, LOCK_TIMEOUT):
+            now = time.monotonic()
+            if now >= deadline:
+                return None
+            time.sleep(min(delay, deadline - now))
+            delay = min(delay * 2, 0.005)
+
+        return time.monotonic()
+
+    def release(self, key: str, acquired: float) -> None:
+        # Past LOCK_HOLD_SECONDS the lock may have expired and been taken by
+        # another request, it is left to expire instead
+        if time.monotonic() - acquired < LOCK_HOLD_SECONDS:
+            self.cache.delete(f"{key}:lock")
+
+    def consume(
+        self, key: str, capacity: int, refill: float, now: float = None
+    ) -> float:
+        """
+        Take one token from a bucket. Returns 0 when a token was available,
+        otherwise the number of seconds until the next one is.
+        """
+        key = f"{self.key_prefix}:{key}"
+        now = time.time() if now is None else now
+        acquired = self.acquire(key)
+        if acquired is None:
+            return CONTENTION_WAIT
+        try:
+            tokens, updated = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(now - updated, 0) * refill)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / refill
+            self.cache.set(key, (tokens, now), math.ceil(capacity / refill) + 1)
+        finally:
+            self.release(key, acquired)
+
+        return wait
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle for views declaring a throttle_scope. A rate set
+    for "<scope>.<action>" in DEFAULT_THROTTLE_RATES overrides the scope
+    rate for that viewset action. Authenticated requests are limited per
+    user, anonymous ones per client IP.
+    """
+
+    scope_attr = "throttle_scope"
+    store_class = TokenBucketStore
+
+    def __init__(self) -> None:
+        self.rates = api_settings.DEFAULT_THROTTLE_RATES
+        self.wait_seconds = 0.0
+
+    def get_scope(self, view) -> Optional[str]:
+        """Return the configured scope of view, preferring its action"""
+        scope = getattr(view, self.scope_attr, None)
+        if scope is None:
+            return None
+
+        action = getattr(view, "action", None)
+        if action and f"{scope}.{action}" in self.rates:
+            return f"{scope}.{action}"
+
+        return scope if scope in self.rates else None
+
+    def get_ident_key(self, request) -> str:
+        """Return the identity the bucket belongs to"""
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view) -> bool:
+        if not getattr(settings, "THROTTLE_ENABLED", True):
+            return True
+
+        scope = self.get_scope(view)
+        rate = self.rates.get(scope) if scope else None
+        if rate is None:
+            return True
+
+        capacity, refill = parse_rate(rate)
+        key = f"{scope}:{self.get_ident_key(request)}"
+        self.wait_seconds = self.store_class().consume(key, capacity, refill)
+
+        return not self.wait_seconds
+
+    def wait(self) -> int:
+        """Whole seconds to wait, used for the Retry-After header"""
+        return math.ceil(self.wait_seconds)
+
+
+class IPTokenBucketThrottle(ScopedTokenBucketThrottle):
+    """
+    Token bucket throttle keyed by client IP regardless of authentication,
+    scoped by the view's ip_throttle_scope
+    """
+
+    scope_attr = "ip_throttle_scope"
+
+    def get_ident_key(self, request) -> str:
+        return f"ip:{self.get_ident(request)}"
+
+
+class CredentialsTokenBucketThrottle(ScopedTokenBucketThrottle):
+    """
+    Token bucket throttle for login attempts, keyed by the submitted email
+    and the client IP. Keying by the email alone would let anyone lock an
+    account out, the IPTokenBucketThrottle caps attempts per IP across
+    emails.
+    """
+
+    def get_ident_key(self, request) -> str:
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not email:
+            return super().get_ident_key(request)
+
+        return f"email:{str(email).strip().lower()}:ip:{self.get_ident(request)}"
@@ -0,0 +1,57 @@
+import hmac
+import ipaddress
+import mimetypes
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from core import metrics
+
+
+def metrics_allowed(request) -> bool:
+    """
+    Return whether the client may scrape metrics, by its address or a
+    bearer token. Only REMOTE_ADDR is trusted, forwarded addresses can be
+    forged.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    if token and hmac.compare_digest(authorization, f"Bearer {token}"):
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, "METRICS_ALLOWED_IPS", [])
+    )
+
+
+def metrics_view(request):
+    """Expose application metrics for Prometheus scraping"""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(metrics.render(), content_type=CONTENT_TYPE_LATEST)
+
+
+def media_view(request, name):
+    """
+    Serve an uploaded file from the configured storage, whichever node or
+    bucket holds it. Names of uploads are unique, so they never change.
+    """
+    try:
+        file = default_storage.open(name)
+    except (FileNotFoundError, ValueError):
+        raise Http404(name)
+    response = FileResponse(
+        file, content_type=mimetypes.guess_type(name)[0] or "application/octet-stream"
+    )
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+
+    return response
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from core.images import variant_urls
 from core.models import Tag, Ingredient, Recipe
 
 
@@ -34,6 +35,18 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "title", "ingredients", "tags", "time_min", "price", "link")
         read_only_fields = ("id",)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only let users link their own tags and ingredients
+        request = self.context.get("request")
+        if request is None:
+            return
+        for name in ("ingredients", "tags"):
+            field = self.fields.get(name)
+            if isinstance(field, serializers.ManyRelatedField):
+                relation = field.child_relation
+                relation.queryset = relation.queryset.filter(user=request.user)
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail"""
@@ -45,7 +58,90 @@ class RecipeDetailSerializer(RecipeSerializer):
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for recipe image"""
 
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ("id", "image")
+        fields = ("id", "image", "variants")
         read_only_fields = ("id",)
+
+    def get_variants(self, recipe):
+        """Return URLs of the resized images, written shortly after upload"""
+        return variant_urls(recipe.image.name) if recipe.image else {}
+
+
+class RecipeSimilaritySerializer(RecipeSerializer):
+    """Serializer for recipes ranked by similarity"""
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ("similarity",)
+
+
+class SimilarQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of similar recipes"""
+
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class BulkDeleteQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of deleting recipes in bulk"""
+
+    tags = serializers.RegexField(r"^\d+(,\d+)*$", required=False)
+    ingredients = serializers.RegexField(r"^\d+(,\d+)*$", required=False)
+    all = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        """Refuse to delete every recipe unless asked to explicitly"""
+        if not (attrs.get("tags") or attrs.get("ingredients") or attrs["all"]):
+            raise serializers.ValidationError(
+                "Filter by tags or ingredients, or pass all=true to delete "
+                "every recipe."
+            )
+
+        return attrs
+
+
+class RecipeMakeableSerializer(RecipeSerializer):
+    """Serializer for recipes matched against a pantry"""
+
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ("missing",)
+
+
+class PantrySerializer(serializers.Serializer):
+    """Serializer for the ingredients a user has at hand"""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+    max_missing = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50)
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    """Serializer for recipes to build a shopping list from"""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000
+    )
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Serializer for one aggregated shopping list ingredient"""
+
+    id = serializers.IntegerField(source="ingredient_id")
+    name = serializers.CharField(source="ingredient__name")
+    count = serializers.IntegerField()
+
+
+class ShoppingListResultSerializer(serializers.Serializer):
+    """Serializer for an aggregated shopping list"""
+
+    recipes = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    time_min = serializers.IntegerField()
+    ingredients = ShoppingListItemSerializer(many=True)
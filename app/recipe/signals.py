@@ -0,0 +1,92 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+from core.purging import recipes_purged
+from recipe import stats
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_similarity_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Update the rows of recipes whose links changed in the cached index"""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    # Imported on first use, numpy is not needed to start a worker
+    from recipe import similarity
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif pk_set is not None:
+        recipe_ids = list(pk_set)
+    else:
+        # Cleared from the tag or ingredient side, the recipes are unknown
+        transaction.on_commit(partial(similarity.invalidate, instance.user_id))
+        return
+    transaction.on_commit(
+        partial(similarity.refresh_recipes, instance.user_id, recipe_ids)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def add_similarity_recipe(sender, instance, created, **kwargs):
+    """Add a new recipe to the cached similarity index"""
+    if created:
+        from recipe import similarity
+
+        transaction.on_commit(
+            partial(similarity.refresh_recipes, instance.user_id, [instance.pk])
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_similarity_recipe(sender, instance, **kwargs):
+    """Drop a deleted recipe from the cached similarity index"""
+    from recipe import similarity
+
+    transaction.on_commit(
+        partial(similarity.refresh_recipes, instance.user_id, [instance.pk])
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_similarity(sender, instance, **kwargs):
+    """
+    Retire the cached index when a tag or ingredient is deleted, which
+    deletes its links without sending m2m_changed
+    """
+    from recipe import similarity
+
+    transaction.on_commit(partial(similarity.invalidate, instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_stats(sender, instance, **kwargs):
+    """Drop cached statistics of the owner of a changed object"""
+    transaction.on_commit(partial(stats.invalidate, instance.user_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_stats_links(sender, instance, action, **kwargs):
+    """Drop cached statistics when recipe links change"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(partial(stats.invalidate, instance.user_id))
+
+
+@receiver(recipes_purged, sender=Recipe)
+def invalidate_purged(sender, user_id, **kwargs):
+    """Drop cached similarity index and statistics of a user purged in bulk"""
+    from recipe import similarity
+
+    transaction.on_commit(partial(similarity.invalidate, user_id))
+    transaction.on_commit(partial(stats.invalidate, user_id))
@@ -0,0 +1,221 @@
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+
+from core import metrics
+from core.models import Recipe
+
+# Workers see each other's invalidations only through a shared cache, set
+# CACHE_BACKEND when serving from several processes
+CACHE_KEY = "recipe-similarity:{user_id}:{version}"
+VERSION_KEY = "recipe-similarity-version:{user_id}"
+CACHE_TIMEOUT = 60 * 60
+
+
+def ingredient_feature(ingredient_id: int) -> int:
+    """Return the feature code of an ingredient"""
+    return ingredient_id << 1
+
+
+def tag_feature(tag_id: int) -> int:
+    """Return the feature code of a tag"""
+    return tag_id << 1 | 1
+
+
+class SimilarityIndex:
+    """
+    Sparse recipe × feature matrix of a single user in coordinate form.
+    Features are ingredients and tags encoded as integers, so the Jaccard
+    similarity of one recipe against every other is a handful of vectorized
+    operations over the non-zero entries instead of a query per pair.
+    """
+
+    def __init__(self, recipe_ids, rows, features) -> None:
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.features = np.asarray(features, dtype=np.int64)
+        self.active = np.ones(len(self.recipe_ids), dtype=bool)
+        self.positions = {int(pk): row for row, pk in enumerate(self.recipe_ids)}
+        self.sizes = np.bincount(self.rows, minlength=len(self.recipe_ids))
+
+    @classmethod
+    def from_pairs(
+        cls, recipe_ids: Iterable[int], pairs: Iterable[Tuple[int, int]]
+    ) -> "SimilarityIndex":
+        """Build an index from recipe ids and (recipe id, feature) pairs"""
+        recipe_ids = np.fromiter(recipe_ids, dtype=np.int64)
+        pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        order = np.argsort(recipe_ids)
+        sorted_ids = recipe_ids[order]
+        found = np.searchsorted(sorted_ids, pairs[:, 0])
+        known = found < len(sorted_ids)
+        known[known] = sorted_ids[found[known]] == pairs[known, 0]
+
+        return cls(recipe_ids, order[found[known]], pairs[known, 1])
+
+    @classmethod
+    def build(cls, user) -> "SimilarityIndex":
+        """Build the index of a user's recipes from the database"""
+        through_tags = Recipe.tags.through.objects.filter(user=user)
+        through_ingredients = Recipe.ingredients.through.objects.filter(user=user)
+        pairs = [
+            (recipe_id, ingredient_feature(ingredient_id))
+            for recipe_id, ingredient_id in through_ingredients.values_list(
+                "recipe_id", "ingredient_id"
+            ).iterator()
+        ]
+        pairs.extend(
+            (recipe_id, tag_feature(tag_id))
+            for recipe_id, tag_id in through_tags.values_list(
+                "recipe_id", "tag_id"
+            ).iterator()
+        )
+        recipe_ids = Recipe.objects.filter(user=user).values_list("id", flat=True)
+
+        return cls.from_pairs(recipe_ids.iterator(), pairs)
+
+    def update(self, features: Dict[int, Optional[Iterable[int]]]) -> None:
+        """
+        Replace the rows of recipes by their features, adding unknown
+        recipes and dropping those mapped to None, in one pass over the
+        non-zero entries
+        """
+        rows = []
+        for recipe_id in features:
+            row = self.positions.get(recipe_id)
+            if row is None and features[recipe_id] is not None:
+                row = len(self.recipe_ids)
+                self.positions[recipe_id] = row
+                self.recipe_ids = np.append(self.recipe_ids, recipe_id)
+                self.active = np.append(self.active, True)
+                self.sizes = np.append(self.sizes, 0)
+            if row is not None:
+                rows.append(row)
+
+        keep = ~np.isin(self.rows, rows)
+        new_rows = [self.rows[keep]]
+        new_features = [self.features[keep]]
+        for recipe_id, recipe_features in features.items():
+            if recipe_features is None:
+                row = self.positions.pop(recipe_id, None)
+                if row is not None:
+                    self.active[row] = False
+                    self.sizes[row] = 0
+                continue
+            row = self.positions[recipe_id]
+            recipe_features = np.fromiter(set(recipe_features), dtype=np.int64)
+            new_rows.append(np.full(len(recipe_features), row, dtype=np.int64))
+            new_features.append(recipe_features)
+            self.sizes[row] = len(recipe_features)
+        self.rows = np.concatenate(new_rows)
+        self.features = np.concatenate(new_features)
+
+    def similar(self, recipe_id: int, limit: int) -> List[Tuple[int, float]]:
+        """Return up to limit (recipe id, Jaccard similarity) pairs"""
+        row = self.positions.get(recipe_id)
+        if row is None:
+            return []
+
+        target = self.features[self.rows == row]
+        if not len(target):
+            return []
+
+        hits = np.isin(self.features, target)
+        intersection = np.bincount(self.rows[hits], minlength=len(self.recipe_ids))
+        union = self.sizes + len(target) - intersection
+        scores = np.divide(
+            intersection,
+            union,
+            out=np.zeros(len(union), dtype=np.float64),
+            where=union > 0,
+        )
+        scores[~self.active] = 0
+        scores[row] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[
+            np.lexsort((self.recipe_ids[candidates], -scores[candidates]))
+        ]
+
+        return [
+            (int(self.recipe_ids[candidate]), float(scores[candidate]))
+            for candidate in candidates
+        ]
+
+
+def current_version(user_id: int) -> int:
+    """
+    Return the version of a user's index. It starts at a random number, so
+    indexes cached before the version key expired are not picked up again.
+    """
+    key = VERSION_KEY.format(user_id=user_id)
+    cache.add(key, random.getrandbits(48), CACHE_TIMEOUT)
+
+    return cache.get(key, 0)
+
+
+def get_index(user) -> SimilarityIndex:
+    """Return the cached similarity index of a user, building it if needed"""
+    key = CACHE_KEY.format(user_id=user.pk, version=current_version(user.pk))
+    index = cache.get(key)
+    metrics.record_cache_lookup("similarity", index is not None)
+    if index is None:
+        index = SimilarityIndex.build(user)
+        cache.set(key, index, CACHE_TIMEOUT)
+
+    return index
+
+
+def recipe_features(user_id: int, recipe_ids) -> Dict[int, Optional[List[int]]]:
+    """Return the features of recipes, None for those deleted since"""
+    recipe_ids = set(recipe_ids)
+    existing = Recipe.objects.filter(user_id=user_id, pk__in=recipe_ids)
+    features = {pk: None for pk in recipe_ids}
+    features.update((pk, []) for pk in existing.values_list("pk", flat=True))
+    links = Recipe.ingredients.through.objects.filter(
+        user_id=user_id, recipe_id__in=recipe_ids
+    )
+    for recipe_id, ingredient_id in links.values_list("recipe_id", "ingredient_id"):
+        if features.get(recipe_id) is not None:
+            features[recipe_id].append(ingredient_feature(ingredient_id))
+    links = Recipe.tags.through.objects.filter(
+        user_id=user_id, recipe_id__in=recipe_ids
+    )
+    for recipe_id, tag_id in links.values_list("recipe_id", "tag_id"):
+        if features.get(recipe_id) is not None:
+            features[recipe_id].append(tag_feature(tag_id))
+
+    return features
+
+
+def refresh_recipes(user_id: int, recipe_ids: Iterable[int]) -> None:
+    """
+    Update the rows of changed recipes in the cached index of a user. The
+    updated index is stored under the next version, which this call must
+    be the one to take: if another writer bumped the version meanwhile,
+    neither index has both changes and the next read builds a new one.
+    """
+    version = current_version(user_id)
+    index = cache.get(CACHE_KEY.format(user_id=user_id, version=version))
+    try:
+        next_version = cache.incr(VERSION_KEY.format(user_id=user_id))
+    except ValueError:
+        # The version expired, so did the index
+        return
+    if index is None or next_version != version + 1:
+        return
+
+    index.update(recipe_features(user_id, recipe_ids))
+    cache.set(
+        CACHE_KEY.format(user_id=user_id, version=next_version), index, CACHE_TIMEOUT
+    )
+
+
+def invalidate(user_id: int) -> None:
+    """Retire the cached index of a user, the next read builds a new one"""
+    cache.delete(VERSION_KEY.format(user_id=user_id))
@@ -0,0 +1,203 @@
+import math
+import random
+from typing import Dict, Iterable, List, Sequence
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (
+    Aggregate,
+    Avg,
+    Count,
+    F,
+    FloatField,
+    Max,
+    Min,
+    QuerySet,
+    Value,
+)
+from django.db.models.functions import Cast, Floor, Least
+
+from core import metrics
+from core.models import Tag, Ingredient, Recipe
+
+CACHE_KEY = "recipe-stats:{user_id}:{version}"
+VERSION_KEY = "recipe-stats-version:{user_id}"
+CACHE_TIMEOUT = 60 * 15
+PERCENTILES = (0.25, 0.5, 0.75, 0.9, 0.99)
+HISTOGRAM_BUCKETS = 10
+TOP_LIMIT = 5
+DISTRIBUTION_FIELDS = ("price", "time_min")
+
+
+class PercentileCont(Aggregate):
+    """Continuous percentile of an ordered set, available on PostgreSQL"""
+
+    function = "PERCENTILE_CONT"
+    name = "PercentileCont"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile: float, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def percentile_key(percentile: float) -> str:
+    """Return the response key of a percentile"""
+    return f"p{percentile * 100:g}"
+
+
+def stream_percentiles(
+    values: Iterable[float], count: int, percentiles: Sequence[float]
+) -> Dict[str, float]:
+    """
+    Compute percentile_cont compatible percentiles from values sorted in
+    ascending order, keeping only the values at the interpolation points
+    """
+    if not count:
+        return {percentile_key(p): None for p in percentiles}
+
+    wanted = set()
+    for percentile in percentiles:
+        position = percentile * (count - 1)
+        wanted.update((math.floor(position), math.ceil(position)))
+
+    last = max(wanted)
+    picked = {}
+    for index, value in enumerate(values):
+        if index in wanted:
+            picked[index] = float(value)
+        if index >= last:
+            break
+
+    result = {}
+    for percentile in percentiles:
+        position = percentile * (count - 1)
+        lower, upper = picked[math.floor(position)], picked[math.ceil(position)]
+        result[percentile_key(percentile)] = lower + (upper - lower) * (
+            position - math.floor(position)
+        )
+
+    return result
+
+
+def histogram(
+    queryset: QuerySet, field: str, low: float, high: float, buckets: int
+) -> List[dict]:
+    """Count rows of queryset falling into equal width buckets of field"""
+    if low is None:
+        return []
+
+    width = (high - low) / buckets or 1
+    bucket = Least(
+        Floor((Cast(field, FloatField()) - Value(low)) / Value(width)),
+        Value(buckets - 1),
+        output_field=FloatField(),
+    )
+    counts = dict(
+        queryset.annotate(bucket=bucket)
+        .values("bucket")
+        .annotate(total=Count("pk"))
+        .order_by("bucket")
+        .values_list("bucket", "total")
+    )
+
+    return [
+        {
+            "start": low + width * index,
+            "end": low + width * (index + 1),
+            "count": counts.get(index, 0),
+        }
+        for index in range(buckets)
+        if index * width <= high - low
+    ]
+
+
+def top_used(model, user) -> List[dict]:
+    """Return the most used tags or ingredients of a user"""
+    return list(
+        model.objects.filter(user=user, recipe_count__gt=0)
+        .order_by("-recipe_count", "name")
+        .values("id", "name", recipes=F("recipe_count"))[:TOP_LIMIT]
+    )
+
+
+def compute_stats(user) -> dict:
+    """Compute recipe statistics of a user with aggregate queries"""
+    recipes = Recipe.objects.filter(user=user).order_by()
+    aggregates = {"recipes": Count("pk")}
+    for field in DISTRIBUTION_FIELDS:
+        aggregates[f"{field}_min"] = Min(field)
+        aggregates[f"{field}_max"] = Max(field)
+        aggregates[f"{field}_avg"] = Avg(field)
+        if connection.vendor == "postgresql":
+            for percentile in PERCENTILES:
+                aggregates[f"{field}_{percentile_key(percentile)}"] = PercentileCont(
+                    field, percentile
+                )
+    totals = recipes.aggregate(**aggregates)
+
+    stats = {"recipes": totals["recipes"]}
+    for field in DISTRIBUTION_FIELDS:
+        low, high, avg = (
+            totals[f"{field}_{name}"] for name in ("min", "max", "avg")
+        )
+        low = None if low is None else float(low)
+        high = None if high is None else float(high)
+        if connection.vendor == "postgresql":
+            percentiles = {
+                percentile_key(p): totals[f"{field}_{percentile_key(p)}"]
+                for p in PERCENTILES
+            }
+        else:
+            values = recipes.order_by(field).values_list(field, flat=True)
+            percentiles = stream_percentiles(
+                values.iterator(), totals["recipes"], PERCENTILES
+            )
+        stats[field] = {
+            "min": low,
+            "max": high,
+            "avg": None if avg is None else float(avg),
+            "percentiles": percentiles,
+            "histogram": histogram(recipes, field, low, high, HISTOGRAM_BUCKETS),
+        }
+
+    stats["top_tags"] = top_used(Tag, user)
+    stats["top_ingredients"] = top_used(Ingredient, user)
+
+    return stats
+
+
+def current_version(user_id: int) -> int:
+    """
+    Return the version of a user's statistics. It starts at a random number,
+    so statistics cached before the version key expired are not picked up
+    again.
+    """
+    key = VERSION_KEY.format(user_id=user_id)
+    cache.add(key, random.getrandbits(48), CACHE_TIMEOUT)
+
+    return cache.get(key, 0)
+
+
+def get_stats(user) -> dict:
+    """Return cached recipe statistics of a user, computing them if needed"""
+    key = CACHE_KEY.format(user_id=user.pk, version=current_version(user.pk))
+    stats = cache.get(key)
+    metrics.record_cache_lookup("stats", stats is not None)
+    if stats is None:
+        stats = compute_stats(user)
+        cache.set(key, stats, CACHE_TIMEOUT)
+
+    return stats
+
+
+def invalidate(user_id: int) -> None:
+    """
+    Retire the cached statistics of a user. Statistics computed from the
+    data before the change are stored under the old version and never read.
+    """
+    try:
+        cache.incr(VERSION_KEY.format(user_id=user_id))
+    except ValueError:
+        # The version expired, so did the statistics
+        pass
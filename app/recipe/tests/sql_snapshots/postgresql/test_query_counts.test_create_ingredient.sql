@@ -0,0 +1 @@
+INSERT INTO "core_ingredient" ("name", "user_id", "recipe_count") VALUES (?, ?, ?) RETURNING "core_ingredient"."id"
@@ -0,0 +1 @@
+INSERT INTO "core_tag" ("name", "user_id", "recipe_count") VALUES (?, ?, ?) RETURNING "core_tag"."id"
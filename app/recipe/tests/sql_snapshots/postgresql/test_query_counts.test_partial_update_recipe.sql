@@ -0,0 +1,11 @@
+SELECT "core_recipe"."id", "core_recipe"."title", "core_recipe"."user_id", "core_recipe"."time_min", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image" FROM "core_recipe" WHERE ("core_recipe"."user_id" = ? AND "core_recipe"."id" = ?) LIMIT ?
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id", "core_tag"."recipe_count" FROM "core_tag" WHERE ("core_tag"."user_id" = ? AND "core_tag"."id" = ?) LIMIT ?
+UPDATE "core_recipe" SET "title" = ?, "user_id" = ?, "time_min" = ?, "price" = ?, "link" = ?, "image" = ? WHERE "core_recipe"."id" = ?
+SELECT "core_tag"."id" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE ("core_recipe_tags"."recipe_id" = ? AND ("core_recipe_tags"."user_id" IN (...)))
+DELETE FROM "core_recipe_tags" WHERE ("core_recipe_tags"."recipe_id" = ? AND "core_recipe_tags"."tag_id" IN (...))
+UPDATE "core_tag" SET "recipe_count" = COALESCE((SELECT COUNT(U0."id") AS "total" FROM "core_recipe_tags" U0 WHERE (U0."tag_id" = "core_tag"."id" AND U0."user_id" = "core_tag"."user_id") GROUP BY U0."tag_id"), ?) WHERE "core_tag"."id" IN (...)
+SELECT "core_recipe_tags"."tag_id" FROM "core_recipe_tags" WHERE ("core_recipe_tags"."recipe_id" = ? AND "core_recipe_tags"."tag_id" IN (...))
+INSERT INTO "core_recipe_tags" ("user_id", "recipe_id", "tag_id") VALUES (?, ?, ?) RETURNING "core_recipe_tags"."id"
+UPDATE "core_tag" SET "recipe_count" = COALESCE((SELECT COUNT(U0."id") AS "total" FROM "core_recipe_tags" U0 WHERE (U0."tag_id" = "core_tag"."id" AND U0."user_id" = "core_tag"."user_id") GROUP BY U0."tag_id"), ?) WHERE "core_tag"."id" IN (...)
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id", "core_ingredient"."recipe_count" FROM "core_ingredient" INNER JOIN "core_recipe_ingredients" ON ("core_ingredient"."id" = "core_recipe_ingredients"."ingredient_id") WHERE ("core_recipe_ingredients"."recipe_id" = ? AND ("core_recipe_ingredients"."user_id" IN (...))) ORDER BY ("core_recipe_ingredients"."position") ASC, ("core_recipe_ingredients"."ingredient_id") ASC
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id", "core_tag"."recipe_count" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE ("core_recipe_tags"."recipe_id" = ? AND ("core_recipe_tags"."user_id" IN (...)))
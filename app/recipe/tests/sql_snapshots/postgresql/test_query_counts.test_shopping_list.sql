@@ -0,0 +1,2 @@
+SELECT COUNT("core_recipe"."id") AS "recipes", SUM("core_recipe"."price") AS "price", SUM("core_recipe"."time_min") AS "time_min" FROM "core_recipe" WHERE ("core_recipe"."id" IN (...) AND "core_recipe"."user_id" = ?)
+SELECT "core_recipe_ingredients"."ingredient_id", "core_ingredient"."name", COUNT("core_recipe_ingredients"."recipe_id") AS "count" FROM "core_recipe_ingredients" INNER JOIN "core_ingredient" ON ("core_recipe_ingredients"."ingredient_id" = "core_ingredient"."id") WHERE ("core_recipe_ingredients"."recipe_id" IN (SELECT U0."id" FROM "core_recipe" U0 WHERE (U0."id" IN (...) AND U0."user_id" = ?)) AND "core_recipe_ingredients"."user_id" = ?) GROUP BY "core_recipe_ingredients"."ingredient_id", "core_ingredient"."name" ORDER BY "count" DESC, "core_ingredient"."name" ASC
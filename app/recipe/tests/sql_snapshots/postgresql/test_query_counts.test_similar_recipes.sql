@@ -0,0 +1,7 @@
+SELECT "core_recipe"."id", "core_recipe"."title", "core_recipe"."user_id", "core_recipe"."time_min", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image" FROM "core_recipe" WHERE ("core_recipe"."user_id" = ? AND "core_recipe"."id" = ?) LIMIT ?
+DECLARE "_django_curs" NO SCROLL CURSOR WITHOUT HOLD FOR SELECT "core_recipe_ingredients"."recipe_id", "core_recipe_ingredients"."ingredient_id" FROM "core_recipe_ingredients" WHERE "core_recipe_ingredients"."user_id" = ?
+DECLARE "_django_curs" NO SCROLL CURSOR WITHOUT HOLD FOR SELECT "core_recipe_tags"."recipe_id", "core_recipe_tags"."tag_id" FROM "core_recipe_tags" WHERE "core_recipe_tags"."user_id" = ?
+DECLARE "_django_curs" NO SCROLL CURSOR WITHOUT HOLD FOR SELECT "core_recipe"."id" FROM "core_recipe" WHERE "core_recipe"."user_id" = ?
+SELECT "core_recipe"."id", "core_recipe"."title", "core_recipe"."user_id", "core_recipe"."time_min", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image" FROM "core_recipe" WHERE ("core_recipe"."id" IN (...) AND "core_recipe"."user_id" = ?)
+SELECT ("core_recipe_tags"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_tag"."id", "core_tag"."name", "core_tag"."user_id", "core_tag"."recipe_count" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE ("core_recipe_tags"."recipe_id" IN (...) AND ("core_recipe_tags"."user_id" IN (...)))
+SELECT ("core_recipe_ingredients"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id", "core_ingredient"."recipe_count" FROM "core_ingredient" INNER JOIN "core_recipe_ingredients" ON ("core_ingredient"."id" = "core_recipe_ingredients"."ingredient_id") WHERE ("core_recipe_ingredients"."recipe_id" IN (...) AND ("core_recipe_ingredients"."user_id" IN (...))) ORDER BY ("core_recipe_ingredients"."position") ASC, ("core_recipe_ingredients"."ingredient_id") ASC
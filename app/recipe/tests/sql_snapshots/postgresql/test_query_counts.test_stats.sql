@@ -0,0 +1,5 @@
+SELECT COUNT("core_recipe"."id") AS "recipes", MIN("core_recipe"."price") AS "price_min", MAX("core_recipe"."price") AS "price_max", AVG("core_recipe"."price") AS "price_avg", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."price") AS "price_p25", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."price") AS "price_p50", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."price") AS "price_p75", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."price") AS "price_p90", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."price") AS "price_p99", MIN("core_recipe"."time_min") AS "time_min_min", MAX("core_recipe"."time_min") AS "time_min_max", AVG("core_recipe"."time_min") AS "time_min_avg", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."time_min") AS "time_min_p25", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."time_min") AS "time_min_p50", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."time_min") AS "time_min_p75", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."time_min") AS "time_min_p90", PERCENTILE_CONT(?) WITHIN GROUP (ORDER BY "core_recipe"."time_min") AS "time_min_p99" FROM "core_recipe" WHERE "core_recipe"."user_id" = ?
+SELECT LEAST(FLOOR(((CAST("core_recipe"."price" AS double precision) - ?) / ?)), ?) AS "bucket", COUNT("core_recipe"."id") AS "total" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? GROUP BY LEAST(FLOOR(((CAST("core_recipe"."price" AS double precision) - ?) / ?)), ?) ORDER BY "bucket" ASC
+SELECT LEAST(FLOOR(((CAST("core_recipe"."time_min" AS double precision) - ?) / ?)), ?) AS "bucket", COUNT("core_recipe"."id") AS "total" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? GROUP BY LEAST(FLOOR(((CAST("core_recipe"."time_min" AS double precision) - ?) / ?)), ?) ORDER BY "bucket" ASC
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."recipe_count" AS "recipes" FROM "core_tag" WHERE ("core_tag"."recipe_count" > ? AND "core_tag"."user_id" = ?) ORDER BY "core_tag"."recipe_count" DESC, "core_tag"."name" ASC LIMIT ?
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."recipe_count" AS "recipes" FROM "core_ingredient" WHERE ("core_ingredient"."recipe_count" > ? AND "core_ingredient"."user_id" = ?) ORDER BY "core_ingredient"."recipe_count" DESC, "core_ingredient"."name" ASC LIMIT ?
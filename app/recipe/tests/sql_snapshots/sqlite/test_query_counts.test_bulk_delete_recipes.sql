@@ -0,0 +1,11 @@
+SELECT "core_recipe"."id", "core_recipe"."image" FROM "core_recipe" WHERE ("core_recipe"."user_id" = ? AND "core_recipe"."user_id" = ?) ORDER BY "core_recipe"."id" ASC LIMIT ?
+SAVEPOINT "?"
+DELETE FROM "core_recipe_tags" WHERE ("core_recipe_tags"."recipe_id" IN (...) AND "core_recipe_tags"."user_id" = ?)
+DELETE FROM "core_recipe_ingredients" WHERE ("core_recipe_ingredients"."recipe_id" IN (...) AND "core_recipe_ingredients"."user_id" = ?)
+DELETE FROM "core_recipe" WHERE ("core_recipe"."id" IN (...) AND "core_recipe"."user_id" = ?)
+RELEASE SAVEPOINT "?"
+SELECT "core_recipe"."id", "core_recipe"."image" FROM "core_recipe" WHERE ("core_recipe"."user_id" = ? AND "core_recipe"."user_id" = ?) ORDER BY "core_recipe"."id" ASC LIMIT ?
+SAVEPOINT "?"
+UPDATE "core_tag" SET "recipe_count" = COALESCE((SELECT COUNT(U0."id") AS "total" FROM "core_recipe_tags" U0 WHERE (U0."tag_id" = "core_tag"."id" AND U0."user_id" = "core_tag"."user_id") GROUP BY U0."tag_id"), ?) WHERE "core_tag"."id" IN (SELECT U0."id" FROM "core_tag" U0 WHERE U0."user_id" = ?)
+UPDATE "core_ingredient" SET "recipe_count" = COALESCE((SELECT COUNT(U0."id") AS "total" FROM "core_recipe_ingredients" U0 WHERE (U0."ingredient_id" = "core_ingredient"."id" AND U0."user_id" = "core_ingredient"."user_id") GROUP BY U0."ingredient_id"), ?) WHERE "core_ingredient"."id" IN (SELECT U0."id" FROM "core_ingredient" U0 WHERE U0."user_id" = ?)
+RELEASE SAVEPOINT "?"
@@ -0,0 +1,14 @@
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id", "core_ingredient"."recipe_count" FROM "core_ingredient" WHERE ("core_ingredient"."user_id" = ? AND "core_ingredient"."id" = ?) LIMIT ?
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id", "core_tag"."recipe_count" FROM "core_tag" WHERE ("core_tag"."user_id" = ? AND "core_tag"."id" = ?) LIMIT ?
+INSERT INTO "core_recipe" ("title", "user_id", "time_min", "price", "link", "image") VALUES (?, ?, ?, ?, ?, ?)
+SELECT "core_ingredient"."id" FROM "core_ingredient" INNER JOIN "core_recipe_ingredients" ON ("core_ingredient"."id" = "core_recipe_ingredients"."ingredient_id") WHERE ("core_recipe_ingredients"."recipe_id" = ? AND ("core_recipe_ingredients"."user_id" IN (...))) ORDER BY ("core_recipe_ingredients"."position") ASC, ("core_recipe_ingredients"."ingredient_id") ASC
+SELECT "core_recipe_ingredients"."ingredient_id" FROM "core_recipe_ingredients" WHERE ("core_recipe_ingredients"."ingredient_id" IN (...) AND "core_recipe_ingredients"."recipe_id" = ?)
+INSERT INTO "core_recipe_ingredients" ("user_id", "recipe_id", "ingredient_id", "position", "quantity") SELECT ?, ?, ?, ?, ?
+UPDATE "core_ingredient" SET "recipe_count" = COALESCE((SELECT COUNT(U0."id") AS "total" FROM "core_recipe_ingredients" U0 WHERE (U0."ingredient_id" = "core_ingredient"."id" AND U0."user_id" = "core_ingredient"."user_id") GROUP BY U0."ingredient_id"), ?) WHERE "core_ingredient"."id" IN (...)
+UPDATE "core_recipe_ingredients" SET "position" = CASE WHEN ("core_recipe_ingredients"."ingredient_id" = ?) THEN ? ELSE NULL END WHERE ("core_recipe_ingredients"."recipe_id" = ? AND "core_recipe_ingredients"."user_id" = ? AND "core_recipe_ingredients"."ingredient_id" IN (...))
+SELECT "core_tag"."id" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE ("core_recipe_tags"."recipe_id" = ? AND ("core_recipe_tags"."user_id" IN (...)))
+SELECT "core_recipe_tags"."tag_id" FROM "core_recipe_tags" WHERE ("core_recipe_tags"."recipe_id" = ? AND "core_recipe_tags"."tag_id" IN (...))
+INSERT INTO "core_recipe_tags" ("user_id", "recipe_id", "tag_id") SELECT ?, ?, ?
+UPDATE "core_tag" SET "recipe_count" = COALESCE((SELECT COUNT(U0."id") AS "total" FROM "core_recipe_tags" U0 WHERE (U0."tag_id" = "core_tag"."id" AND U0."user_id" = "core_tag"."user_id") GROUP BY U0."tag_id"), ?) WHERE "core_tag"."id" IN (...)
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id", "core_ingredient"."recipe_count" FROM "core_ingredient" INNER JOIN "core_recipe_ingredients" ON ("core_ingredient"."id" = "core_recipe_ingredients"."ingredient_id") WHERE ("core_recipe_ingredients"."recipe_id" = ? AND ("core_recipe_ingredients"."user_id" IN (...))) ORDER BY ("core_recipe_ingredients"."position") ASC, ("core_recipe_ingredients"."ingredient_id") ASC
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id", "core_tag"."recipe_count" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE ("core_recipe_tags"."recipe_id" = ? AND ("core_recipe_tags"."user_id" IN (...)))
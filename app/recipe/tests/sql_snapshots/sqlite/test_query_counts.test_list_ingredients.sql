@@ -0,0 +1 @@
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id", "core_ingredient"."recipe_count" FROM "core_ingredient" WHERE "core_ingredient"."user_id" = ? ORDER BY "core_ingredient"."recipe_count" DESC
@@ -0,0 +1 @@
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id", "core_tag"."recipe_count" FROM "core_tag" WHERE ("core_tag"."user_id" = ? AND "core_tag"."recipe_count" > ?) ORDER BY "core_tag"."name" DESC
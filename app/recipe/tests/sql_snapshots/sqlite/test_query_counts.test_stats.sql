@@ -0,0 +1,7 @@
+SELECT COUNT("core_recipe"."id") AS "recipes", CAST(MIN("core_recipe"."price") AS NUMERIC) AS "price_min", CAST(MAX("core_recipe"."price") AS NUMERIC) AS "price_max", CAST(AVG("core_recipe"."price") AS NUMERIC) AS "price_avg", MIN("core_recipe"."time_min") AS "time_min_min", MAX("core_recipe"."time_min") AS "time_min_max", AVG("core_recipe"."time_min") AS "time_min_avg" FROM "core_recipe" WHERE "core_recipe"."user_id" = ?
+SELECT "core_recipe"."price" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? ORDER BY "core_recipe"."price" ASC
+SELECT MIN(FLOOR(((CAST("core_recipe"."price" AS real) - ?) / ?)), ?) AS "bucket", COUNT("core_recipe"."id") AS "total" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? GROUP BY MIN(FLOOR(((CAST("core_recipe"."price" AS real) - ?) / ?)), ?) ORDER BY "bucket" ASC
+SELECT "core_recipe"."time_min" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? ORDER BY "core_recipe"."time_min" ASC
+SELECT MIN(FLOOR(((CAST("core_recipe"."time_min" AS real) - ?) / ?)), ?) AS "bucket", COUNT("core_recipe"."id") AS "total" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? GROUP BY MIN(FLOOR(((CAST("core_recipe"."time_min" AS real) - ?) / ?)), ?) ORDER BY "bucket" ASC
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."recipe_count" AS "recipes" FROM "core_tag" WHERE ("core_tag"."recipe_count" > ? AND "core_tag"."user_id" = ?) ORDER BY "core_tag"."recipe_count" DESC, "core_tag"."name" ASC LIMIT ?
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."recipe_count" AS "recipes" FROM "core_ingredient" WHERE ("core_ingredient"."recipe_count" > ? AND "core_ingredient"."user_id" = ?) ORDER BY "core_ingredient"."recipe_count" DESC, "core_ingredient"."name" ASC LIMIT ?
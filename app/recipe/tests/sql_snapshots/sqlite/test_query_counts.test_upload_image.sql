@@ -0,0 +1,3 @@
+SELECT "core_recipe"."id", "core_recipe"."title", "core_recipe"."user_id", "core_recipe"."time_min", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image" FROM "core_recipe" WHERE ("core_recipe"."user_id" = ? AND "core_recipe"."id" = ?) LIMIT ?
+UPDATE "core_recipe" SET "title" = ?, "user_id" = ?, "time_min" = ?, "price" = ?, "link" = ?, "image" = ? WHERE "core_recipe"."id" = ?
+INSERT INTO "core_job" ("name", "queue", "kwargs", "status", "attempts", "max_attempts", "run_after", "locked_by", "locked_at", "last_error", "created_at", "finished_at") VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, NULL)
@@ -0,0 +1,144 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db.models import prefetch_related_objects
+from django.test import AsyncRequestFactory
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.views import RecipeViewSet, TagViewSet
+
+RECIPES_PATH = "/api/recipe/recipes/"
+
+
+@pytest.fixture
+def db_threads(settings, transactional_db):
+    """Run ORM work of async views in the thread pool"""
+    settings.ASYNC_DB_THREADS = 2
+
+
+@pytest.fixture
+def async_request(simple_user):
+    """Build token authenticated requests for async views"""
+    token = Token.objects.create(user=simple_user)
+    factory = AsyncRequestFactory()
+
+    def build(method, path, data=None):
+        return getattr(factory, method)(
+            path,
+            data,
+            content_type="application/json",
+            AUTHORIZATION=f"Token {token.key}",
+        )
+
+    return build
+
+
+def call(view, request, **kwargs):
+    """Run an async view to completion and return its response"""
+    response = async_to_sync(view)(request, **kwargs)
+    response.render()
+
+    return response
+
+
+def sample_tagged_recipe(user, helper_functions) -> Recipe:
+    """Create a recipe with one tag and one ingredient"""
+    recipe = helper_functions.sample_recipe(user=user)
+    recipe.tags.add(helper_functions.sample_tag(user=user))
+    recipe.ingredients.add(helper_functions.sample_ingredient(user=user))
+
+    return recipe
+
+
+class PrivateAsyncRecipeViewTests:
+    """Test the recipe viewsets served as async views"""
+
+    def test_list_prefetches_in_pool_threads(
+        self, db_threads, async_request, simple_user, helper_functions
+    ) -> None:
+        """Test listing recipes runs the prefetch queries in the pool"""
+        sample_tagged_recipe(simple_user, helper_functions)
+        sample_tagged_recipe(simple_user, helper_functions)
+        threads = []
+
+        def prefetch(instances, lookup):
+            threads.append((lookup, threading.current_thread().name))
+            prefetch_related_objects(instances, lookup)
+
+        view = RecipeViewSet.as_async_view({"get": "list"})
+        with patch("core.asyncviews.prefetch_related_objects", prefetch):
+            response = call(view, async_request("get", RECIPES_PATH))
+
+        serializer = RecipeSerializer(Recipe.objects.all(), many=True)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == serializer.data
+        assert sorted(lookup for lookup, _ in threads) == ["ingredients", "tags"]
+        assert all(name.startswith("async-db") for _, name in threads)
+
+    def test_retrieve(
+        self, db_threads, async_request, simple_user, create_user, helper_functions
+    ) -> None:
+        """Test retrieving own recipes and not those of other users"""
+        recipe = sample_tagged_recipe(simple_user, helper_functions)
+        other = helper_functions.sample_recipe(
+            user=create_user(email="other@example.com", password="pass")
+        )
+        view = RecipeViewSet.as_async_view({"get": "retrieve"})
+
+        response = call(view, async_request("get", RECIPES_PATH), pk=recipe.pk)
+        missing = call(view, async_request("get", RECIPES_PATH), pk=other.pk)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == RecipeDetailSerializer(recipe).data
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_create(
+        self, db_threads, async_request, simple_user, helper_functions
+    ) -> None:
+        """Test creating a recipe through the async view"""
+        tag = helper_functions.sample_tag(user=simple_user)
+        ingredient = helper_functions.sample_ingredient(user=simple_user)
+        payload = {
+            "title": "Soup",
+            "time_min": 20,
+            "price": "5.00",
+            "tags": [tag.pk],
+            "ingredients": [ingredient.pk],
+        }
+        view = RecipeViewSet.as_async_view({"post": "create"})
+
+        response = call(view, async_request("post", RECIPES_PATH, payload))
+
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        tag.refresh_from_db()
+        assert response.status_code == status.HTTP_201_CREATED
+        assert recipe.user == simple_user
+        assert list(recipe.tags.all()) == [tag]
+        assert tag.recipe_count == 1
+
+    def test_sync_actions_and_errors(
+        self, db_threads, async_request, simple_user, helper_functions
+    ) -> None:
+        """Test sync actions, validation and auth errors of async views"""
+        recipe = helper_functions.sample_recipe(user=simple_user)
+        view = RecipeViewSet.as_async_view({"patch": "partial_update"})
+        tags = TagViewSet.as_async_view({"get": "list", "post": "create"})
+
+        updated = call(
+            view, async_request("patch", RECIPES_PATH, {"title": "New"}), pk=recipe.pk
+        )
+        invalid = call(tags, async_request("post", "/api/recipe/tags/", {}))
+        anonymous = call(tags, AsyncRequestFactory().get("/api/recipe/tags/"))
+        not_allowed = call(tags, async_request("delete", "/api/recipe/tags/"))
+
+        recipe.refresh_from_db()
+        assert updated.status_code == status.HTTP_200_OK
+        assert recipe.title == "New"
+        assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+        assert anonymous.status_code == status.HTTP_401_UNAUTHORIZED
+        assert not_allowed.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
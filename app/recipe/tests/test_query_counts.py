@@ -0,0 +1,286 @@
+import tempfile
+
+import pytest
+from PIL import Image
+from django.core.cache import cache
+from django.urls import reverse
+
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+MAKEABLE_URL = reverse("recipe:recipe-makeable")
+BULK_DELETE_URL = reverse("recipe:recipe-bulk-delete")
+SHOPPING_LIST_URL = reverse("recipe:shopping-list")
+STATS_URL = reverse("recipe:stats")
+
+
+def recipe_url(name: str, recipe_id: int) -> str:
+    """Return the URL of a recipe detail route"""
+    return reverse(f"recipe:recipe-{name}", args=[recipe_id])
+
+
+def linked_recipe(user, helper_functions, title: str = "Sample Recipe"):
+    """Create a recipe with its own tag and ingredient"""
+    recipe = helper_functions.sample_recipe(user=user, title=title)
+    recipe.tags.add(helper_functions.sample_tag(user=user, name=f"{title} tag"))
+    recipe.ingredients.add(
+        helper_functions.sample_ingredient(user=user, name=f"{title} ingredient")
+    )
+
+    return recipe
+
+
+def grow_recipes(user, helper_functions, count: int = 3):
+    """Return a callable adding linked recipes for user"""
+
+    def grow():
+        for index in range(count):
+            linked_recipe(user, helper_functions, f"Extra {index}")
+
+    return grow
+
+
+class TagQueryTests:
+    """Test query budgets of the tags API"""
+
+    @pytest.mark.max_queries(1)
+    def test_list_tags(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that listing tags needs a fixed number of queries"""
+        linked_recipe(simple_user, helper_functions)
+
+        query_guard.check(
+            lambda: api_client.get(TAGS_URL, {"assigned_only": 1}),
+            grow_recipes(simple_user, helper_functions),
+        )
+
+    @pytest.mark.max_queries(1)
+    def test_create_tag(self, api_client, simple_user, query_guard) -> None:
+        """Test queries of creating a tag"""
+        query_guard.check(lambda: api_client.post(TAGS_URL, {"name": "Vegan"}))
+
+
+class IngredientQueryTests:
+    """Test query budgets of the ingredients API"""
+
+    @pytest.mark.max_queries(1)
+    def test_list_ingredients(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that listing ingredients needs a fixed number of queries"""
+        linked_recipe(simple_user, helper_functions)
+
+        query_guard.check(
+            lambda: api_client.get(INGREDIENTS_URL, {"ordering": "-recipe_count"}),
+            grow_recipes(simple_user, helper_functions),
+        )
+
+    @pytest.mark.max_queries(1)
+    def test_create_ingredient(self, api_client, simple_user, query_guard) -> None:
+        """Test queries of creating an ingredient"""
+        query_guard.check(lambda: api_client.post(INGREDIENTS_URL, {"name": "Salt"}))
+
+
+class RecipeQueryTests:
+    """Test query budgets of the recipes API"""
+
+    @pytest.mark.max_queries(3)
+    def test_list_recipes(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that listing recipes needs a fixed number of queries"""
+        linked_recipe(simple_user, helper_functions)
+
+        query_guard.check(
+            lambda: api_client.get(RECIPES_URL),
+            grow_recipes(simple_user, helper_functions),
+        )
+
+    @pytest.mark.max_queries(3)
+    def test_filter_recipes(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that filtering recipes needs a fixed number of queries"""
+        recipe = linked_recipe(simple_user, helper_functions)
+        tag = recipe.tags.get()
+
+        def grow():
+            for index in range(3):
+                linked_recipe(simple_user, helper_functions, f"Extra {index}").tags.add(
+                    tag
+                )
+
+        query_guard.check(lambda: api_client.get(RECIPES_URL, {"tags": tag.id}), grow)
+
+    @pytest.mark.max_queries(3)
+    def test_retrieve_recipe(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that a recipe detail needs a fixed number of queries"""
+        recipe = linked_recipe(simple_user, helper_functions)
+
+        def grow():
+            for index in range(3):
+                recipe.tags.add(
+                    helper_functions.sample_tag(user=simple_user, name=f"Tag {index}")
+                )
+
+        query_guard.check(lambda: api_client.get(recipe_url("detail", recipe.id)), grow)
+
+    @pytest.mark.max_queries(14)
+    def test_create_recipe(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test queries of creating a recipe"""
+        tag = helper_functions.sample_tag(user=simple_user)
+        ingredient = helper_functions.sample_ingredient(user=simple_user)
+        payload = {
+            "title": "Soup",
+            "time_min": 30,
+            "price": 3,
+            "tags": [tag.id],
+            "ingredients": [ingredient.id],
+        }
+
+        query_guard.check(lambda: api_client.post(RECIPES_URL, payload))
+
+    @pytest.mark.max_queries(18)
+    def test_update_recipe(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test queries of replacing a recipe"""
+        recipe = linked_recipe(simple_user, helper_functions)
+        tag = helper_functions.sample_tag(user=simple_user, name="New")
+        payload = {"title": "Stew", "time_min": 40, "price": 5, "tags": [tag.id]}
+
+        query_guard.check(
+            lambda: api_client.put(recipe_url("detail", recipe.id), payload)
+        )
+
+    @pytest.mark.max_queries(13)
+    def test_partial_update_recipe(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test queries of updating a recipe"""
+        recipe = linked_recipe(simple_user, helper_functions)
+        tag = helper_functions.sample_tag(user=simple_user, name="New")
+
+        query_guard.check(
+            lambda: api_client.patch(
+                recipe_url("detail", recipe.id), {"tags": [tag.id]}
+            )
+        )
+
+    @pytest.mark.max_queries(12)
+    def test_destroy_recipe(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test queries of deleting a recipe"""
+        recipe = linked_recipe(simple_user, helper_functions)
+
+        query_guard.check(lambda: api_client.delete(recipe_url("detail", recipe.id)))
+
+    @pytest.mark.max_queries(11)
+    def test_bulk_delete_recipes(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that deleting recipes in bulk needs a fixed number of queries"""
+        linked_recipe(simple_user, helper_functions)
+
+        query_guard.check(
+            lambda: api_client.delete(f"{BULK_DELETE_URL}?all=true"),
+            grow_recipes(simple_user, helper_functions),
+        )
+
+    @pytest.mark.max_queries(3)
+    def test_upload_image(self, api_client, recipe_for_image_upload, query_guard) -> None:
+        """Test queries of uploading a recipe image"""
+        def upload():
+            with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+                Image.new("RGB", (10, 10)).save(ntf, format="JPEG")
+                ntf.seek(0)
+                api_client.post(
+                    recipe_url("upload-image", recipe_for_image_upload.id),
+                    {"image": ntf},
+                    format="multipart",
+                )
+
+        query_guard.check(upload)
+        recipe_for_image_upload.refresh_from_db()
+
+    @pytest.mark.max_queries(7)
+    def test_similar_recipes(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that similar recipes need a fixed number of queries"""
+        recipe = linked_recipe(simple_user, helper_functions)
+        tag = recipe.tags.get()
+        linked_recipe(simple_user, helper_functions, "Similar").tags.add(tag)
+
+        def grow():
+            for index in range(3):
+                linked_recipe(simple_user, helper_functions, f"Extra {index}").tags.add(
+                    tag
+                )
+
+        query_guard.check(
+            lambda: (cache.clear(), api_client.get(recipe_url("similar", recipe.id))),
+            grow,
+        )
+
+    @pytest.mark.max_queries(4)
+    def test_makeable_recipes(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that makeable recipes need a fixed number of queries"""
+        recipe = linked_recipe(simple_user, helper_functions)
+        ingredient = recipe.ingredients.get()
+
+        def grow():
+            for index in range(3):
+                extra = linked_recipe(simple_user, helper_functions, f"Extra {index}")
+                extra.ingredients.set([ingredient])
+
+        query_guard.check(
+            lambda: api_client.post(
+                MAKEABLE_URL, {"ingredients": [ingredient.id]}, format="json"
+            ),
+            grow,
+        )
+
+
+class AggregateQueryTests:
+    """Test query budgets of the aggregate recipe endpoints"""
+
+    @pytest.mark.max_queries(2)
+    def test_shopping_list(
+        self, api_client, simple_user, helper_functions, query_guard
+    ) -> None:
+        """Test that a shopping list needs a fixed number of queries"""
+        recipes = [linked_recipe(simple_user, helper_functions)]
+
+        def grow():
+            for index in range(3):
+                recipes.append(
+                    linked_recipe(simple_user, helper_functions, f"Extra {index}")
+                )
+
+        query_guard.check(
+            lambda: api_client.post(
+                SHOPPING_LIST_URL,
+                {"recipes": [recipe.id for recipe in recipes]},
+                format="json",
+            ),
+            grow,
+        )
+
+    @pytest.mark.max_queries(7)
+    def test_stats(self, api_client, simple_user, helper_functions, query_guard) -> None:
+        """Test that statistics need a fixed number of queries"""
+        linked_recipe(simple_user, helper_functions)
+
+        query_guard.check(
+            lambda: (cache.clear(), api_client.get(STATS_URL)),
+            grow_recipes(simple_user, helper_functions),
+        )
@@ -1,17 +1,24 @@
 import decimal
 import tempfile
-import os
+from io import BytesIO
+from unittest.mock import patch
 
+import pytest
 from PIL import Image
 
+from django.core.files.storage import default_storage
 from django.urls import reverse
 from rest_framework import status
 
-from core.models import Recipe
+from core.images import variant_name
+from core.models import Job, Recipe, RecipeTag
+from core.tasks import delete_files, make_image_variants
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 
 RECIPES_URL = reverse("recipe:recipe-list")
+MAKEABLE_URL = reverse("recipe:recipe-makeable")
+BULK_DELETE_URL = reverse("recipe:recipe-bulk-delete")
 
 
 def image_upload_url(recipe_id: int) -> str:
@@ -24,6 +31,11 @@ def recipe_detail_url(recipe_id: int) -> str:
     return reverse("recipe:recipe-detail", args=[recipe_id])
 
 
+def similar_url(recipe_id: int) -> str:
+    """Return URL for similar recipes"""
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
 class PublicRecipeAPITests:
     """Test unauthenticated recipe API access"""
 
@@ -143,6 +155,20 @@ class PrivateRecipeAPITests:
         assert ingredients.count() == 2
         assert ingredient1 in ingredients and ingredient2 in ingredients
 
+    def test_create_recipe_with_foreign_tag(
+        self, api_client, simple_user, create_user, helper_functions
+    ) -> None:
+        """Test that recipes can not be linked to tags of other users"""
+        other = create_user(email="other@example.com", password="pass")
+        tag = helper_functions.sample_tag(user=other, name="Vegan")
+        payload = {"title": "Stew", "tags": [tag.id], "time_min": 30, "price": 4}
+
+        response = api_client.post(RECIPES_URL, payload)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "tags" in response.data
+        assert not Recipe.objects.filter(title="Stew").exists()
+
     def test_partial_update_recipe(
         self, api_client, simple_user, helper_functions
     ) -> None:
@@ -187,6 +213,39 @@ class PrivateRecipeAPITests:
 
         assert len(tags) == 0
 
+    def test_ingredients_keep_given_order(
+        self, api_client, simple_user, helper_functions
+    ) -> None:
+        """Test that ingredients are listed in the order they were sent"""
+        orange, apple, lime = (
+            helper_functions.sample_ingredient(user=simple_user, name=name)
+            for name in ("Orange", "Apple", "Lime")
+        )
+        payload = {
+            "title": "Fruit Salad",
+            "ingredients": [orange.id, apple.id],
+            "time_min": 5,
+            "price": 0.99,
+        }
+        created = api_client.post(RECIPES_URL, payload)
+        url = recipe_detail_url(created.data["id"])
+
+        assert created.data["ingredients"] == [orange.id, apple.id]
+
+        api_client.patch(url, {"ingredients": [lime.id, apple.id, orange.id]})
+        response = api_client.get(url)
+
+        assert [item["name"] for item in response.data["ingredients"]] == [
+            "Lime",
+            "Apple",
+            "Orange",
+        ]
+
+        recipe = Recipe.objects.get(pk=created.data["id"])
+        cinnamon = helper_functions.sample_ingredient(user=simple_user, name="Cinnamon")
+        recipe.ingredients.add(cinnamon)
+        assert recipe.ingredients.last().name == "Cinnamon"
+
 
 class RecipeImageUploadTests:
     """Test image uploads for recipe API"""
@@ -205,7 +264,22 @@ class RecipeImageUploadTests:
 
         assert response.status_code == status.HTTP_200_OK
         assert "image" in response.data
-        assert os.path.exists(recipe_for_image_upload.image.path)
+        assert default_storage.exists(recipe_for_image_upload.image.name)
+        name = recipe_for_image_upload.image.name
+        assert response.data["variants"]["thumbnail"].endswith(
+            f"/media/variants/thumbnail/{name}"
+        )
+        (job,) = Job.objects.all()
+        assert (job.name, job.kwargs) == ("core.make_image_variants", {"image": name})
+
+        make_image_variants(name)
+        media = api_client.get(response.data["variants"]["thumbnail"])
+        assert media.status_code == status.HTTP_200_OK
+        assert media["Content-Type"] == "image/jpeg"
+        assert Image.open(BytesIO(b"".join(media.streaming_content))).size == (10, 10)
+        delete_files([name])
+        assert not default_storage.exists(variant_name(name, "thumbnail"))
+        assert api_client.get(f"/media/{name}").status_code == 404
 
     def test_upload_image_failed(self, recipe_for_image_upload, api_client) -> None:
         """Test uploading an invalid image"""
@@ -265,3 +339,204 @@ class RecipeImageUploadTests:
         assert serializer1.data in response.data
         assert serializer2.data in response.data
         assert serializer3.data not in response.data
+
+
+class DeleteRecipesTests:
+    """Test deleting the recipe collection"""
+
+    def test_delete_filtered_recipes(
+        self, api_client, simple_user, create_user, helper_functions
+    ) -> None:
+        """Test deleting the user's recipes with a tag in bulk"""
+        tag = helper_functions.sample_tag(user=simple_user, name="Dessert")
+        cake = helper_functions.sample_recipe(user=simple_user, title="Cake")
+        pie = helper_functions.sample_recipe(user=simple_user, title="Pie")
+        soup = helper_functions.sample_recipe(user=simple_user, title="Soup")
+        for recipe in (cake, pie):
+            recipe.tags.add(tag)
+        Recipe.objects.filter(pk=cake.pk).update(image="uploads/recipe/cake.jpg")
+        other = create_user(email="other@londonappdev.com", password="testpass")
+        other_recipe = helper_functions.sample_recipe(user=other)
+        other_recipe.tags.add(helper_functions.sample_tag(user=other))
+
+        response = api_client.delete(f"{BULK_DELETE_URL}?tags={tag.id}")
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert set(Recipe.objects.all()) == {soup, other_recipe}
+        assert not RecipeTag.objects.filter(user=simple_user).exists()
+        tag.refresh_from_db()
+        assert tag.recipe_count == 0
+        (job,) = Job.objects.all()
+        assert job.name == "core.delete_files"
+        assert job.kwargs == {"names": ["uploads/recipe/cake.jpg"]}
+
+        api_client.delete(f"{BULK_DELETE_URL}?all=true")
+        assert set(Recipe.objects.all()) == {other_recipe}
+
+    @pytest.mark.parametrize("query", ["", "?all=false", "?tags=", "?tags=abc"])
+    def test_delete_without_filters_rejected(
+        self, api_client, simple_user, helper_functions, query
+    ) -> None:
+        """Test bulk deletes need a valid filter or all=true"""
+        recipe = helper_functions.sample_recipe(user=simple_user)
+
+        response = api_client.delete(f"{BULK_DELETE_URL}{query}")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert list(Recipe.objects.all()) == [recipe]
+        assert api_client.delete(RECIPES_URL).status_code == (
+            status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+
+class SimilarRecipesTests:
+    """Test recommending similar recipes"""
+
+    def test_similar_recipes_ranked(
+        self, api_client, simple_user, helper_functions
+    ) -> None:
+        """Test that recipes are ranked by shared ingredients and tags"""
+        tag = helper_functions.sample_tag(user=simple_user)
+        ingredient1 = helper_functions.sample_ingredient(user=simple_user, name="Egg")
+        ingredient2 = helper_functions.sample_ingredient(user=simple_user, name="Milk")
+        recipe = helper_functions.sample_recipe(user=simple_user, title="Omelette")
+        recipe.ingredients.add(ingredient1, ingredient2)
+        recipe.tags.add(tag)
+        close = helper_functions.sample_recipe(user=simple_user, title="Scramble")
+        close.ingredients.add(ingredient1, ingredient2)
+        far = helper_functions.sample_recipe(user=simple_user, title="Meringue")
+        far.ingredients.add(ingredient1)
+        helper_functions.sample_recipe(user=simple_user, title="Toast")
+
+        response = api_client.get(similar_url(recipe.id))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in response.data] == [close.id, far.id]
+        assert response.data[0]["similarity"] == pytest.approx(2 / 3)
+        assert response.data[1]["similarity"] == pytest.approx(1 / 3)
+
+    def test_similar_recipes_limited_to_user(
+        self, api_client, simple_user, django_user_model, helper_functions
+    ) -> None:
+        """Test that other users' recipes are not recommended or accessible"""
+        user2 = django_user_model.objects.create_user("sample@yandex.ru", "PassworD")
+        ingredient = helper_functions.sample_ingredient(user=simple_user)
+        recipe = helper_functions.sample_recipe(user=simple_user)
+        recipe.ingredients.add(ingredient)
+        other = helper_functions.sample_recipe(user=user2)
+        other.ingredients.add(ingredient)
+
+        response = api_client.get(similar_url(recipe.id))
+        other_response = api_client.get(similar_url(other.id))
+
+        assert response.data == []
+        assert other_response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_similar_index_updated_incrementally(
+        self,
+        api_client,
+        simple_user,
+        helper_functions,
+        django_capture_on_commit_callbacks,
+    ) -> None:
+        """Test that link changes update the cached index without a rebuild"""
+        ingredient = helper_functions.sample_ingredient(user=simple_user)
+        recipe = helper_functions.sample_recipe(user=simple_user)
+        recipe.ingredients.add(ingredient)
+        api_client.get(similar_url(recipe.id))
+
+        with patch("recipe.similarity.SimilarityIndex.build") as build:
+            with django_capture_on_commit_callbacks(execute=True):
+                other = helper_functions.sample_recipe(user=simple_user, title="New")
+                other.ingredients.add(ingredient)
+            added = api_client.get(similar_url(recipe.id))
+            with django_capture_on_commit_callbacks(execute=True):
+                other.ingredients.remove(ingredient)
+            removed = api_client.get(similar_url(recipe.id))
+        build.assert_not_called()
+
+        assert [item["id"] for item in added.data] == [other.id]
+        assert removed.data == []
+
+    def test_similar_index_rebuilt_after_ingredient_delete(
+        self,
+        api_client,
+        simple_user,
+        helper_functions,
+        django_capture_on_commit_callbacks,
+    ) -> None:
+        """Test that deleting an ingredient retires the cached index"""
+        ingredient = helper_functions.sample_ingredient(user=simple_user)
+        recipe = helper_functions.sample_recipe(user=simple_user)
+        other = helper_functions.sample_recipe(user=simple_user, title="New")
+        for item in (recipe, other):
+            item.ingredients.add(ingredient)
+        assert len(api_client.get(similar_url(recipe.id)).data) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ingredient.delete()
+        response = api_client.get(similar_url(recipe.id))
+
+        assert response.data == []
+
+    @pytest.mark.parametrize("limit", ["abc", "0", "-1", "101"])
+    def test_similar_recipes_invalid_limit(
+        self, api_client, simple_user, helper_functions, limit
+    ) -> None:
+        """Test that an invalid limit is rejected"""
+        recipe = helper_functions.sample_recipe(user=simple_user)
+
+        response = api_client.get(similar_url(recipe.id), {"limit": limit})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "limit" in response.data
+
+
+class MakeableRecipesTests:
+    """Test matching recipes against a pantry"""
+
+    def test_makeable_recipes_ranked_by_missing(
+        self, api_client, simple_user, helper_functions
+    ) -> None:
+        """Test that recipes are filtered and ranked by missing ingredients"""
+        egg = helper_functions.sample_ingredient(user=simple_user, name="Egg")
+        milk = helper_functions.sample_ingredient(user=simple_user, name="Milk")
+        flour = helper_functions.sample_ingredient(user=simple_user, name="Flour")
+        sugar = helper_functions.sample_ingredient(user=simple_user, name="Sugar")
+        omelette = helper_functions.sample_recipe(user=simple_user, title="Omelette")
+        omelette.ingredients.add(egg, milk)
+        pancakes = helper_functions.sample_recipe(user=simple_user, title="Pancakes")
+        pancakes.ingredients.add(egg, milk, flour)
+        cake = helper_functions.sample_recipe(user=simple_user, title="Cake")
+        cake.ingredients.add(egg, flour, sugar)
+        candy = helper_functions.sample_recipe(user=simple_user, title="Candy")
+        candy.ingredients.add(sugar)
+
+        payload = {"ingredients": [egg.id, milk.id], "max_missing": 1}
+        response = api_client.post(MAKEABLE_URL, payload, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in response.data] == [omelette.id, pancakes.id]
+        assert [item["missing"] for item in response.data] == [0, 1]
+
+    def test_makeable_exact_by_default(
+        self, api_client, simple_user, helper_functions
+    ) -> None:
+        """Test that only fully covered recipes are returned by default"""
+        egg = helper_functions.sample_ingredient(user=simple_user, name="Egg")
+        milk = helper_functions.sample_ingredient(user=simple_user, name="Milk")
+        recipe = helper_functions.sample_recipe(user=simple_user)
+        recipe.ingredients.add(egg, milk)
+
+        response = api_client.post(
+            MAKEABLE_URL, {"ingredients": [egg.id]}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == []
+
+    def test_makeable_requires_ingredients(self, api_client, simple_user) -> None:
+        """Test that an empty pantry is rejected"""
+        response = api_client.post(MAKEABLE_URL, {"ingredients": []}, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
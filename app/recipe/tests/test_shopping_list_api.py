@@ -0,0 +1,69 @@
+from django.urls import reverse
+from rest_framework import status
+
+SHOPPING_LIST_URL = reverse("recipe:shopping-list")
+
+
+class PublicShoppingListAPITests:
+    """Test unauthenticated shopping list API access"""
+
+    def test_login_required(self, api_client) -> None:
+        """Test that login is required for building a shopping list"""
+        response = api_client.post(SHOPPING_LIST_URL, {"recipes": [1]}, format="json")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class PrivateShoppingListAPITests:
+    """Test the authorized user shopping list API"""
+
+    def test_shopping_list_aggregates_recipes(
+        self, api_client, simple_user, helper_functions
+    ) -> None:
+        """Test that ingredients are merged and totals summed"""
+        rice = helper_functions.sample_ingredient(user=simple_user, name="Rice")
+        carrot = helper_functions.sample_ingredient(user=simple_user, name="Carrot")
+        plov = helper_functions.sample_recipe(
+            user=simple_user, title="Plov", price=10, time_min=90
+        )
+        plov.ingredients.add(rice, carrot)
+        porridge = helper_functions.sample_recipe(
+            user=simple_user, title="Porridge", price=2.5, time_min=20
+        )
+        porridge.ingredients.add(rice)
+        unused = helper_functions.sample_recipe(user=simple_user, title="Soup")
+        unused.ingredients.add(carrot)
+
+        payload = {"recipes": [plov.id, porridge.id, plov.id]}
+        response = api_client.post(SHOPPING_LIST_URL, payload, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["recipes"] == 2
+        assert response.data["price"] == "12.50"
+        assert response.data["time_min"] == 110
+        assert response.data["ingredients"] == [
+            {"id": rice.id, "name": "Rice", "count": 2},
+            {"id": carrot.id, "name": "Carrot", "count": 1},
+        ]
+
+    def test_shopping_list_limited_to_user(
+        self, api_client, simple_user, django_user_model, helper_functions
+    ) -> None:
+        """Test that other users' recipes are ignored"""
+        user2 = django_user_model.objects.create_user("sample@yandex.ru", "PassworD")
+        recipe = helper_functions.sample_recipe(user=user2)
+        recipe.ingredients.add(helper_functions.sample_ingredient(user=user2))
+
+        response = api_client.post(
+            SHOPPING_LIST_URL, {"recipes": [recipe.id]}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["recipes"] == 0
+        assert response.data["ingredients"] == []
+
+    def test_shopping_list_invalid(self, api_client, simple_user) -> None:
+        """Test that an empty recipe list is rejected"""
+        response = api_client.post(SHOPPING_LIST_URL, {"recipes": []}, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,105 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from recipe import stats
+from recipe.stats import stream_percentiles
+
+STATS_URL = reverse("recipe:stats")
+
+
+def test_stream_percentiles() -> None:
+    """Test percentiles match linear interpolation over sorted values"""
+    result = stream_percentiles(iter([1, 2, 3, 4, 10]), 5, (0.5, 0.9))
+
+    assert result == {"p50": 3.0, "p90": pytest.approx(7.6)}
+
+
+class PublicStatsAPITests:
+    """Test unauthenticated stats API access"""
+
+    def test_login_required(self, api_client) -> None:
+        """Test that login is required for retrieving stats"""
+        response = api_client.get(STATS_URL)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class PrivateStatsAPITests:
+    """Test the authorized user stats API"""
+
+    def test_empty_stats(self, api_client, simple_user) -> None:
+        """Test statistics of a user without recipes"""
+        response = api_client.get(STATS_URL)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["recipes"] == 0
+        assert response.data["price"]["min"] is None
+        assert response.data["price"]["histogram"] == []
+
+    def test_recipe_stats(self, api_client, simple_user, helper_functions) -> None:
+        """Test aggregated statistics of a user's recipes"""
+        tag = helper_functions.sample_tag(user=simple_user, name="Dinner")
+        for price, time_min in ((1, 10), (2, 20), (3, 30), (10, 40)):
+            recipe = helper_functions.sample_recipe(
+                user=simple_user, price=price, time_min=time_min
+            )
+            recipe.tags.add(tag)
+
+        response = api_client.get(STATS_URL)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["recipes"] == 4
+        assert response.data["price"]["min"] == 1
+        assert response.data["price"]["max"] == 10
+        assert response.data["price"]["avg"] == 4
+        assert response.data["time_min"]["percentiles"]["p50"] == 25
+        assert sum(b["count"] for b in response.data["price"]["histogram"]) == 4
+        assert response.data["price"]["histogram"][-1]["count"] == 1
+        assert response.data["top_tags"] == [
+            {"id": tag.id, "name": "Dinner", "recipes": 4}
+        ]
+        assert response.data["top_ingredients"] == []
+
+    def test_stats_cached_until_write(
+        self,
+        api_client,
+        simple_user,
+        helper_functions,
+        django_assert_num_queries,
+        django_capture_on_commit_callbacks,
+    ) -> None:
+        """Test that statistics are cached and invalidated by writes"""
+        helper_functions.sample_recipe(user=simple_user)
+        api_client.get(STATS_URL)
+
+        with django_assert_num_queries(0):
+            api_client.get(STATS_URL)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            helper_functions.sample_recipe(user=simple_user)
+        response = api_client.get(STATS_URL)
+
+        assert response.data["recipes"] == 2
+
+    def test_stale_stats_not_served(
+        self, api_client, simple_user, helper_functions, monkeypatch
+    ) -> None:
+        """Test that statistics computed before a write are not cached for it"""
+        helper_functions.sample_recipe(user=simple_user)
+        compute_stats = stats.compute_stats
+
+        def compute_then_write(user):
+            stale = compute_stats(user)
+            # A write commits while the statistics are being computed
+            helper_functions.sample_recipe(user=simple_user)
+            stats.invalidate(user.pk)
+            return stale
+
+        monkeypatch.setattr(stats, "compute_stats", compute_then_write)
+        stale = api_client.get(STATS_URL)
+        monkeypatch.setattr(stats, "compute_stats", compute_stats)
+        response = api_client.get(STATS_URL)
+
+        assert stale.data["recipes"] == 1
+        assert response.data["recipes"] == 2
@@ -100,3 +100,18 @@ class PrivateTagsAPITests:
         response = api_client.get(TAGS_URL, {"assigned_only": 1})
 
         assert len(response.data) == 1
+
+    def test_order_tags_by_recipe_count(
+        self, api_client, simple_user, helper_functions
+    ) -> None:
+        """Test ordering tags by the number of recipes using them"""
+        tag1 = helper_functions.sample_tag(user=simple_user, name="Spicy")
+        tag2 = helper_functions.sample_tag(user=simple_user, name="Sweet")
+        recipe1 = helper_functions.sample_recipe(user=simple_user, title="Plov")
+        recipe2 = helper_functions.sample_recipe(user=simple_user, title="Lagman")
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        response = api_client.get(TAGS_URL, {"ordering": "-recipe_count"})
+
+        assert [tag["id"] for tag in response.data] == [tag1.id, tag2.id]
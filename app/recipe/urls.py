@@ -1,7 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet
+from recipe.views import (
+    TagViewSet,
+    IngredientViewSet,
+    RecipeViewSet,
+    ShoppingListView,
+    RecipeStatsView,
+)
 
 router = DefaultRouter()
 router.register("tags", TagViewSet)
@@ -10,4 +16,8 @@ router.register("recipes", RecipeViewSet)
 
 app_name = "recipe"
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("", include(router.urls)),
+    path("shopping-list/", ShoppingListView.as_view(), name="shopping-list"),
+    path("stats/", RecipeStatsView.as_view(), name="stats"),
+]
@@ -1,27 +1,48 @@
-from django.db.models import Q
-from rest_framework import viewsets, mixins, status
+from django.db.models import Q, F, Count, Sum
+from rest_framework import viewsets, mixins, status, generics
 from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.authentication import TokenAuthentication
 from rest_framework import permissions
 
-from core.models import Tag, Ingredient, Recipe
+from core.asyncviews import AsyncViewSetMixin
+from core.jobs import enqueue
+from core.models import Tag, Ingredient, Recipe, RecipeIngredient, RecipeTag
+from core.purging import Purger
 from recipe.serializers import (
     TagSerializer,
     IngredientSerializer,
     RecipeSerializer,
     RecipeDetailSerializer,
     RecipeImageSerializer,
+    RecipeSimilaritySerializer,
+    SimilarQuerySerializer,
+    BulkDeleteQuerySerializer,
+    RecipeMakeableSerializer,
+    PantrySerializer,
+    ShoppingListSerializer,
+    ShoppingListResultSerializer,
 )
+from recipe import stats
 
 
 class BaseRecipeAttrViewSet(
-    mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet
+    AsyncViewSetMixin,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
+    viewsets.GenericViewSet,
 ):
     """Base viewset for user owned recipe attributes"""
 
     authentication_classes = (TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = "recipes"
+    replica_actions = ("list",)
+    filter_backends = (OrderingFilter,)
+    ordering_fields = ("name", "recipe_count")
+    ordering = ("-name",)
 
     def get_queryset(self):
         """Return objects for current authenticated user only"""
@@ -29,9 +50,9 @@ class BaseRecipeAttrViewSet(
         queryset = self.queryset
         filters = Q(user=self.request.user)
         if assigned_only:
-            filters &= Q(recipe__isnull=False)
+            filters &= Q(recipe_count__gt=0)
 
-        return queryset.filter(filters).order_by("-name").distinct()
+        return queryset.filter(filters)
 
     def perform_create(self, serializer):
         """Create a new object"""
@@ -52,13 +73,15 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AsyncViewSetMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     authentication_classes = (TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = "recipes"
+    replica_actions = ("list", "retrieve")
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integers"""
@@ -69,15 +92,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         tags = self.request.query_params.get("tags")
         ingredients = self.request.query_params.get("ingredients")
         queryset = self.queryset
-        filters = Q(user=self.request.user)
+        user = self.request.user
+        # Match links by their user too, so only the user's partitions are read
+        filters = Q(user=user)
         if tags:
             tag_ids = self._params_to_ints(tags)
-            filters &= Q(tags__id__in=tag_ids)
+            links = RecipeTag.objects.filter(user=user, tag_id__in=tag_ids)
+            filters &= Q(pk__in=links.values("recipe_id"))
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            filters &= Q(ingredients__id__in=ingredient_ids)
+            links = RecipeIngredient.objects.filter(
+                user=user, ingredient_id__in=ingredient_ids
+            )
+            filters &= Q(pk__in=links.values("recipe_id"))
+
+        queryset = queryset.filter(filters)
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.prefetch_related("tags", "ingredients")
 
-        return queryset.filter(filters).distinct()
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -85,6 +118,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeDetailSerializer
         elif self.action == "upload_image":
             return RecipeImageSerializer
+        elif self.action == "similar":
+            return RecipeSimilaritySerializer
+        elif self.action == "makeable":
+            return RecipeMakeableSerializer
 
         return self.serializer_class
 
@@ -99,6 +136,134 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
 
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        recipe = serializer.save()
+        if recipe.image:
+            enqueue("core.make_image_variants", image=recipe.image.name)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=["DELETE"], detail=False, url_path="bulk-delete")
+    def bulk_delete(self, request):
+        """
+        Delete the user's recipes matching the tags and ingredients filters,
+        or all of them with all=true, in batches without loading them
+        """
+        query = BulkDeleteQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        Purger().delete_recipes(request.user, self.get_queryset())
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(methods=["GET"], detail=True)
+    def similar(self, request, pk=None):
+        """Return the user's recipes sharing the most ingredients and tags"""
+        recipe = self.get_object()
+        query = SimilarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        limit = query.validated_data["limit"]
+        # Imported on first use, numpy is not needed to start a worker
+        from recipe import similarity
+
+        ranked = similarity.get_index(request.user).similar(recipe.pk, limit)
+        recipes = Recipe.objects.filter(
+            user=request.user, pk__in=[recipe_id for recipe_id, _ in ranked]
+        ).prefetch_related("tags", "ingredients")
+        recipes = {recipe.pk: recipe for recipe in recipes}
+
+        results = []
+        for recipe_id, score in ranked:
+            if recipe_id in recipes:
+                recipes[recipe_id].similarity = score
+                results.append(recipes[recipe_id])
+        serializer = self.get_serializer(results, many=True)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=["POST"], detail=False)
+    def makeable(self, request):
+        """
+        Return recipes using at least one of the given ingredients and
+        missing at most max_missing others, fewest missing first
+        """
+        pantry = PantrySerializer(data=request.data)
+        pantry.is_valid(raise_exception=True)
+        ingredient_ids = pantry.validated_data["ingredients"]
+
+        links = RecipeIngredient.objects.filter(user=request.user)
+        candidates = links.filter(ingredient_id__in=ingredient_ids).values("recipe_id")
+        ranked = (
+            links.filter(recipe_id__in=candidates)
+            .values("recipe_id")
+            .annotate(
+                total=Count("pk"),
+                available=Count("pk", filter=Q(ingredient_id__in=ingredient_ids)),
+            )
+            .annotate(missing=F("total") - F("available"))
+            .filter(missing__lte=pantry.validated_data["max_missing"])
+            .order_by("missing", "recipe_id")
+            .values_list("recipe_id", "missing")
+        )[: pantry.validated_data["limit"]]
+        missing = dict(ranked)
+
+        recipes = Recipe.objects.filter(
+            user=request.user, pk__in=missing
+        ).prefetch_related(
+            "tags", "ingredients"
+        )
+        recipes = {recipe.pk: recipe for recipe in recipes}
+        results = []
+        for recipe_id, count in missing.items():
+            recipes[recipe_id].missing = count
+            results.append(recipes[recipe_id])
+        serializer = self.get_serializer(results, many=True)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ShoppingListView(generics.GenericAPIView):
+    """Aggregate the ingredients, price and time of several recipes"""
+
+    serializer_class = ShoppingListSerializer
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = "recipes"
+
+    def post(self, request):
+        """Return deduplicated ingredients with totals for the given recipes"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = Recipe.objects.filter(
+            user=request.user, pk__in=set(serializer.validated_data["recipes"])
+        )
+
+        ingredients = (
+            RecipeIngredient.objects.filter(user=request.user, recipe__in=recipes)
+            .values("ingredient_id", "ingredient__name")
+            .annotate(count=Count("recipe_id"))
+            .order_by("-count", "ingredient__name")
+        )
+        totals = recipes.aggregate(
+            recipes=Count("pk"), price=Sum("price"), time_min=Sum("time_min")
+        )
+        result = ShoppingListResultSerializer(
+            {
+                "recipes": totals["recipes"],
+                "price": totals["price"] or 0,
+                "time_min": totals["time_min"] or 0,
+                "ingredients": ingredients,
+            }
+        )
+
+        return Response(result.data, status=status.HTTP_200_OK)
+
+
+class RecipeStatsView(APIView):
+    """Summarize the recipes of the authenticated user"""
+
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = "recipes"
+
+    def get(self, request):
+        """Return cached recipe statistics"""
+        return Response(stats.get_stats(request.user), status=status.HTTP_200_OK)
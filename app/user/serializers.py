@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from core.hashers import aauthenticate
+
 
 class CustomUserSerializer(serializers.ModelSerializer):
     """Serializer for the users model object"""
@@ -12,7 +14,10 @@ class CustomUserSerializer(serializers.ModelSerializer):
         extra_kwargs = {"password": {"write_only": True, "min_length": 5}}
 
     def create(self, validated_data):
-        """Create a new user with encrypted password and return it"""
+        """
+        Create a new user with encrypted password and return it. An
+        encoded_password passed to save() is stored instead of hashing.
+        """
         return self.Meta.model.objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
@@ -37,16 +42,46 @@ class AuthTokenSerializer(serializers.Serializer):
 
     def validate(self, attrs):
         """Validate and authenticate the user"""
-        email = attrs.get("email")
-        password = attrs.get("password")
+        if self.context.get("defer_authentication"):
+            return attrs
 
         user = authenticate(
-            request=self.context.get("request"), username=email, password=password
+            request=self.context.get("request"),
+            username=attrs.get("email"),
+            password=attrs.get("password"),
         )
 
+        return self.authenticated(attrs, user)
+
+    def authenticated(self, attrs, user):
+        """Add the authenticated user to attrs or fail validation"""
         if not user:
             msg = _("Unable to authenticate with provided credentials")
             raise serializers.ValidationError(msg, code="authentication")
 
         attrs["user"] = user
         return attrs
+
+    async def ais_valid(self, raise_exception: bool = False) -> bool:
+        """
+        Async version of is_valid, checking the password with aauthenticate
+        so hashing does not block the event loop
+        """
+        self._context = {**self.context, "defer_authentication": True}
+        if self.is_valid():
+            attrs = self.validated_data
+            user = await aauthenticate(
+                request=self.context.get("request"),
+                username=attrs["email"],
+                password=attrs["password"],
+            )
+            try:
+                self._validated_data = self.authenticated(attrs, user)
+            except serializers.ValidationError as exc:
+                self._validated_data = {}
+                self._errors = serializers.as_serializer_error(exc)
+
+        if self._errors and raise_exception:
+            raise serializers.ValidationError(self.errors)
+
+        return not bool(self._errors)
@@ -0,0 +1,5 @@
+SELECT "core_customuser"."id", "core_customuser"."password", "core_customuser"."last_login", "core_customuser"."is_superuser", "core_customuser"."is_staff", "core_customuser"."is_active", "core_customuser"."date_joined", "core_customuser"."email", "core_customuser"."name", "core_customuser"."shard", "core_customuser"."shard_moving" FROM "core_customuser" WHERE "core_customuser"."email" = ? LIMIT ?
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? LIMIT ?
+SAVEPOINT "?"
+INSERT INTO "authtoken_token" ("key", "user_id", "created") VALUES (?, ?, ?::timestamptz)
+RELEASE SAVEPOINT "?"
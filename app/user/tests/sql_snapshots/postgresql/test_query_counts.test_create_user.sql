@@ -0,0 +1,2 @@
+SELECT (?) AS "a" FROM "core_customuser" WHERE "core_customuser"."email" = ? LIMIT ?
+INSERT INTO "core_customuser" ("password", "last_login", "is_superuser", "is_staff", "is_active", "date_joined", "email", "name", "shard", "shard_moving") VALUES (?, NULL, false, false, true, ?::timestamptz, ?, ?, ?, false) RETURNING "core_customuser"."id"
@@ -0,0 +1,3 @@
+SELECT (?) AS "a" FROM "core_customuser" WHERE ("core_customuser"."email" = ? AND NOT ("core_customuser"."id" = ?)) LIMIT ?
+UPDATE "core_customuser" SET "password" = ?, "last_login" = NULL, "is_superuser" = false, "is_staff" = false, "is_active" = true, "date_joined" = ?::timestamptz, "email" = ?, "name" = ? WHERE "core_customuser"."id" = ?
+UPDATE "core_customuser" SET "password" = ?, "last_login" = NULL, "is_superuser" = false, "is_staff" = false, "is_active" = true, "date_joined" = ?::timestamptz, "email" = ?, "name" = ? WHERE "core_customuser"."id" = ?
@@ -0,0 +1 @@
+UPDATE "core_customuser" SET "password" = ?, "last_login" = NULL, "is_superuser" = false, "is_staff" = false, "is_active" = true, "date_joined" = ?::timestamptz, "email" = ?, "name" = ? WHERE "core_customuser"."id" = ?
@@ -0,0 +1 @@
+UPDATE "core_customuser" SET "password" = ?, "last_login" = NULL, "is_superuser" = ?, "is_staff" = ?, "is_active" = ?, "date_joined" = ?, "email" = ?, "name" = ? WHERE "core_customuser"."id" = ?
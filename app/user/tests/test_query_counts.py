@@ -0,0 +1,43 @@
+import pytest
+from django.urls import reverse
+
+CREATE_USER_URL = reverse("user:create")
+TOKEN_URL = reverse("user:token")
+ME_URL = reverse("user:me")
+
+
+@pytest.mark.max_queries(2)
+def test_create_user(api_client, query_guard) -> None:
+    """Test queries of creating a user"""
+    payload = {"email": "new@example.com", "password": "testpass123", "name": "New"}
+
+    query_guard.check(lambda: api_client.post(CREATE_USER_URL, payload))
+
+
+@pytest.mark.max_queries(5)
+def test_create_token(api_client, create_user, query_guard) -> None:
+    """Test queries of obtaining a token"""
+    payload = {"email": "token@example.com", "password": "testpass123"}
+    create_user(**payload)
+
+    query_guard.check(lambda: api_client.post(TOKEN_URL, payload))
+
+
+@pytest.mark.max_queries(0)
+def test_retrieve_me(api_client, simple_user, query_guard) -> None:
+    """Test that retrieving the profile needs no queries"""
+    query_guard.check(lambda: api_client.get(ME_URL))
+
+
+@pytest.mark.max_queries(1)
+def test_update_me(api_client, simple_user, query_guard) -> None:
+    """Test queries of updating the profile"""
+    query_guard.check(lambda: api_client.patch(ME_URL, {"name": "Renamed"}))
+
+
+@pytest.mark.max_queries(3)
+def test_replace_me(api_client, simple_user, query_guard) -> None:
+    """Test queries of replacing the profile"""
+    payload = {"email": "me@example.com", "password": "newpass123", "name": "Me"}
+
+    query_guard.check(lambda: api_client.put(ME_URL, payload))
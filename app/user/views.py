@@ -1,21 +1,50 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, authentication, permissions, status
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.asyncviews import AsyncAPIViewMixin, run_db
+from core.hashers import amake_password
+from core.throttling import CredentialsTokenBucketThrottle, IPTokenBucketThrottle
 from user.serializers import CustomUserSerializer, AuthTokenSerializer
 
 
-class CreateCustomUserView(generics.CreateAPIView):
+class CreateCustomUserView(AsyncAPIViewMixin, generics.CreateAPIView):
     """Create a new user in the system"""
 
     serializer_class = CustomUserSerializer
+    ip_throttle_scope = "register"
 
+    async def apost(self, request, *args, **kwargs):
+        """Create the user, hashing the password off the event loop"""
+        serializer = self.get_serializer(data=request.data)
+        await run_db(serializer.is_valid, raise_exception=True)
+        password = await amake_password(serializer.validated_data["password"])
+        await run_db(serializer.save, encoded_password=password)
+        headers = self.get_success_headers(serializer.data)
 
-class CreateTokenView(ObtainAuthToken):
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+
+class CreateTokenView(AsyncAPIViewMixin, ObtainAuthToken):
     """Create a new auth token for user"""
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (CredentialsTokenBucketThrottle, IPTokenBucketThrottle)
+    throttle_scope = "login"
+    ip_throttle_scope = "login_ip"
+
+    async def apost(self, request, *args, **kwargs):
+        """Authenticate the user, checking the password off the event loop"""
+        serializer = self.get_serializer(data=request.data)
+        await serializer.ais_valid(raise_exception=True)
+        token, _ = await run_db(
+            Token.objects.get_or_create, user=serializer.validated_data["user"]
+        )
+
+        return Response({"token": token.key})
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
@@ -24,6 +53,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = CustomUserSerializer
     authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = "user"
 
     def get_object(self):
         """Retrieve an authenticated user"""